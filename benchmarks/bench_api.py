@@ -0,0 +1,294 @@
+"""
+In-process end-to-end load benchmark of the API.
+
+The ASGI app is driven through httpx.ASGITransport against a temporary SQLite (aiosqlite) database and fakeredis,
+so the numbers cover routing, middlewares, dependencies, serialisation and the ORM without any network. A weighted
+mix of scenarios runs at the requested concurrency and RPS and p50/p95/p99 latencies are reported per scenario.
+
+Results can be written to JSON and compared against a stored baseline; a scenario whose p95 latency or throughput
+got worse than --threshold percent is reported as a regression and the exit status is 1. Run from the project root:
+
+    python -m benchmarks.bench_api --requests 5000 --concurrency 32 --output bench_api.json \\
+        --baseline benchmarks/baselines/bench_api.json
+    python -m benchmarks.bench_api --mix list=5,get=5,create=1 --save-baseline benchmarks/baselines/bench_api.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import fakeredis
+import httpx
+from fakeredis import aioredis
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.database.db import get_db
+from src.database.redis_client import redis_manager
+from src.entity.models import Base, Contact, User
+from src.jobs.reconcile_stats import reconcile
+from src.main import app
+from src.services import query_stats
+from src.services.auth import auth_service
+from src.services.rate_limit import Quota, rate_limiter
+
+SCENARIOS = ("login", "list", "get", "create", "search", "birthdays")
+DEFAULT_MIX = "login=1,list=30,get=30,create=10,search=15,birthdays=14"
+FIRST_NAMES = ("Olena", "Taras", "Iryna", "Andrii", "Maria", "Dmytro", "Sofia", "Bohdan", "Kateryna", "Mykola")
+LAST_NAMES = ("Shevchenko", "Kovalenko", "Bondarenko", "Tkachenko", "Kravchenko", "Oliinyk", "Melnyk", "Lysenko")
+PASSWORD = "benchmark"
+
+
+def parse_mix(value: str) -> dict[str, int]:
+    """
+    The parse_mix function parses a scenario mix like ``list=5,get=3`` into scenario weights.
+
+    :param value: str: Comma separated scenario=weight pairs
+    :return: The weights by scenario name
+    :doc-author: Trelent
+    """
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}, expected one of {', '.join(SCENARIOS)}")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Harness:
+    """
+    The app wired to a temporary SQLite database and fakeredis, seeded with ``users`` users holding ``contacts``
+    contacts each.
+    """
+
+    def __init__(self, users: int, contacts: int, seed: int):
+        self.users = users
+        self.contacts = contacts
+        self.random = random.Random(seed)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = create_async_engine(f"sqlite+aiosqlite:///{self.tmpdir.name}/bench.db")
+        self.session_maker = async_sessionmaker(self.engine, expire_on_commit=False, autoflush=False)
+        self.accounts: list[dict] = []
+        self.created = 0
+
+    async def __aenter__(self) -> "Harness":
+        server = fakeredis.FakeServer()
+        redis_manager._client = aioredis.FakeRedis(server=server, decode_responses=True)
+        auth_service.cache = fakeredis.FakeRedis(server=server)
+        rate_limiter.quotas, rate_limiter.user_quotas = {}, {}
+        rate_limiter.default = Quota(sys.maxsize, 1)
+        query_stats.instrument_engine(self.engine)
+
+        async def override_get_db():
+            async with self.session_maker() as session:
+                yield session
+
+        app.dependency_overrides[get_db] = override_get_db
+        await self.seed()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        app.dependency_overrides.pop(get_db, None)
+        await self.engine.dispose()
+        await redis_manager.close()
+        self.tmpdir.cleanup()
+
+    async def seed(self) -> None:
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        password = auth_service.get_password_hash(PASSWORD)
+        today = date.today()
+        async with self.session_maker() as session:
+            users = [User(username=f"bench{i}", email=f"bench{i}@example.com", password=password, confirmed=True,
+                          avatar="https://example.com/avatar.png") for i in range(self.users)]
+            session.add_all(users)
+            await session.flush()
+            contacts = []
+            for user in users:
+                for j in range(self.contacts):
+                    contacts.append(Contact(
+                        first_name=self.random.choice(FIRST_NAMES), last_name=self.random.choice(LAST_NAMES),
+                        email=f"c{user.id}-{j}@example.com", phone=f"+380{self.random.randrange(10 ** 9):09d}",
+                        birthday=today + timedelta(days=self.random.randrange(-300, 60)),
+                        additional_data="seeded", user_id=user.id,
+                    ))
+            session.add_all(contacts)
+            await session.commit()
+            await reconcile(self.engine)
+            for user in users:
+                ids = [contact.id for contact in contacts if contact.user_id == user.id]
+                token = await auth_service.create_access_token(data={"sub": user.email})
+                self.accounts.append({"email": user.email, "ids": ids,
+                                      "headers": {"Authorization": f"Bearer {token}"}})
+
+    def request(self, scenario: str) -> tuple[str, str, dict]:
+        """
+        The request function builds a random request of the given scenario for a random seeded user.
+
+        :param scenario: str: The scenario name
+        :return: The method, the url and the httpx request arguments
+        :doc-author: Trelent
+        """
+        account = self.random.choice(self.accounts)
+        headers = account["headers"]
+        if scenario == "login":
+            return "POST", "/api/auth/login", {"data": {"username": account["email"], "password": PASSWORD}}
+        if scenario == "list":
+            return "GET", "/api/contacts/", {"params": {"limit": 50, "offset": 0}, "headers": headers}
+        if scenario == "get":
+            return "GET", f"/api/contacts/{self.random.choice(account['ids'])}", {"headers": headers}
+        if scenario == "create":
+            self.created += 1
+            body = {"first_name": self.random.choice(FIRST_NAMES), "last_name": self.random.choice(LAST_NAMES),
+                    "email": f"new{self.created}@example.com", "phone": "+380501234567",
+                    "birthday": date.today().isoformat(), "additional_data": "created"}
+            return "POST", "/api/contacts/", {"json": body, "headers": headers}
+        if scenario == "search":
+            return "GET", "/api/contacts/search", {"params": {"q": self.random.choice(LAST_NAMES)[:4]},
+                                                   "headers": headers}
+        return "GET", "/api/contacts/birthdays", {"headers": headers}
+
+
+async def run(harness: Harness, mix: dict[str, int], requests: int, concurrency: int) -> dict:
+    """
+    The run function sends ``requests`` requests drawn from the mix with ``concurrency`` concurrent clients.
+
+    :param harness: Harness: The seeded app
+    :param mix: dict[str, int]: Scenario weights
+    :param requests: int: Total number of requests
+    :param concurrency: int: Number of concurrent clients
+    :return: Per-scenario results: count, errors, rps and latency percentiles in milliseconds
+    :doc-author: Trelent
+    """
+    names, weights = list(mix), list(mix.values())
+    plan = harness.random.choices(names, weights, k=requests)
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    transport = httpx.ASGITransport(app=app)
+    queue = iter(plan)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            for scenario in queue:
+                method, url, kwargs = harness.request(scenario)
+                start = time.perf_counter()
+                response = await client.request(method, url, **kwargs)
+                samples[scenario].append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    errors[scenario] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    results = {}
+    for name in names + ["total"]:
+        values = [s for v in samples.values() for s in v] if name == "total" else samples[name]
+        if not values:
+            continue
+        results[name] = {
+            "requests": len(values),
+            "errors": sum(errors.values()) if name == "total" else errors[name],
+            "rps": round(len(values) / elapsed, 1),
+            "p50_ms": round(percentile(values, 50) * 1000, 3),
+            "p95_ms": round(percentile(values, 95) * 1000, 3),
+            "p99_ms": round(percentile(values, 99) * 1000, 3),
+        }
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    The compare function prints the change of every scenario against the baseline and returns the regressions.
+
+    :param results: dict: Scenario results of this run
+    :param baseline: dict: Scenario results of the baseline
+    :param threshold: float: Allowed worsening in percent
+    :return: A description of every regression
+    :doc-author: Trelent
+    """
+    regressions = []
+    print(f"\n{'scenario':<10} {'p95 base':>10} {'p95 now':>10} {'delta':>8} {'rps base':>10} {'rps now':>10} {'delta':>8}")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        p95 = (current["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] * 100
+        rps = (current["rps"] - previous["rps"]) / previous["rps"] * 100
+        print(f"{name:<10} {previous['p95_ms']:>10.2f} {current['p95_ms']:>10.2f} {p95:>+7.1f}% "
+              f"{previous['rps']:>10.1f} {current['rps']:>10.1f} {rps:>+7.1f}%")
+        if p95 > threshold:
+            regressions.append(f"{name}: p95 {previous['p95_ms']:.2f} -> {current['p95_ms']:.2f} ms ({p95:+.1f}%)")
+        if -rps > threshold:
+            regressions.append(f"{name}: rps {previous['rps']:.1f} -> {current['rps']:.1f} ({rps:+.1f}%)")
+    return regressions
+
+
+async def main_async(args) -> dict:
+    async with Harness(args.users, args.contacts, args.seed) as harness:
+        await run(harness, args.mix, min(args.requests, args.warmup), args.concurrency)
+        return await run(harness, args.mix, args.requests, args.concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="measured requests")
+    parser.add_argument("--warmup", type=int, default=200, help="requests sent before measuring")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"default: {DEFAULT_MIX}")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--contacts", type=int, default=100, help="contacts per user")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against this JSON file")
+    parser.add_argument("--save-baseline", help="write the results as the new baseline to this JSON file")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed worsening in percent")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    results = asyncio.run(main_async(args))
+
+    print(f"requests={args.requests} concurrency={args.concurrency} users={args.users} contacts={args.contacts}")
+    print(f"{'scenario':<10} {'requests':>9} {'errors':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, row in results.items():
+        print(f"{name:<10} {row['requests']:>9} {row['errors']:>7} {row['rps']:>9.1f} "
+              f"{row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f}")
+
+    report = {
+        "config": {key: getattr(args, key) for key in ("requests", "concurrency", "mix", "users", "contacts", "seed")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "results": results,
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "w") as fh:
+                json.dump(report, fh, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        if baseline["config"] != report["config"]:
+            print("\nwarning: baseline was recorded with a different configuration", baseline["config"])
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print("\nregressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
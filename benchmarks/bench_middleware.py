@@ -0,0 +1,104 @@
+"""
+Per-request overhead of the request-ID / timing / static header middleware: BaseHTTPMiddleware versus pure ASGI.
+
+Both stacks do the same work around a trivial endpoint and are driven by calling the ASGI app directly, so the
+numbers contain no network or client overhead. Run from the project root:
+
+    python -m benchmarks.bench_middleware --requests 20000
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from src.middlewares.request_context import HandlerTimingMiddleware, RequestContextMiddleware
+
+STATIC_HEADERS = {"Custom": "Example"}
+
+
+class BaseRequestContextMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        start = time.perf_counter()
+        request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+        request.state.request_id = request_id
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        for name, value in STATIC_HEADERS.items():
+            response.headers[name] = value
+        response.headers.append("Server-Timing", f"total;dur={(time.perf_counter() - start) * 1000:.2f}")
+        return response
+
+
+class BaseHandlerTimingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        start = time.perf_counter()
+        response = await call_next(request)
+        request.state.handler_duration = time.perf_counter() - start
+        return response
+
+
+def build_app(stack: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/")
+    async def index():
+        return {"message": "Contact Application"}
+
+    if stack == "base":
+        app.add_middleware(BaseHandlerTimingMiddleware)
+        app.add_middleware(BaseRequestContextMiddleware)
+    elif stack == "asgi":
+        app.add_middleware(HandlerTimingMiddleware)
+        app.add_middleware(RequestContextMiddleware, static_headers=STATIC_HEADERS)
+    return app
+
+
+async def run(app: FastAPI, requests: int) -> float:
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": "/", "raw_path": b"/", "root_path": "", "query_string": b"", "headers": [(b"host", b"bench")],
+             "client": ("127.0.0.1", 1234), "server": ("bench", 80)}
+
+    async def request():
+        done = asyncio.Event()
+        received = False
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                done.set()
+
+        await app(dict(scope), receive, send)
+
+    for _ in range(200):
+        await request()
+    start = time.perf_counter()
+    for _ in range(requests):
+        await request()
+    return (time.perf_counter() - start) / requests * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+
+    results = {stack: asyncio.run(run(build_app(stack), args.requests)) for stack in ("none", "base", "asgi")}
+    print(f"requests={args.requests}")
+    print(f"no middleware      : {results['none']:8.2f} us/request")
+    print(f"BaseHTTPMiddleware : {results['base']:8.2f} us/request (+{results['base'] - results['none']:.2f})")
+    print(f"pure ASGI          : {results['asgi']:8.2f} us/request (+{results['asgi'] - results['none']:.2f})")
+    print(f"saving             : {results['base'] - results['asgi']:8.2f} us/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Microbenchmarks of src/repository at several data sizes and user distributions.
+
+For every size (total contacts) and distribution a deterministic dataset is seeded:
+
+    whale  one user owns 90% of the contacts, the rest is spread over 99 small users
+    small  the contacts are spread evenly over one user per 100 contacts
+
+Each repository function is then timed for a large and a small user, and the statements it issued are captured
+and explained: ``EXPLAIN QUERY PLAN`` on SQLite, ``EXPLAIN (ANALYZE, BUFFERS)`` on PostgreSQL. The default backend
+is a temporary SQLite file; pass --db-url (an empty database) to measure PostgreSQL. Run from the project root:
+
+    python -m benchmarks.bench_repository --sizes 1000,100000 --output bench_repository.json
+    python -m benchmarks.bench_repository --sizes 1000000 --distributions whale --repeat 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import event, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.entity.models import Base, Contact, User
+from src.repository import contacts as repository_contacts
+from src.repository import users as repository_users
+
+FIRST_NAMES = ("Olena", "Taras", "Iryna", "Andrii", "Maria", "Dmytro", "Sofia", "Bohdan", "Kateryna", "Mykola")
+LAST_NAMES = ("Shevchenko", "Kovalenko", "Bondarenko", "Tkachenko", "Kravchenko", "Oliinyk", "Melnyk", "Lysenko")
+BATCH_SIZE = 10_000
+
+
+def owners(size: int, distribution: str) -> list[int]:
+    """
+    The owners function returns the number of contacts owned by each user of a dataset, largest first.
+
+    :param size: int: Total number of contacts
+    :param distribution: str: ``whale`` or ``small``
+    :return: Contacts per user
+    :doc-author: Trelent
+    """
+    if distribution == "whale":
+        whale = size * 9 // 10
+        rest = size - whale
+        return [whale] + [rest // 99 + (1 if i < rest % 99 else 0) for i in range(99)]
+    users = max(1, size // 100)
+    return [size // users + (1 if i < size % users else 0) for i in range(users)]
+
+
+async def seed(engine, size: int, distribution: str, seed_value: int) -> None:
+    rnd = random.Random(seed_value)
+    today = date.today()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        counts = owners(size, distribution)
+        await conn.execute(insert(User), [
+            {"id": i + 1, "username": f"user{i + 1}", "email": f"user{i + 1}@example.com", "password": "x",
+             "confirmed": True} for i in range(len(counts))
+        ])
+        batch, number = [], 0
+        for user_id, count in enumerate(counts, start=1):
+            for _ in range(count):
+                number += 1
+                batch.append({
+                    "first_name": rnd.choice(FIRST_NAMES), "last_name": rnd.choice(LAST_NAMES),
+                    "email": f"contact{number}@example.com", "phone": f"+380{rnd.randrange(10 ** 9):09d}",
+                    "birthday": today + timedelta(days=rnd.randrange(-365, 365)), "additional_data": "seeded",
+                    "completed": False, "user_id": user_id,
+                })
+                if len(batch) >= BATCH_SIZE:
+                    await conn.execute(insert(Contact), batch)
+                    batch = []
+        if batch:
+            await conn.execute(insert(Contact), batch)
+        if engine.dialect.name == "postgresql":
+            await conn.execute(text("ANALYZE"))
+
+
+class StatementRecorder:
+    """
+    Collects the statements an engine executes while ``active`` is set.
+    """
+
+    def __init__(self, engine):
+        self.active = False
+        self.statements: list[tuple[str, object]] = []
+        event.listen(engine.sync_engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active:
+            self.statements.append((statement, parameters))
+
+
+async def explain(engine, statement: str, parameters) -> list[str]:
+    """
+    The explain function returns the query plan of a captured statement in the backend's own format.
+
+    :param engine: AsyncEngine: The engine the statement was captured on
+    :param statement: str: The SQL as sent to the driver
+    :param parameters: The driver parameters of the statement
+    :return: The plan, one line per row
+    :doc-author: Trelent
+    """
+    if engine.dialect.name == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    elif engine.dialect.name == "postgresql":
+        prefix = "EXPLAIN (ANALYZE, BUFFERS) "
+    else:
+        return []
+    async with engine.connect() as conn:
+        result = await conn.exec_driver_sql(prefix + statement, parameters)
+        return [" | ".join(str(value) for value in row) for row in result]
+
+
+def cases(user: User, contact_id: int, term: str) -> dict:
+    return {
+        "get_all_contacts": lambda db: repository_contacts.get_all_contacts(50, 0, db, user),
+        "get_all_contacts_deep_offset": lambda db: repository_contacts.get_all_contacts(50, 5000, db, user),
+        "get_contact": lambda db: repository_contacts.get_contact(contact_id, db, user),
+        "search_contacts": lambda db: repository_contacts.search_contacts(db, term, user),
+        "get_upcoming_birthdays": lambda db: repository_contacts.get_upcoming_birthdays(db, user),
+        "get_user_by_email": lambda db: repository_users.get_user_by_email(user.email, db),
+    }
+
+
+async def measure(engine, recorder: StatementRecorder, session_maker, repeat: int) -> dict:
+    """
+    The measure function times every repository function for the largest and the smallest user of the seeded
+    dataset and explains the statements each one issued.
+
+    :param engine: AsyncEngine: The seeded engine
+    :param recorder: StatementRecorder: The statement recorder of the engine
+    :param session_maker: async_sessionmaker: Session factory bound to the engine
+    :param repeat: int: Timed calls per function
+    :return: Results by user role and function name
+    :doc-author: Trelent
+    """
+    results = {}
+    async with session_maker() as db:
+        large = await db.get(User, 1)
+        small = (await db.execute(select(User).order_by(User.id.desc()).limit(1))).scalar_one()
+        roles = {"large_user": large, "small_user": small}
+        picks = {}
+        for role, user in roles.items():
+            picks[role] = (await db.execute(
+                select(Contact.id).filter_by(user_id=user.id).order_by(Contact.id.desc()).limit(1))).scalar_one()
+
+    for role, user in roles.items():
+        results[role] = {}
+        for name, call in cases(user, picks[role], "kova").items():
+            timings, rows = [], 0
+            for i in range(repeat + 1):
+                async with session_maker() as db:
+                    recorder.active, recorder.statements = i == 0, []
+                    start = time.perf_counter()
+                    value = await call(db)
+                    elapsed = time.perf_counter() - start
+                    recorder.active = False
+                if i == 0:
+                    captured = list(recorder.statements)
+                    rows = len(value) if isinstance(value, (list, tuple)) else int(value is not None)
+                else:
+                    timings.append(elapsed)
+            plans = [await explain(engine, statement, parameters) for statement, parameters in captured]
+            results[role][name] = {
+                "rows": rows,
+                "mean_ms": round(statistics.fmean(timings) * 1000, 3),
+                "p50_ms": round(statistics.median(timings) * 1000, 3),
+                "max_ms": round(max(timings) * 1000, 3),
+                "statements": [" ".join(statement.split()) for statement, _ in captured],
+                "plans": plans,
+            }
+    return results
+
+
+async def main_async(args) -> dict:
+    tmpdir = None
+    url = args.db_url
+    if url is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        url = f"sqlite+aiosqlite:///{tmpdir.name}/bench.db"
+    engine = create_async_engine(url)
+    recorder = StatementRecorder(engine)
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    report = {}
+    try:
+        for size in args.sizes:
+            for distribution in args.distributions:
+                key = f"{size}/{distribution}"
+                start = time.perf_counter()
+                await seed(engine, size, distribution, args.seed)
+                print(f"\n== {key}: seeded {size} contacts for {len(owners(size, distribution))} users "
+                      f"in {time.perf_counter() - start:.1f}s")
+                report[key] = await measure(engine, recorder, session_maker, args.repeat)
+                for role, functions in report[key].items():
+                    for name, row in functions.items():
+                        print(f"{role:<11} {name:<29} rows={row['rows']:<7} mean={row['mean_ms']:>9.3f} ms "
+                              f"p50={row['p50_ms']:>9.3f} ms")
+                        if args.plans:
+                            for plan in row["plans"]:
+                                for line in plan:
+                                    print(f"{'':<13}{line}")
+    finally:
+        await engine.dispose()
+        if tmpdir is not None:
+            tmpdir.cleanup()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=lambda value: [int(v) for v in value.split(",")], default=[1000, 100_000],
+                        help="total contacts per dataset, e.g. 1000,100000,1000000")
+    parser.add_argument("--distributions", type=lambda value: value.split(","), default=["whale", "small"])
+    parser.add_argument("--repeat", type=int, default=50, help="timed calls per function")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db-url", help="async SQLAlchemy URL of an empty database, default: temporary SQLite")
+    parser.add_argument("--plans", action="store_true", help="print the query plans")
+    parser.add_argument("--output", help="write the results and plans to this JSON file")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Cold start of the application: import time of src.main in a fresh interpreter and the modules that dominate it.
+
+Every run imports src.main in a new process with ``-X importtime``; the median total is reported together with
+the slowest top-level packages of the last run. The warm-up phases themselves are reported at runtime by the
+``app_startup_seconds`` gauge on /metrics. Run from the project root:
+
+    python -m benchmarks.bench_startup --runs 5 --top 15
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+
+def import_profile() -> dict[str, int]:
+    """
+    The import_profile function imports src.main in a fresh interpreter.
+
+    :return: Cumulative import time in microseconds of src.main and of each module it imports directly
+    :doc-author: Trelent
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import src.main"],
+                            capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if name.strip() == "src.main" or depth == 1:
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest packages to show")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    profiles = [import_profile() for _ in range(args.runs)]
+    totals = [profile["src.main"] / 1000 for profile in profiles]
+    print(f"import src.main: median {statistics.median(totals):.1f} ms, min {min(totals):.1f} ms "
+          f"over {args.runs} runs")
+    slowest = sorted(profiles[-1].items(), key=lambda item: item[1], reverse=True)[:args.top]
+    for name, micros in slowest:
+        print(f"  {name:<40} {micros / 1000:8.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump({"import_ms": totals, "modules_ms": {name: us / 1000 for name, us in slowest}}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Microbenchmark of the per-request token verification cost with and without the verified-token cache.
+
+Run from the project root:
+
+    python -m benchmarks.bench_token_cache --tokens 100 --requests 100000
+"""
+import argparse
+import asyncio
+import time
+
+from jose import jwt
+
+from src.services.auth import auth_service
+from src.services.token_cache import TokenCache
+
+
+def _per_call_us(fn, tokens: list[str], requests: int) -> float:
+    start = time.perf_counter()
+    for i in range(requests):
+        fn(tokens[i % len(tokens)])
+    return (time.perf_counter() - start) / requests * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=100, help="distinct access tokens in rotation")
+    parser.add_argument("--requests", type=int, default=100_000, help="decoded tokens per measurement")
+    args = parser.parse_args()
+
+    tokens = [asyncio.run(auth_service.create_access_token(data={"sub": f"user{i}@example.com"}))
+              for i in range(args.tokens)]
+
+    def uncached(token):
+        return jwt.decode(token, auth_service.SECRET_KEY, algorithms=[auth_service.ALGORITHM])
+
+    auth_service.token_cache = TokenCache(maxsize=args.tokens, ttl=300)
+    uncached_us = _per_call_us(uncached, tokens, args.requests)
+    cached_us = _per_call_us(auth_service.decode_access_token, tokens, args.requests)
+
+    print(f"tokens={args.tokens} requests={args.requests}")
+    print(f"uncached jwt.decode : {uncached_us:8.2f} us/request")
+    print(f"cached decode       : {cached_us:8.2f} us/request")
+    print(f"speedup             : {uncached_us / cached_us:8.1f}x "
+          f"(hits={auth_service.token_cache.hits}, misses={auth_service.token_cache.misses})")
+
+
+if __name__ == "__main__":
+    main()
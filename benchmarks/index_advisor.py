@@ -0,0 +1,307 @@
+"""
+Index advisor: explains the query shapes of the application and reports missing and unused indexes.
+
+The repository functions and jobs are run once against a seeded database (see bench_repository.seed) and every
+statement they issue is captured and explained: ``EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)`` on PostgreSQL,
+``EXPLAIN QUERY PLAN`` on SQLite. From the plans the advisor reports
+
+    missing  full scans of a table that filter on its columns, with the suggested composite index: equality
+             columns first, then range columns
+    unused   indexes no query shape used; unique indexes are listed apart since they enforce a constraint
+    writes   indexes every INSERT into the table has to maintain
+
+On PostgreSQL the cumulative scans and the size of every index (pg_stat_user_indexes) are shown as well, so
+pointing --db-url at a copy of production with --no-seed reports real usage. Run from the project root:
+
+    python -m benchmarks.index_advisor --size 100000
+    python -m benchmarks.index_advisor --db-url postgresql+asyncpg://... --no-seed --output advisor.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import tempfile
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from benchmarks.bench_repository import StatementRecorder, owners, seed
+from src.entity.models import Contact, User
+from src.jobs.dedupe import load_candidates
+from src.jobs.purge_contacts import expire_tombstones, purge_batch
+from src.jobs.reconcile_stats import reconcile_users
+from src.repository import changes as repository_changes
+from src.repository import contacts as repository_contacts
+from src.repository import duplicates as repository_duplicates
+from src.repository import stats as repository_stats
+from src.repository import users as repository_users
+
+EQUALITY = ("=", "IN")
+_PREDICATE = re.compile(r"(\w+)\.(\w+)\s*(=|IN\b|>=|<=|<|>|LIKE\b|ILIKE\b)", re.IGNORECASE)
+_SQLITE_DETAIL = re.compile(r"^(SCAN|SEARCH) (\w+)(?: AS \w+)?(?: USING (?:COVERING )?INDEX (\w+))?")
+
+
+def cases(user: User, contact: Contact) -> dict:
+    return {
+        "get_all_contacts": lambda db: repository_contacts.get_all_contacts(50, 0, db, user),
+        "get_contact": lambda db: repository_contacts.get_contact(contact.id, db, user),
+        "search_contacts": lambda db: repository_contacts.search_contacts(db, "kova", user),
+        "get_upcoming_birthdays": lambda db: repository_contacts.get_upcoming_birthdays(db, user),
+        "lookup_contacts": lambda db: repository_contacts.lookup_contacts(contact.phone, db, user),
+        "contact_email_exists": lambda db: repository_contacts.contact_email_exists(contact.email, db, user),
+        "get_stats": lambda db: repository_stats.get_stats(db, user),
+        "count_contacts": lambda db: repository_stats.count_contacts(db, user),
+        "get_duplicate_groups": lambda db: repository_duplicates.get_duplicate_groups(10, 0, db, user),
+        "get_changes": lambda db: repository_changes.get_changes(0, 100, db, user),
+        "get_changes_since": lambda db: repository_changes.get_changes(1, 100, db, user),
+        "get_user_by_email": lambda db: repository_users.get_user_by_email(user.email, db),
+    }
+
+
+def predicates(statement: str) -> dict[str, list[tuple[str, str]]]:
+    """
+    The predicates function returns the filtered columns of every table in a statement, with the operator.
+
+    :param statement: str: The SQL as sent to the driver
+    :return: (column, operator) pairs by table
+    :doc-author: Trelent
+    """
+    where = re.split(r"\bWHERE\b", statement, maxsplit=1, flags=re.IGNORECASE)
+    found = defaultdict(list)
+    for clause in where[1:]:
+        for table, column, operator in _PREDICATE.findall(clause):
+            pair = (column, operator.upper())
+            if pair not in found[table]:
+                found[table].append(pair)
+    return found
+
+
+def suggest_index(columns: list[tuple[str, str]]) -> list[str]:
+    equality = [column for column, operator in columns if operator in EQUALITY]
+    ranges = [column for column, operator in columns if operator not in EQUALITY and operator not in ("LIKE", "ILIKE")]
+    ordered = []
+    for column in equality + ranges:
+        if column not in ordered:
+            ordered.append(column)
+    return ordered
+
+
+def plan_findings(dialect: str, plan) -> tuple[set[str], list[dict]]:
+    """
+    The plan_findings function walks a query plan and returns the indexes it uses and its filtered full scans.
+
+    :param dialect: str: postgresql or sqlite
+    :param plan: The JSON plan of PostgreSQL, or the rows of EXPLAIN QUERY PLAN of SQLite
+    :return: The used index names and the scans, each with the table and its cost figures
+    :doc-author: Trelent
+    """
+    used, scans = set(), []
+    if dialect == "postgresql":
+        def walk(node: dict) -> None:
+            if node.get("Index Name"):
+                used.add(node["Index Name"])
+            if node.get("Node Type") == "Seq Scan" and node.get("Filter"):
+                scans.append({"table": node["Relation Name"], "filter": node["Filter"],
+                              "rows_removed": node.get("Rows Removed by Filter", 0),
+                              "buffers": node.get("Shared Hit Blocks", 0) + node.get("Shared Read Blocks", 0)})
+            for child in node.get("Plans", []):
+                walk(child)
+
+        for entry in plan:
+            walk(entry["Plan"])
+    else:
+        for detail in plan:
+            match = _SQLITE_DETAIL.match(detail)
+            if match is None:
+                continue
+            kind, table, index = match.groups()
+            if index:
+                used.add(index)
+            elif kind == "SCAN":
+                scans.append({"table": table, "filter": detail})
+    return used, scans
+
+
+async def explain(engine, statement: str, parameters):
+    async with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            result = await conn.exec_driver_sql("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement, parameters)
+            plan = result.scalar_one()
+            return json.loads(plan) if isinstance(plan, str) else plan
+        result = await conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+        return [row[-1] for row in result]
+
+
+async def capture(engine, recorder: StatementRecorder, session_maker) -> dict[str, list[tuple[str, object]]]:
+    """
+    The capture function runs every query shape for the largest user and returns the statements each issued.
+
+    :param engine: AsyncEngine: The seeded engine
+    :param recorder: StatementRecorder: The statement recorder of the engine
+    :param session_maker: async_sessionmaker: Session factory bound to the engine
+    :return: The captured statements by query shape
+    :doc-author: Trelent
+    """
+    async with session_maker() as db:
+        user_id = (await db.execute(text(
+            "SELECT user_id FROM contacts GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1"))).scalar_one()
+        user = await db.get(User, user_id)
+        contact = (await db.execute(select(Contact).filter_by(user_id=user_id).limit(1))).scalar_one()
+
+    captured = {}
+    for name, call in cases(user, contact).items():
+        async with session_maker() as db:
+            recorder.active, recorder.statements = True, []
+            await call(db)
+            recorder.active = False
+        captured[name] = list(recorder.statements)
+
+    # Nothing was deleted before 2000: the purge and the tombstone expiry run their select and remove no rows
+    jobs = {"dedupe.load_candidates": lambda: load_candidates(engine, user_id),
+            "purge_contacts.purge_batch": lambda: purge_batch(engine, datetime(2000, 1, 1), 1000),
+            "purge_contacts.expire_tombstones": lambda: expire_tombstones(engine, datetime(2000, 1, 1), 1000)}
+    for name, call in jobs.items():
+        recorder.active, recorder.statements = True, []
+        await call()
+        recorder.active = False
+        captured[name] = list(recorder.statements)
+    async with engine.connect() as conn:
+        recorder.active, recorder.statements = True, []
+        await reconcile_users(conn, [user_id])
+        recorder.active = False
+        await conn.rollback()
+    captured["reconcile_stats.reconcile_users"] = [
+        (statement, parameters) for statement, parameters in recorder.statements if statement.lstrip().startswith("SELECT")
+    ]
+    return captured
+
+
+async def index_catalog(engine) -> dict[str, list[dict]]:
+    def read(sync_conn):
+        inspector = inspect(sync_conn)
+        return {table: inspector.get_indexes(table) for table in inspector.get_table_names()}
+
+    async with engine.connect() as conn:
+        return await conn.run_sync(read)
+
+
+async def index_usage(engine) -> dict[str, dict]:
+    if engine.dialect.name != "postgresql":
+        return {}
+    async with engine.connect() as conn:
+        rows = await conn.execute(text(
+            "SELECT indexrelname, idx_scan, pg_relation_size(indexrelid) FROM pg_stat_user_indexes"))
+        return {name: {"scans": scans, "bytes": size} for name, scans, size in rows}
+
+
+async def advise(engine, recorder: StatementRecorder, session_maker) -> dict:
+    """
+    The advise function captures and explains the query shapes and builds the report.
+
+    :param engine: AsyncEngine: The seeded engine
+    :param recorder: StatementRecorder: The statement recorder of the engine
+    :param session_maker: async_sessionmaker: Session factory bound to the engine
+    :return: The report: shapes with their plans, missing, unused and write amplification
+    :doc-author: Trelent
+    """
+    dialect = engine.dialect.name
+    captured = await capture(engine, recorder, session_maker)
+    used, missing, shapes = set(), {}, {}
+    for name, statements in captured.items():
+        shapes[name] = []
+        for statement, parameters in statements:
+            plan = await explain(engine, statement, parameters)
+            shape_used, scans = plan_findings(dialect, plan)
+            used |= shape_used
+            filtered = predicates(statement)
+            for scan in scans:
+                columns = suggest_index(filtered.get(scan["table"], []))
+                if columns:
+                    key = f"{scan['table']}({', '.join(columns)})"
+                    missing.setdefault(key, {"table": scan["table"], "columns": columns, "shapes": []})
+                    missing[key]["shapes"].append(name)
+            shapes[name].append({"statement": " ".join(statement.split()), "indexes": sorted(shape_used),
+                                 "full_scans": scans})
+
+    catalog = await index_catalog(engine)
+    usage = await index_usage(engine)
+    unused, constraints, writes = [], [], {}
+    for table, indexes in catalog.items():
+        writes[table] = len(indexes)
+        for index in indexes:
+            if index["name"] in used:
+                continue
+            entry = {"table": table, "name": index["name"], "columns": index["column_names"],
+                     **usage.get(index["name"], {})}
+            (constraints if index.get("unique") else unused).append(entry)
+    return {"dialect": dialect, "missing": list(missing.values()), "unused": unused,
+            "unused_unique": constraints, "indexes_per_insert": writes, "shapes": shapes}
+
+
+def print_report(report: dict) -> None:
+    print(f"\nMissing indexes ({report['dialect']}):")
+    for entry in report["missing"] or [{"table": "-", "columns": [], "shapes": []}]:
+        if entry["table"] != "-":
+            print(f"  {entry['table']} ({', '.join(entry['columns'])})  used by: {', '.join(entry['shapes'])}")
+    print("Unused indexes:")
+    for entry in report["unused"]:
+        usage = f"  scans={entry['scans']} size={entry['bytes'] // 1024} KiB" if "scans" in entry else ""
+        print(f"  {entry['table']}.{entry['name']} ({', '.join(entry['columns'])}){usage}")
+    print("Unused unique indexes (kept for their constraint):")
+    for entry in report["unused_unique"]:
+        print(f"  {entry['table']}.{entry['name']} ({', '.join(entry['columns'])})")
+    print("Indexes maintained by every INSERT:")
+    for table, count in sorted(report["indexes_per_insert"].items()):
+        print(f"  {table}: {count}")
+
+
+async def main_async(args) -> dict:
+    tmpdir = None
+    url = args.db_url
+    if url is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        url = f"sqlite+aiosqlite:///{tmpdir.name}/advisor.db"
+    engine = create_async_engine(url)
+    recorder = StatementRecorder(engine)
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        if not args.no_seed:
+            await seed(engine, args.size, args.distribution, args.seed)
+            print(f"Seeded {args.size} contacts for {len(owners(args.size, args.distribution))} users")
+        report = await advise(engine, recorder, session_maker)
+    finally:
+        await engine.dispose()
+        if tmpdir is not None:
+            tmpdir.cleanup()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100_000, help="total contacts of the seeded dataset")
+    parser.add_argument("--distribution", default="whale", choices=("whale", "small"))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db-url", help="async SQLAlchemy URL, default: temporary SQLite")
+    parser.add_argument("--no-seed", action="store_true", help="analyse the existing data of --db-url")
+    parser.add_argument("--plans", action="store_true", help="print the statements and their index use")
+    parser.add_argument("--output", help="write the report to this JSON file")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    if args.plans:
+        for name, statements in report["shapes"].items():
+            for entry in statements:
+                print(f"{name}: {entry['statement'][:140]}")
+                print(f"    indexes={entry['indexes']} full_scans={[scan['table'] for scan in entry['full_scans']]}")
+    print_report(report)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
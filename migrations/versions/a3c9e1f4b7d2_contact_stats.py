@@ -0,0 +1,54 @@
+"""Per-user contact stats
+
+Revision ID: a3c9e1f4b7d2
+Revises: 6b6f28ab44df
+Create Date: 2026-10-19 10:12:41.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c9e1f4b7d2'
+down_revision: Union[str, None] = '6b6f28ab44df'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('contact_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('completed', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('contact_month_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.SmallInteger(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'month')
+    )
+    # Backfill from the existing contacts; later drift is corrected by src.jobs.reconcile_stats
+    contacts = sa.table('contacts', sa.column('user_id', sa.Integer), sa.column('completed', sa.Boolean),
+                        sa.column('birthday', sa.Date))
+    stats = sa.table('contact_stats', sa.column('user_id'), sa.column('total'), sa.column('completed'),
+                     sa.column('updated_at'))
+    month_stats = sa.table('contact_month_stats', sa.column('user_id'), sa.column('month'), sa.column('count'))
+    op.execute(stats.insert().from_select(['user_id', 'total', 'completed', 'updated_at'], sa.select(
+        contacts.c.user_id, sa.func.count(), sa.func.sum(sa.case((contacts.c.completed.is_(True), 1), else_=0)),
+        sa.func.current_timestamp(),
+    ).where(contacts.c.user_id.is_not(None)).group_by(contacts.c.user_id)))
+    month = sa.extract('month', contacts.c.birthday)
+    op.execute(month_stats.insert().from_select(['user_id', 'month', 'count'], sa.select(
+        contacts.c.user_id, month, sa.func.count(),
+    ).where(contacts.c.user_id.is_not(None), contacts.c.birthday.is_not(None)).group_by(contacts.c.user_id, month)))
+
+def downgrade() -> None:
+    op.drop_table('contact_month_stats')
+    op.drop_table('contact_stats')
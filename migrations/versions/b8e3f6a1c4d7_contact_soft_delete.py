@@ -0,0 +1,95 @@
+"""Soft delete of contacts
+
+Revision ID: b8e3f6a1c4d7
+Revises: f4c8d1a6b2e9
+Create Date: 2026-10-19 15:02:18.734906
+
+Adds contacts.deleted_at and rebuilds the indexes of the contact queries as partial indexes over the contacts that
+are not deleted; the email stays unique among them only, so a deleted email can be used again. The purger finds
+its rows by the partial ix_contacts_deleted_at index. On PostgreSQL every index is built under a temporary name
+without blocking writes and swapped in by a rename (see f4c8d1a6b2e9 for partitioned tables).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e3f6a1c4d7'
+down_revision: Union[str, None] = 'f4c8d1a6b2e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LIVE = "deleted_at IS NULL"
+DELETED = "deleted_at IS NOT NULL"
+
+
+def _partitions(conn) -> list[str]:
+    return list(conn.execute(sa.text(
+        "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = 'contacts'::regclass")).scalars())
+
+
+def _indexes(partitioned: bool) -> dict[str, tuple[list[str], bool]]:
+    email = ('ix_contacts_user_id_email', (['user_id', 'email'], True)) if partitioned else \
+        ('ix_contacts_email', (['email'], True))
+    return dict([
+        ('ix_contacts_user_id_birthday', (['user_id', 'birthday'], False)),
+        ('ix_contacts_user_id_phone_e164', (['user_id', 'phone_e164'], False)),
+        email,
+    ])
+
+
+def _create_index(name: str, columns: list[str], unique: bool, where: str | None, partitions: list[str]) -> None:
+    unique_sql = "UNIQUE " if unique else ""
+    column_list = ", ".join(columns)
+    where_sql = f" WHERE {where}" if where else ""
+    if not partitions:
+        op.execute(f"CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {name} "
+                   f"ON contacts ({column_list}){where_sql}")
+        return
+    op.execute(f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON ONLY contacts ({column_list}){where_sql}")
+    for partition in partitions:
+        partition_index = f"{partition}_{name[len('ix_contacts_'):]}"
+        op.execute(f"CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {partition_index} "
+                   f"ON {partition} ({column_list}){where_sql}")
+        op.execute(f"ALTER INDEX {name} ATTACH PARTITION {partition_index}")
+
+
+def _rebuild_indexes(conn, where: str | None) -> None:
+    postgresql = conn.dialect.name == 'postgresql'
+    partitions = _partitions(conn) if postgresql else []
+    indexes = _indexes(bool(partitions))
+    if not postgresql:
+        for name, (columns, unique) in indexes.items():
+            op.drop_index(name, table_name='contacts')
+            op.create_index(name, 'contacts', columns, unique=unique,
+                            sqlite_where=sa.text(where) if where else None)
+        return
+    concurrently = "" if partitions else " CONCURRENTLY"
+    with op.get_context().autocommit_block():
+        for name, (columns, unique) in indexes.items():
+            # Only the index of the parent is renamed, the partition indexes keep the _new suffix
+            _create_index(f"{name}_new", columns, unique, where, partitions)
+            op.execute(f"DROP INDEX{concurrently} IF EXISTS {name}")
+            op.execute(f"ALTER INDEX {name}_new RENAME TO {name}")
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    conn = op.get_bind()
+    _rebuild_indexes(conn, LIVE)
+    if conn.dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            _create_index('ix_contacts_deleted_at', ['deleted_at'], False, DELETED, _partitions(conn))
+    else:
+        op.create_index('ix_contacts_deleted_at', 'contacts', ['deleted_at'], unique=False,
+                        sqlite_where=sa.text(DELETED))
+
+
+def downgrade() -> None:
+    # Deleted contacts can not be told apart without the column: they are purged before it is dropped
+    op.execute("DELETE FROM contacts WHERE deleted_at IS NOT NULL")
+    op.drop_index('ix_contacts_deleted_at', table_name='contacts')
+    _rebuild_indexes(op.get_bind(), None)
+    op.drop_column('contacts', 'deleted_at')
@@ -0,0 +1,56 @@
+"""Per-user contact change log
+
+Revision ID: c2d9e4b7a1f6
+Revises: b8e3f6a1c4d7
+Create Date: 2026-10-19 16:10:44.291573
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2d9e4b7a1f6'
+down_revision: Union[str, None] = 'b8e3f6a1c4d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contact_stats', sa.Column('change_seq', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('contact_stats', sa.Column('changes_floor', sa.BigInteger(), server_default='0', nullable=False))
+    op.create_table('contact_changes',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('contact_id', sa.Integer(), nullable=False),
+    sa.Column('seq', sa.BigInteger(), nullable=False),
+    sa.Column('op', sa.String(length=8), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'contact_id')
+    )
+    # The existing contacts are the first changes of their users, numbered by id; syncs start from there
+    contacts = sa.table('contacts', sa.column('id', sa.Integer), sa.column('user_id', sa.Integer),
+                        sa.column('deleted_at', sa.DateTime))
+    changes = sa.table('contact_changes', sa.column('user_id'), sa.column('contact_id'), sa.column('seq'),
+                       sa.column('op'), sa.column('changed_at'))
+    stats = sa.table('contact_stats', sa.column('user_id', sa.Integer), sa.column('change_seq', sa.BigInteger))
+    op.execute(changes.insert().from_select(['user_id', 'contact_id', 'seq', 'op', 'changed_at'], sa.select(
+        contacts.c.user_id, contacts.c.id,
+        sa.func.row_number().over(partition_by=contacts.c.user_id, order_by=contacts.c.id),
+        sa.literal('upsert'), sa.func.current_timestamp(),
+    ).where(contacts.c.user_id.is_not(None), contacts.c.deleted_at.is_(None))))
+    op.execute(stats.update().values(change_seq=sa.select(sa.func.coalesce(sa.func.max(changes.c.seq), 0)).where(
+        changes.c.user_id == stats.c.user_id).scalar_subquery()))
+    op.create_index('ix_contact_changes_user_id_seq', 'contact_changes', ['user_id', 'seq'], unique=False)
+    op.create_index('ix_contact_changes_tombstones', 'contact_changes', ['changed_at'], unique=False,
+                    postgresql_where=sa.text("op = 'delete'"), sqlite_where=sa.text("op = 'delete'"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contact_changes_tombstones', table_name='contact_changes')
+    op.drop_index('ix_contact_changes_user_id_seq', table_name='contact_changes')
+    op.drop_table('contact_changes')
+    op.drop_column('contact_stats', 'changes_floor')
+    op.drop_column('contact_stats', 'change_seq')
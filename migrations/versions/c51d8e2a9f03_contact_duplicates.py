@@ -0,0 +1,36 @@
+"""Contact duplicate groups
+
+Revision ID: c51d8e2a9f03
+Revises: a3c9e1f4b7d2
+Create Date: 2026-10-19 11:02:17.533920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c51d8e2a9f03'
+down_revision: Union[str, None] = 'a3c9e1f4b7d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('contact_duplicates',
+    sa.Column('contact_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('group_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['contact_id'], ['contacts.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('contact_id')
+    )
+    op.create_index('ix_contact_duplicates_user_id_group_id', 'contact_duplicates', ['user_id', 'group_id'],
+                    unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contact_duplicates_user_id_group_id', table_name='contact_duplicates')
+    op.drop_table('contact_duplicates')
@@ -0,0 +1,51 @@
+"""Normalized E.164 contact phone
+
+Revision ID: d7a4b2e6c815
+Revises: c51d8e2a9f03
+Create Date: 2026-10-19 11:48:05.117342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.services.phones import to_e164
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a4b2e6c815'
+down_revision: Union[str, None] = 'c51d8e2a9f03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+contacts = sa.table('contacts', sa.column('id', sa.Integer), sa.column('phone', sa.String),
+                    sa.column('phone_e164', sa.String))
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('phone_e164', sa.String(length=16), nullable=True))
+    conn = op.get_bind()
+    postgresql = conn.dialect.name == 'postgresql'
+    # Backfill and index outside the migration transaction: every batch commits on its own, so the table is not
+    # locked for the whole backfill, and the index is built without blocking writes
+    with op.get_context().autocommit_block():
+        last_id = 0
+        while True:
+            rows = conn.execute(sa.select(contacts.c.id, contacts.c.phone).where(contacts.c.id > last_id)
+                                .order_by(contacts.c.id).limit(BATCH_SIZE)).all()
+            if not rows:
+                break
+            values = [{'_id': row.id, '_phone_e164': to_e164(row.phone)} for row in rows]
+            conn.execute(contacts.update().where(contacts.c.id == sa.bindparam('_id'))
+                         .values(phone_e164=sa.bindparam('_phone_e164')), values)
+            last_id = rows[-1].id
+        op.create_index('ix_contacts_user_id_phone_e164', 'contacts', ['user_id', 'phone_e164'], unique=False,
+                        postgresql_concurrently=postgresql)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_phone_e164', table_name='contacts')
+    op.drop_column('contacts', 'phone_e164')
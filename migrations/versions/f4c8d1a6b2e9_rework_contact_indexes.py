@@ -0,0 +1,80 @@
+"""Rework contact indexes by query shape
+
+Revision ID: f4c8d1a6b2e9
+Revises: d7a4b2e6c815
+Create Date: 2026-10-19 14:21:37.508314
+
+Result of benchmarks/index_advisor.py: no query filters on first_name, phone, birthday or additional_data alone,
+so their indexes only slow down writes; every query filters on user_id, which had no index of its own. The
+composite (user_id, birthday) serves the upcoming birthdays range and every lookup by user_id.
+
+On PostgreSQL the indexes are built and dropped without blocking writes. CONCURRENTLY is not supported on a
+partitioned table, so there the index is created on the parent only, built concurrently on every partition and
+attached; dropping the index of a partitioned table only takes a short lock.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4c8d1a6b2e9'
+down_revision: Union[str, None] = 'd7a4b2e6c815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CREATED = {'ix_contacts_user_id_birthday': ['user_id', 'birthday']}
+DROPPED = {
+    'ix_contacts_first_name': ['first_name'],
+    'ix_contacts_phone': ['phone'],
+    'ix_contacts_birthday': ['birthday'],
+    'ix_contacts_additional_data': ['additional_data'],
+}
+
+
+def _partitions(conn) -> list[str]:
+    return list(conn.execute(sa.text(
+        "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = 'contacts'::regclass")).scalars())
+
+
+def _create_indexes(conn, indexes: dict[str, list[str]]) -> None:
+    if conn.dialect.name != 'postgresql':
+        for name, columns in indexes.items():
+            op.create_index(name, 'contacts', columns, unique=False)
+        return
+    partitions = _partitions(conn)
+    with op.get_context().autocommit_block():
+        for name, columns in indexes.items():
+            column_list = ", ".join(columns)
+            if not partitions:
+                op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON contacts ({column_list})")
+                continue
+            op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY contacts ({column_list})")
+            for partition in partitions:
+                op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition}_{name[len('ix_contacts_'):]} "
+                           f"ON {partition} ({column_list})")
+                op.execute(f"ALTER INDEX {name} ATTACH PARTITION {partition}_{name[len('ix_contacts_'):]}")
+
+
+def _drop_indexes(conn, indexes: dict[str, list[str]]) -> None:
+    if conn.dialect.name != 'postgresql':
+        for name in indexes:
+            op.drop_index(name, table_name='contacts')
+        return
+    concurrently = "" if _partitions(conn) else " CONCURRENTLY"
+    with op.get_context().autocommit_block():
+        for name in indexes:
+            op.execute(f"DROP INDEX{concurrently} IF EXISTS {name}")
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    _create_indexes(conn, CREATED)
+    _drop_indexes(conn, DROPPED)
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    _create_indexes(conn, DROPPED)
+    _drop_indexes(conn, CREATED)
@@ -1,3 +1,4 @@
+import os
 from typing import Any
 from pydantic import ConfigDict, field_validator, EmailStr
 from pydantic_settings import BaseSettings
@@ -18,6 +19,61 @@ class Settings(BaseSettings):
     CLOUDINARY_NAME: str = "cloud_name"
     CLOUDINARY_API_KEY: int = 472989382543829
     CLOUDINARY_API_SECRET: str = "secret"
+    TOKEN_CACHE_MAXSIZE: int = 10000
+    TOKEN_CACHE_TTL: int = 300
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
+    REVOCATION_BLOOM_CAPACITY: int = 100000
+    REVOCATION_BLOOM_ERROR_RATE: float = 0.001
+    REVOCATION_SYNC_INTERVAL: float = 1.0
+    RATE_LIMIT_DEFAULT: str = "60/60"
+    RATE_LIMITS: dict[str, str] = {
+        "contacts:read": "120/60",
+        "contacts:write": "30/60",
+        "contacts:batch": "10/60",
+        "users:me": "1/20",
+        "users:avatar": "1/20",
+    }
+    RATE_LIMIT_USERS: dict[str, dict[str, str]] = {}
+    RATE_LIMIT_SYNC_INTERVAL: float = 0.5
+    RATE_LIMIT_SYNC_BATCH: int = 50
+    DB_QUERY_HEADERS: bool = False
+    DB_QUERY_BUDGET_STRICT: bool = False
+    DB_SLOW_QUERY_MS: float = 200.0
+    RESPONSE_HEADERS: dict[str, str] = {"Custom": "Example"}
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"
+    WARMUP_DB_CONNECTIONS: int = 5
+    WARMUP_TIMEOUT: float = 5.0
+    WEB_HOST: str = "0.0.0.0"
+    WEB_PORT: int = 8000
+    WEB_WORKERS: int = 1
+    WEB_MAX_REQUESTS: int = 10000
+    WEB_MAX_REQUESTS_JITTER: int = 1000
+    WEB_GRACEFUL_TIMEOUT: int = 30
+    # Addresses whose X-Forwarded-For/Proto headers are trusted: only the local reverse proxy by default
+    WEB_FORWARDED_ALLOW_IPS: str = "127.0.0.1"
+    DB_MAX_CONNECTIONS: int = 40
+    DB_POOL_TIMEOUT: float = 10.0
+    DB_CONTACT_PARTITIONS: int = 0
+    REDIS_MAX_CONNECTIONS: int = 100
+    HASH_MAX_THREADS: int = 8
+    HEALTH_CHECK_INTERVAL: float = 2.0
+    HEALTH_CHECK_TIMEOUT: float = 1.0
+    PHONE_COUNTRY_CODE: str = "380"
+    EMAIL_BLOOM_CAPACITY: int = 1_000_000
+    EMAIL_BLOOM_ERROR_RATE: float = 0.01
+    # Every worker builds its email filters from the tables: at startup, then about once per interval or when the
+    # emails written by the worker saturate them
+    EMAIL_BLOOM_REBUILD_INTERVAL: float = 86400.0
+    PHONE_NATIONAL_DIGITS: int = 9
+    CONTACT_UNDO_WINDOW: float = 86400.0
+    CONTACT_TOMBSTONE_RETENTION: float = 90 * 86400.0
+    CONTACT_PURGE_HOURS: list[int] = [2, 3, 4]
+    CONTACT_PURGE_BATCH: int = 1000
+    CONTACT_PURGE_PAUSE: float = 0.5
+    CONTACT_PURGE_INTERVAL: float = 300.0
+    CONTACT_STREAM_QUEUE: int = 100
+    CONTACT_STREAM_KEEPALIVE: float = 15.0
 
     @field_validator("ALGORITHM")
     @classmethod
@@ -26,6 +82,28 @@ class Settings(BaseSettings):
             raise ValueError("algorithm must be HS256 or HS512")
         return v
 
+    @property
+    def workers(self) -> int:
+        """
+        The workers property returns the number of server processes; WEB_WORKERS=0 means one per CPU.
+
+        :param self: Represent the instance of the class
+        :return: The number of workers
+        :doc-author: Trelent
+        """
+        return self.WEB_WORKERS or os.cpu_count() or 1
+
+    def per_worker(self, total: int) -> int:
+        """
+        The per_worker function splits a limit that applies to the whole deployment (e.g. DB_MAX_CONNECTIONS)
+        between the workers, so that N workers together stay within it.
+
+        :param self: Represent the instance of the class
+        :param total: int: The global limit
+        :return: The share of one worker, at least 1
+        :doc-author: Trelent
+        """
+        return max(1, total // self.workers)
 
     model_config = ConfigDict(extra="ignore", env_file=".env", env_file_encoding="utf-8")   # noqa
 
@@ -7,8 +7,8 @@ from src.conf.config import config
 
 
 class DataBaseSessionManager:
-    def __init__(self, url: str):
-        self._engine: AsyncEngine = create_async_engine(url)
+    def __init__(self, url: str, **engine_options):
+        self._engine: AsyncEngine = create_async_engine(url, **engine_options)
         self._session_maker: async_sessionmaker = async_sessionmaker(autoflush=False, autocommit=False,
                                                                      bind=self._engine)
 
@@ -37,7 +37,23 @@ class DataBaseSessionManager:
             await session.close()
 
 
-sessionmanager = DataBaseSessionManager(config.DB_URL)
+def pool_options(url: str) -> dict:
+    """
+    The pool_options function sizes the connection pool of one worker from the global DB_MAX_CONNECTIONS. There is
+    no overflow, so all workers together never open more than DB_MAX_CONNECTIONS connections. SQLite has no
+    server-side limit and keeps the SQLAlchemy defaults.
+
+    :param url: str: The database URL
+    :return: Keyword arguments for create_async_engine
+    :doc-author: Trelent
+    """
+    if url.startswith("sqlite"):
+        return {}
+    return {"pool_size": config.per_worker(config.DB_MAX_CONNECTIONS), "max_overflow": 0,
+            "pool_timeout": config.DB_POOL_TIMEOUT, "pool_pre_ping": True}
+
+
+sessionmanager = DataBaseSessionManager(config.DB_URL, **pool_options(config.DB_URL))
 
 
 async def get_db():
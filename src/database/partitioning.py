@@ -0,0 +1,41 @@
+"""
+Hash partitioning of the contacts table by user_id on PostgreSQL, enabled with DB_CONTACT_PARTITIONS > 0.
+
+Every contact query filters by user_id, so each one is pruned to a single partition: vacuum, index size and the
+cost of a per-user query are bounded by the partition instead of the whole table. PostgreSQL requires the partition
+key in every unique constraint, so a partitioned contacts table has the primary key (user_id, id) and contact
+emails are unique per user instead of globally. The setting is for PostgreSQL only: SQLite does not generate ids
+for a composite primary key. An existing table is converted online by src.jobs.partition_contacts.
+"""
+from sqlalchemy import DDL, Table, event
+
+
+def partition_statements(table: str, partitions: int, parent: str | None = None) -> list[str]:
+    """
+    The partition_statements function returns the CREATE TABLE statements of the hash partitions of ``table``.
+
+    :param table: str: The partitioned table
+    :param partitions: int: Number of partitions, the modulus
+    :param parent: str | None: Prefix of the partition names, defaults to the table name
+    :return: One statement per partition
+    :doc-author: Trelent
+    """
+    parent = parent or table
+    return [f"CREATE TABLE {parent}_p{remainder} PARTITION OF {table} "
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})" for remainder in range(partitions)]
+
+
+def partition_table(table: Table, column: str, partitions: int) -> None:
+    """
+    The partition_table function makes metadata.create_all create ``table`` partitioned by hash of ``column``, with
+    its partitions, on PostgreSQL.
+
+    :param table: Table: The table to partition
+    :param column: str: The partition key
+    :param partitions: int: Number of partitions
+    :return: None
+    :doc-author: Trelent
+    """
+    table.dialect_options["postgresql"]["partition_by"] = f"HASH ({column})"
+    for statement in partition_statements(table.name, partitions):
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="postgresql"))
@@ -0,0 +1,59 @@
+import redis as sync_redis
+import redis.asyncio as redis
+
+from src.conf.config import config
+
+
+class RedisManager:
+    def __init__(self, host: str, port: int, password: str | None, max_connections: int | None = None):
+        self._host = host
+        self._port = port
+        self._password = password
+        self._max_connections = max_connections
+        self._client: redis.Redis | None = None
+        self._sync_client: sync_redis.Redis | None = None
+
+    @property
+    def client(self) -> redis.Redis:
+        """
+        The client property returns the shared asyncio Redis client, creating it on first use.
+        Creating the client does not open a connection; connections are taken from its pool lazily. The pool holds
+        at most ``max_connections`` connections and callers wait for a free one instead of failing.
+
+        :param self: Represent the instance of the class
+        :return: A redis.asyncio.Redis instance
+        :doc-author: Trelent
+        """
+        if self._client is None:
+            pool = redis.BlockingConnectionPool(host=self._host, port=self._port, db=0, password=self._password,
+                                                encoding="utf-8", decode_responses=True,
+                                                max_connections=self._max_connections or 50)
+            self._client = redis.Redis.from_pool(pool)
+        return self._client
+
+    @property
+    def sync_client(self) -> sync_redis.Redis:
+        """
+        The sync_client property returns the shared synchronous Redis client used by the user cache, creating it
+        on first use. Values are pickled, so responses are not decoded. It is only called from the event loop
+        thread, so its pool never holds more than one connection per worker.
+
+        :param self: Represent the instance of the class
+        :return: A redis.Redis instance
+        :doc-author: Trelent
+        """
+        if self._sync_client is None:
+            self._sync_client = sync_redis.Redis(host=self._host, port=self._port, db=0, password=self._password)
+        return self._sync_client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+
+
+redis_manager = RedisManager(config.REDIS_DOMAIN, config.REDIS_PORT, config.REDIS_PASSWORD,
+                             max_connections=config.per_worker(config.REDIS_MAX_CONNECTIONS))
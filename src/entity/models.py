@@ -1,34 +1,65 @@
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, DateTime, Boolean, Date
+from sqlalchemy import (Column, BigInteger, Integer, SmallInteger, String, ForeignKey, ForeignKeyConstraint, DateTime,
+                        Boolean, Date, Index, PrimaryKeyConstraint)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship, backref
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from datetime import datetime
 
+from src.conf.config import config
+from src.database.partitioning import partition_table
+
 # Створення об'єкта для базового класу
 Base = declarative_base()
 
+# Кількість хеш-секцій таблиці contacts за user_id (PostgreSQL), 0 - звичайна таблиця
+CONTACT_PARTITIONS = config.DB_CONTACT_PARTITIONS
+
+# Умова часткових індексів: вони містять лише не видалені контакти, бо кожен запит репозиторію фільтрує deleted_at
+LIVE_CONTACTS = {"postgresql_where": text("deleted_at IS NULL"), "sqlite_where": text("deleted_at IS NULL")}
+DELETED_CONTACTS = {"postgresql_where": text("deleted_at IS NOT NULL"),
+                    "sqlite_where": text("deleted_at IS NOT NULL")}
+
 # Клас для таблиці "contacts"
 class Contact(Base):
     __tablename__ = "contacts"
-    id = Column(Integer, primary_key=True)
-    first_name = Column(String(25), index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    first_name = Column(String(25))
     last_name = Column(String(25))
-    email = Column(String(50), unique=True, index=True)
-    phone = Column(String(50), index=True)
-    birthday = Column(Date, index=True)
-    additional_data = Column(String(50), index=True)
+    # Email унікальний серед не видалених контактів: ix_contacts_email, у секціонованій таблиці - в межах
+    # користувача, ix_contacts_user_id_email
+    email = Column(String(50))
+    phone = Column(String(50))
+    phone_e164 = Column(String(16), nullable=True)
+    birthday = Column(Date)
+    additional_data = Column(String(50))
     completed = Column(Boolean, default=False)
     created_at = Column(DateTime, default=func.now(), nullable=True)
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=True)
+    # М'яке видалення: контакт можна відновити до фізичного видалення src.jobs.purge_contacts
+    deleted_at = Column(DateTime, nullable=True)
+
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=bool(CONTACT_PARTITIONS),
+                     nullable=not CONTACT_PARTITIONS)
+    user = relationship("User", backref=backref("contacts", lazy="select"))
 
-    user_id = Column(Integer, ForeignKey('users.id'), nullable=True)
-    user = relationship("User", backref=backref("contacts", lazy="joined"))
+    # Індекси за запитами репозиторію (benchmarks/index_advisor.py): user_id першим, бо кожен запит фільтрує за ним
+    __table_args__ = (Index("ix_contacts_user_id_birthday", "user_id", "birthday", **LIVE_CONTACTS),
+                      Index("ix_contacts_user_id_phone_e164", "user_id", "phone_e164", **LIVE_CONTACTS),
+                      Index("ix_contacts_deleted_at", "deleted_at", **DELETED_CONTACTS),
+                      *([PrimaryKeyConstraint("user_id", "id", name="contacts_pkey"),
+                         Index("ix_contacts_user_id_email", "user_id", "email", unique=True, **LIVE_CONTACTS)]
+                        if CONTACT_PARTITIONS else
+                        [Index("ix_contacts_email", "email", unique=True, **LIVE_CONTACTS)]))
 
     def equals(self, other):
         if not isinstance(other, Contact):
             return False
         return self.__dict__ == other.__dict__
 
+
+if CONTACT_PARTITIONS:
+    partition_table(Contact.__table__, "user_id", CONTACT_PARTITIONS)
+
 # Клас для таблиці "users"
 class User(Base):
     __tablename__ = "users"
@@ -40,4 +71,54 @@ class User(Base):
     refresh_token = Column(String(255), nullable=True)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
-    confirmed = Column(Boolean, default=False, nullable=True)
\ No newline at end of file
+    confirmed = Column(Boolean, default=False, nullable=True)
+
+
+# Клас для таблиці "contact_stats": лічильники контактів користувача, оновлюються разом із контактами
+class ContactStats(Base):
+    __tablename__ = "contact_stats"
+    user_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+    # Останній номер у журналі змін користувача та номер, до якого видалено прострочені надгробки
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
+    changes_floor = Column(BigInteger, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=True)
+
+
+# Клас для таблиці "contact_month_stats": кількість контактів користувача за місяцем народження
+class ContactMonthStats(Base):
+    __tablename__ = "contact_month_stats"
+    user_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), primary_key=True)
+    month = Column(SmallInteger, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+# Клас для таблиці "contact_duplicates": групи ймовірних дублікатів, знайдені src.jobs.dedupe
+class ContactDuplicate(Base):
+    __tablename__ = "contact_duplicates"
+    contact_id = Column(Integer, *([] if CONTACT_PARTITIONS else [ForeignKey('contacts.id', ondelete="CASCADE")]),
+                        primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
+    group_id = Column(Integer, nullable=False)
+
+    __table_args__ = (Index("ix_contact_duplicates_user_id_group_id", "user_id", "group_id"),
+                      *([ForeignKeyConstraint(["user_id", "contact_id"], ["contacts.user_id", "contacts.id"],
+                                              name="contact_duplicates_contact_fkey", ondelete="CASCADE")]
+                        if CONTACT_PARTITIONS else []))
+
+
+# Клас для таблиці "contact_changes": журнал змін контактів для синхронізації, по рядку на контакт з номером
+# останньої зміни; для видалених контактів рядок лишається надгробком
+class ContactChange(Base):
+    __tablename__ = "contact_changes"
+    user_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), primary_key=True)
+    contact_id = Column(Integer, primary_key=True)
+    seq = Column(BigInteger, nullable=False)
+    op = Column(String(8), nullable=False)
+    changed_at = Column(DateTime, default=func.now(), nullable=False)
+
+    __table_args__ = (Index("ix_contact_changes_user_id_seq", "user_id", "seq"),
+                      Index("ix_contact_changes_tombstones", "changed_at", postgresql_where=text("op = 'delete'"),
+                            sqlite_where=text("op = 'delete'")))
+
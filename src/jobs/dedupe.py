@@ -0,0 +1,122 @@
+"""
+Finds the probable duplicate contacts of every user and stores them for GET /api/contacts/duplicates.
+
+The contacts of each user are loaded once and grouped in worker processes (src.services.dedupe.find_duplicates):
+candidates are compared only within their blocking keys, so an account of a million contacts is processed in
+near-linear time. Twice as many users as workers are grouped at once, each coroutine taking the next user when
+done; the groups of a user replace the stored ones in a single transaction. Run from the project root, e.g. nightly:
+
+    python -m src.jobs.dedupe --workers 8
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from src.conf.config import config
+from src.entity.models import Contact, ContactDuplicate, User
+from src.services.dedupe import Candidate, find_duplicates
+
+logger = logging.getLogger(__name__)
+
+
+async def load_candidates(engine: AsyncEngine, user_id: int) -> list[Candidate]:
+    stmt = select(Contact.id, Contact.first_name, Contact.last_name, Contact.email, Contact.phone,
+                  Contact.birthday).where(Contact.user_id == user_id, Contact.deleted_at.is_(None))
+    async with engine.connect() as conn:
+        return [Candidate(*row) for row in await conn.execute(stmt)]
+
+
+async def store_groups(engine: AsyncEngine, user_id: int, groups: list[list[int]], batch_size: int = 10_000) -> None:
+    """
+    The store_groups function replaces the stored duplicate groups of a user. The smallest contact id of a group
+    is its group id.
+
+    :param engine: AsyncEngine: The database
+    :param user_id: int: The owner of the contacts
+    :param groups: list[list[int]]: The groups found by find_duplicates
+    :param batch_size: int: Rows per INSERT
+    :return: None
+    :doc-author: Trelent
+    """
+    rows = [{"contact_id": contact_id, "user_id": user_id, "group_id": group[0]}
+            for group in groups for contact_id in group]
+    async with engine.begin() as conn:
+        await conn.execute(delete(ContactDuplicate).where(ContactDuplicate.user_id == user_id))
+        for start in range(0, len(rows), batch_size):
+            await conn.execute(insert(ContactDuplicate), rows[start:start + batch_size])
+
+
+async def dedupe_user(engine: AsyncEngine, user_id: int, executor: Executor | None = None) -> int:
+    """
+    The dedupe_user function finds and stores the duplicate groups of one user.
+
+    :param engine: AsyncEngine: The database
+    :param user_id: int: The owner of the contacts
+    :param executor: Executor | None: Where the grouping runs, None runs it in the default thread pool
+    :return: The number of groups
+    :doc-author: Trelent
+    """
+    candidates = await load_candidates(engine, user_id)
+    groups = await asyncio.get_running_loop().run_in_executor(executor, find_duplicates, candidates)
+    await store_groups(engine, user_id, groups)
+    return len(groups)
+
+
+async def dedupe(engine: AsyncEngine, workers: int = 1, user_ids: list[int] | None = None) -> int:
+    """
+    The dedupe function runs dedupe_user for the given users, or all users, in ``workers`` processes.
+
+    :param engine: AsyncEngine: The database
+    :param workers: int: Worker processes
+    :param user_ids: list[int] | None: The users to process, None processes all users
+    :return: The number of groups found
+    :doc-author: Trelent
+    """
+    started = time.perf_counter()
+    if user_ids is None:
+        async with engine.connect() as conn:
+            user_ids = list((await conn.execute(select(User.id).order_by(User.id))).scalars())
+    pending = iter(user_ids)
+    found = 0
+
+    with ProcessPoolExecutor(max(workers, 1)) as executor:
+        async def run() -> None:
+            # A fixed number of these take the next user when done, so one coroutine per user is never created
+            nonlocal found
+            for user_id in pending:
+                groups = await dedupe_user(engine, user_id, executor)
+                found += groups
+                if groups:
+                    logger.info("User %d: %d duplicate groups", user_id, groups)
+
+        await asyncio.gather(*(run() for _ in range(max(workers, 1) * 2)))
+    logger.info("Found %d duplicate groups of %d users in %.1fs", found, len(user_ids), time.perf_counter() - started)
+    return found
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--user-id", type=int, action="append", dest="user_ids", help="only this user, repeatable")
+    parser.add_argument("--db-url", default=config.DB_URL, help="async SQLAlchemy URL, default: config.DB_URL")
+    args = parser.parse_args()
+
+    async def run():
+        engine = create_async_engine(args.db_url)
+        try:
+            await dedupe(engine, args.workers, args.user_ids)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
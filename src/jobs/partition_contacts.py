@@ -0,0 +1,263 @@
+"""
+Converts the contacts table to the hash-partitioned layout of src.database.partitioning online, on PostgreSQL.
+
+The number of partitions is an argument, not read from the environment, and the job fails instead of doing
+nothing when the database can not be converted. Set DB_CONTACT_PARTITIONS to the same number in the application
+config before the workers are restarted on the new layout:
+
+1. contacts_partitioned is created with its partitions and indexes, and a trigger mirrors every write to contacts
+   into it; the mirrored rows overwrite the copied ones.
+2. Existing rows are copied in id ranges of --batch-size, each range committed on its own, while the application
+   keeps writing.
+3. In one transaction that locks contacts: the rows that differ from contacts, brought back or left stale by a
+   copy that raced a write, are removed and copied again, the trigger is dropped and the tables are swapped. The
+   old table stays as contacts_old (with the contacts without user_id, which a partitioned table can not hold)
+   until it is dropped by hand.
+
+Run from the project root after `alembic upgrade head`:
+
+    python -m src.jobs.partition_contacts --partitions 16
+
+--revert copies a partitioned table back into a plain one, offline: contacts is locked for the whole copy.
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
+
+from src.conf.config import config
+from src.database.partitioning import partition_statements
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("id", "first_name", "last_name", "email", "phone", "phone_e164", "birthday", "additional_data",
+           "completed", "created_at", "updated_at", "deleted_at", "user_id")
+COLUMN_LIST = ", ".join(COLUMNS)
+LIVE = "deleted_at IS NULL"
+# Name, columns, unique and condition of the contact indexes besides the primary key, see Contact.__table_args__
+INDEXES = (
+    ("ix_contacts_user_id_birthday", "user_id, birthday", False, LIVE),
+    ("ix_contacts_user_id_phone_e164", "user_id, phone_e164", False, LIVE),
+    ("ix_contacts_deleted_at", "deleted_at", False, "deleted_at IS NOT NULL"),
+)
+TABLE = """
+    CREATE TABLE {name} (
+        id INTEGER NOT NULL DEFAULT nextval('contacts_id_seq'),
+        first_name VARCHAR(25), last_name VARCHAR(25), email VARCHAR(50), phone VARCHAR(50),
+        phone_e164 VARCHAR(16), birthday DATE, additional_data VARCHAR(50), completed BOOLEAN,
+        created_at TIMESTAMP WITHOUT TIME ZONE, updated_at TIMESTAMP WITHOUT TIME ZONE,
+        deleted_at TIMESTAMP WITHOUT TIME ZONE,
+        user_id INTEGER {user_id} REFERENCES users (id),
+        CONSTRAINT {name}_pkey PRIMARY KEY ({key})
+    ){partitioned}
+"""
+
+
+def _row(alias: str) -> str:
+    return "(" + ", ".join(f"{alias}.{column}" for column in COLUMNS) + ")"
+
+
+def _index(name: str, table: str, columns: str, unique: bool, where: str) -> str:
+    return f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} ({columns}) WHERE {where}"
+
+
+async def _partitioned(conn: AsyncConnection) -> bool:
+    return (await conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'contacts'::regclass)"))).scalar()
+
+
+async def _check(conn: AsyncConnection, partitioned: bool) -> None:
+    if conn.dialect.name != "postgresql":
+        raise RuntimeError(f"Partitioning needs PostgreSQL, not {conn.dialect.name}")
+    if await _partitioned(conn) != partitioned:
+        raise RuntimeError(f"The contacts table is {'not ' if partitioned else 'already '}partitioned")
+
+
+async def prepare(conn: AsyncConnection, partitions: int) -> None:
+    """
+    The prepare function creates contacts_partitioned with its partitions and indexes and the trigger that mirrors
+    the writes to contacts into it.
+
+    :param conn: AsyncConnection: A connection in autocommit mode
+    :param partitions: int: Number of partitions
+    :return: None
+    :doc-author: Trelent
+    """
+    await conn.execute(text(TABLE.format(name="contacts_partitioned", user_id="NOT NULL", key="user_id, id",
+                                         partitioned=" PARTITION BY HASH (user_id)")))
+    for statement in partition_statements("contacts_partitioned", partitions, parent="contacts"):
+        await conn.execute(text(statement))
+    await conn.execute(text(_index("ix_contacts_user_id_email_partitioned", "contacts_partitioned", "user_id, email",
+                                   True, LIVE)))
+    for name, columns, unique, where in INDEXES:
+        await conn.execute(text(_index(f"{name}_partitioned", "contacts_partitioned", columns, unique, where)))
+
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in COLUMNS if column not in ("id", "user_id"))
+    await conn.execute(text(f"""
+        CREATE FUNCTION contacts_mirror() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND OLD.user_id IS DISTINCT FROM NEW.user_id) THEN
+                DELETE FROM contacts_partitioned WHERE user_id = OLD.user_id AND id = OLD.id;
+            END IF;
+            -- The row may have been copied by a range that has not committed yet: its copy is overwritten
+            IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.user_id IS NOT NULL THEN
+                INSERT INTO contacts_partitioned ({COLUMN_LIST}) VALUES {_row("NEW")}
+                ON CONFLICT (user_id, id) DO UPDATE SET {updates};
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """))
+    await conn.execute(text("CREATE TRIGGER contacts_mirror AFTER INSERT OR UPDATE OR DELETE ON contacts "
+                            "FOR EACH ROW EXECUTE FUNCTION contacts_mirror()"))
+
+
+async def copy(conn: AsyncConnection, batch_size: int) -> int:
+    """
+    The copy function copies the existing contacts into contacts_partitioned in id ranges, each committed on its
+    own. Rows mirrored by the trigger are newer and are kept.
+
+    :param conn: AsyncConnection: A connection in autocommit mode
+    :param batch_size: int: Ids per range
+    :return: The number of copied rows
+    :doc-author: Trelent
+    """
+    last_id = (await conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM contacts"))).scalar()
+    copied = 0
+    for start in range(0, last_id, batch_size):
+        result = await conn.execute(text(f"""
+            INSERT INTO contacts_partitioned ({COLUMN_LIST})
+            SELECT {COLUMN_LIST} FROM contacts
+            WHERE id > :start AND id <= :end AND user_id IS NOT NULL
+            ON CONFLICT DO NOTHING
+        """), {"start": start, "end": start + batch_size})
+        copied += result.rowcount
+        logger.info("Copied contacts up to id %d of %d", min(start + batch_size, last_id), last_id)
+    return copied
+
+
+async def swap(conn: AsyncConnection) -> int:
+    """
+    The swap function makes contacts_partitioned the contacts table, in the transaction of ``conn`` that locks
+    contacts. The rows that differ from contacts in any column are replaced first.
+
+    :param conn: AsyncConnection: A connection inside a transaction
+    :return: The number of rows that had to be fixed
+    :doc-author: Trelent
+    """
+    await conn.execute(text("LOCK TABLE contacts IN ACCESS EXCLUSIVE MODE"))
+    # A copy that read a row before a write committed brings back a deleted row or keeps an old version
+    fixed = (await conn.execute(text(f"""
+        DELETE FROM contacts_partitioned p WHERE NOT EXISTS (
+            SELECT 1 FROM contacts c WHERE c.id = p.id AND {_row("c")} IS NOT DISTINCT FROM {_row("p")})
+    """))).rowcount
+    fixed += (await conn.execute(text(f"""
+        INSERT INTO contacts_partitioned ({COLUMN_LIST})
+        SELECT {COLUMN_LIST} FROM contacts c WHERE c.user_id IS NOT NULL AND NOT EXISTS (
+            SELECT 1 FROM contacts_partitioned p WHERE p.user_id = c.user_id AND p.id = c.id)
+    """))).rowcount
+    for statement in (
+        "DROP TRIGGER contacts_mirror ON contacts",
+        "DROP FUNCTION contacts_mirror()",
+        "ALTER TABLE contact_duplicates DROP CONSTRAINT IF EXISTS contact_duplicates_contact_id_fkey",
+        "ALTER TABLE contacts RENAME TO contacts_old",
+        "ALTER INDEX contacts_pkey RENAME TO contacts_old_pkey",
+        "ALTER INDEX ix_contacts_email RENAME TO ix_contacts_old_email",
+        *(f"ALTER INDEX {name} RENAME TO {name.replace('ix_contacts_', 'ix_contacts_old_')}"
+          for name, *_ in INDEXES),
+        "ALTER TABLE contacts_partitioned RENAME TO contacts",
+        "ALTER INDEX contacts_partitioned_pkey RENAME TO contacts_pkey",
+        "ALTER INDEX ix_contacts_user_id_email_partitioned RENAME TO ix_contacts_user_id_email",
+        *(f"ALTER INDEX {name}_partitioned RENAME TO {name}" for name, *_ in INDEXES),
+        "ALTER SEQUENCE contacts_id_seq OWNED BY contacts.id",
+        "DELETE FROM contact_duplicates d WHERE NOT EXISTS "
+        "(SELECT 1 FROM contacts c WHERE c.user_id = d.user_id AND c.id = d.contact_id)",
+        "ALTER TABLE contact_duplicates ADD CONSTRAINT contact_duplicates_contact_fkey "
+        "FOREIGN KEY (user_id, contact_id) REFERENCES contacts (user_id, id) ON DELETE CASCADE",
+    ):
+        await conn.execute(text(statement))
+    return fixed
+
+
+async def partition(engine: AsyncEngine, partitions: int, batch_size: int = 50_000) -> None:
+    """
+    The partition function converts the contacts table to ``partitions`` hash partitions by user_id online.
+
+    :param engine: AsyncEngine: The PostgreSQL database
+    :param partitions: int: Number of partitions
+    :param batch_size: int: Ids per copied range
+    :return: None
+    :doc-author: Trelent
+    """
+    if partitions <= 0:
+        raise ValueError("The number of partitions must be positive")
+    started = time.perf_counter()
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await _check(conn, partitioned=False)
+        await prepare(conn, partitions)
+        copied = await copy(conn, batch_size)
+    async with engine.begin() as conn:
+        fixed = await swap(conn)
+    logger.info("Partitioned contacts into %d partitions: %d rows copied, %d fixed at the swap, in %.1fs",
+                partitions, copied, fixed, time.perf_counter() - started)
+
+
+async def revert(engine: AsyncEngine) -> None:
+    """
+    The revert function copies a partitioned contacts table back into a plain one. Contacts are locked until the
+    copy commits, and emails become unique across users again, so the copy fails on an email used by two users.
+
+    :param engine: AsyncEngine: The PostgreSQL database
+    :return: None
+    :doc-author: Trelent
+    """
+    async with engine.begin() as conn:
+        await _check(conn, partitioned=True)
+        for statement in (
+            "LOCK TABLE contacts IN ACCESS EXCLUSIVE MODE",
+            "ALTER TABLE contact_duplicates DROP CONSTRAINT IF EXISTS contact_duplicates_contact_fkey",
+            "DROP TABLE IF EXISTS contacts_old",
+            TABLE.format(name="contacts_plain", user_id="NULL", key="id", partitioned=""),
+            f"INSERT INTO contacts_plain ({COLUMN_LIST}) SELECT {COLUMN_LIST} FROM contacts",
+            "ALTER SEQUENCE contacts_id_seq OWNED BY contacts_plain.id",
+            "DROP TABLE contacts",
+            "ALTER TABLE contacts_plain RENAME TO contacts",
+            "ALTER INDEX contacts_plain_pkey RENAME TO contacts_pkey",
+            _index("ix_contacts_email", "contacts", "email", True, LIVE),
+            *(_index(name, "contacts", columns, unique, where) for name, columns, unique, where in INDEXES),
+            "ALTER TABLE contact_duplicates ADD CONSTRAINT contact_duplicates_contact_id_fkey "
+            "FOREIGN KEY (contact_id) REFERENCES contacts (id) ON DELETE CASCADE",
+        ):
+            await conn.execute(text(statement))
+    logger.info("Copied the partitioned contacts back into a plain table")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--partitions", type=int, help="number of hash partitions")
+    group.add_argument("--revert", action="store_true", help="copy back into a plain table")
+    parser.add_argument("--batch-size", type=int, default=50_000, help="ids per copied range")
+    parser.add_argument("--db-url", default=config.DB_URL, help="async SQLAlchemy URL, default: config.DB_URL")
+    args = parser.parse_args()
+
+    async def run():
+        engine = create_async_engine(args.db_url)
+        try:
+            if args.revert:
+                await revert(engine)
+            else:
+                await partition(engine, args.partitions, args.batch_size)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
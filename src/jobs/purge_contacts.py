@@ -0,0 +1,140 @@
+"""
+Removes the softly deleted contacts whose undo window (CONTACT_UNDO_WINDOW) has passed.
+
+Rows are deleted in batches of --batch-size ordered by deletion time through the partial ix_contacts_deleted_at
+index, each batch in its own short transaction with a pause in between, so the purge never holds locks on many
+rows or floods replication. On PostgreSQL the rows of a batch are taken with SKIP LOCKED: purgers of several
+workers split the rows instead of waiting on each other. The stats are not changed, deleted contacts are no
+longer counted.
+
+The tombstones of the change log (src.repository.changes) are kept for CONTACT_TOMBSTONE_RETENTION and then
+removed the same way; the change number up to which they are gone is stored as the changes floor of the user, so
+clients that synced before it are told to sync in full. The application runs the purge off-peak
+(src.services.purger); to run it by hand from the project root:
+
+    python -m src.jobs.purge_contacts --batch-size 1000
+"""
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from src.conf.config import config
+from src.entity.models import Contact, ContactChange, ContactStats
+from src.repository.changes import DELETE
+from src.services.metrics import CONTACTS_PURGED
+
+logger = logging.getLogger(__name__)
+
+
+async def purge_batch(engine: AsyncEngine, deleted_before: datetime, batch_size: int) -> int:
+    """
+    The purge_batch function removes up to ``batch_size`` contacts deleted before ``deleted_before``.
+
+    :param engine: AsyncEngine: The database
+    :param deleted_before: datetime: Contacts deleted earlier are removed
+    :param batch_size: int: Maximum number of rows removed
+    :return: The number of removed contacts
+    :doc-author: Trelent
+    """
+    async with engine.begin() as conn:
+        # (user_id, id) prunes the partitions of a partitioned table and matches its primary key
+        keys = (await conn.execute(
+            select(Contact.user_id, Contact.id).where(Contact.deleted_at < deleted_before)
+            .order_by(Contact.deleted_at).limit(batch_size).with_for_update(skip_locked=True))).all()
+        if keys:
+            await conn.execute(delete(Contact).where(tuple_(Contact.user_id, Contact.id).in_(
+                [tuple(key) for key in keys])))
+    CONTACTS_PURGED.inc(amount=len(keys))
+    return len(keys)
+
+
+async def expire_tombstones(engine: AsyncEngine, changed_before: datetime, batch_size: int) -> int:
+    """
+    The expire_tombstones function removes up to ``batch_size`` tombstones recorded before ``changed_before`` and
+    raises the changes floor of their users.
+
+    :param engine: AsyncEngine: The database
+    :param changed_before: datetime: Tombstones recorded earlier are removed
+    :param batch_size: int: Maximum number of rows removed
+    :return: The number of removed tombstones
+    :doc-author: Trelent
+    """
+    async with engine.begin() as conn:
+        rows = (await conn.execute(
+            select(ContactChange.user_id, ContactChange.contact_id, ContactChange.seq)
+            .where(ContactChange.op == DELETE, ContactChange.changed_at < changed_before)
+            .order_by(ContactChange.changed_at).limit(batch_size).with_for_update(skip_locked=True))).all()
+        if rows:
+            floors: dict[int, int] = {}
+            for user_id, _, seq in rows:
+                floors[user_id] = max(floors.get(user_id, 0), seq)
+            keys = [(user_id, contact_id) for user_id, contact_id, _ in rows]
+            await conn.execute(delete(ContactChange).where(
+                tuple_(ContactChange.user_id, ContactChange.contact_id).in_(keys)))
+            for user_id, floor in sorted(floors.items()):
+                await conn.execute(update(ContactStats).where(ContactStats.user_id == user_id,
+                                                              ContactStats.changes_floor < floor)
+                                   .values(changes_floor=floor))
+    return len(rows)
+
+
+async def purge(engine: AsyncEngine, batch_size: int = 1000, pause: float = 0.0, undo_window: float | None = None,
+                until=None) -> int:
+    """
+    The purge function removes the deleted contacts past the undo window, then the expired tombstones, batch by
+    batch until none is left.
+
+    :param engine: AsyncEngine: The database
+    :param batch_size: int: Rows per transaction
+    :param pause: float: Seconds to wait between batches
+    :param undo_window: float | None: Seconds a deleted contact is kept, default: CONTACT_UNDO_WINDOW
+    :param until: Callable returning False to stop before the next batch, e.g. at the end of the off-peak hours
+    :return: The number of removed contacts
+    :doc-author: Trelent
+    """
+    async def drain(step, before: datetime) -> int:
+        removed = 0
+        while until is None or until():
+            batch = await step(engine, before, batch_size)
+            removed += batch
+            if batch < batch_size:
+                break
+            await asyncio.sleep(pause)
+        return removed
+
+    started = time.perf_counter()
+    window = config.CONTACT_UNDO_WINDOW if undo_window is None else undo_window
+    purged = await drain(purge_batch, datetime.now() - timedelta(seconds=window))
+    expired = await drain(expire_tombstones,
+                          datetime.now() - timedelta(seconds=config.CONTACT_TOMBSTONE_RETENTION))
+    if purged or expired:
+        logger.info("Purged %d deleted contacts and %d tombstones in %.1fs", purged, expired,
+                    time.perf_counter() - started)
+    return purged
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=config.CONTACT_PURGE_BATCH, help="rows per transaction")
+    parser.add_argument("--pause", type=float, default=config.CONTACT_PURGE_PAUSE, help="seconds between batches")
+    parser.add_argument("--db-url", default=config.DB_URL, help="async SQLAlchemy URL, default: config.DB_URL")
+    args = parser.parse_args()
+
+    async def run():
+        engine = create_async_engine(args.db_url)
+        try:
+            await purge(engine, args.batch_size, args.pause)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
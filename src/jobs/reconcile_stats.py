@@ -0,0 +1,130 @@
+"""
+Recomputes the per-user contact stats from the contacts table and corrects the rows that drifted. Deleted
+contacts are not counted.
+
+The stats are maintained incrementally by the contacts repository; rows written around it (bulk imports, manual
+fixes, the seeder) make them drift. Users are processed in batches of --batch-size, each batch in its own
+transaction that first locks the stats rows of the batch, so writers of those users wait until it commits and
+no increment is lost. Run from the project root, e.g. nightly:
+
+    python -m src.jobs.reconcile_stats --batch-size 1000
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from sqlalchemy import case, delete, extract, func, select, update
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
+
+from src.conf.config import config
+from src.entity.models import Contact, ContactMonthStats, ContactStats, User
+from src.repository.stats import _insert
+
+logger = logging.getLogger(__name__)
+
+
+async def reconcile_users(conn: AsyncConnection, user_ids: list[int]) -> list[int]:
+    """
+    The reconcile_users function compares the stored stats of the given users with the counts of their contacts
+    and rewrites the stats of the users that differ.
+
+    :param conn: AsyncConnection: A connection inside a transaction
+    :param user_ids: list[int]: The users to check
+    :return: The ids of the corrected users
+    :doc-author: Trelent
+    """
+    stored = {row.user_id: (row.total, row.completed) for row in await conn.execute(
+        select(ContactStats.user_id, ContactStats.total, ContactStats.completed)
+        .where(ContactStats.user_id.in_(user_ids)).with_for_update())}
+    stored_months: dict[int, dict[int, int]] = {}
+    for row in await conn.execute(select(ContactMonthStats.user_id, ContactMonthStats.month, ContactMonthStats.count)
+                                  .where(ContactMonthStats.user_id.in_(user_ids), ContactMonthStats.count != 0)):
+        stored_months.setdefault(row.user_id, {})[row.month] = row.count
+
+    actual = {row.user_id: (row.total, row.completed) for row in await conn.execute(
+        select(Contact.user_id, func.count().label("total"),
+               func.coalesce(func.sum(case((Contact.completed.is_(True), 1), else_=0)), 0).label("completed"))
+        .where(Contact.user_id.in_(user_ids), Contact.deleted_at.is_(None)).group_by(Contact.user_id))}
+    month = extract("month", Contact.birthday)
+    actual_months: dict[int, dict[int, int]] = {}
+    for row in await conn.execute(select(Contact.user_id, month.label("month"), func.count().label("count"))
+                                  .where(Contact.user_id.in_(user_ids), Contact.birthday.is_not(None),
+                                         Contact.deleted_at.is_(None))
+                                  .group_by(Contact.user_id, month)):
+        actual_months.setdefault(row.user_id, {})[int(row.month)] = row.count
+
+    corrected = []
+    for user_id in user_ids:
+        counts = actual.get(user_id, (0, 0))
+        months = actual_months.get(user_id, {})
+        if stored.get(user_id, (0, 0)) == counts and stored_months.get(user_id, {}) == months:
+            continue
+        corrected.append(user_id)
+        if user_id in stored:
+            await conn.execute(update(ContactStats).where(ContactStats.user_id == user_id)
+                               .values(total=counts[0], completed=counts[1]))
+        else:
+            # The missing row was not locked: a concurrent writer may create it first, so this is an upsert too
+            stmt = _insert(conn)(ContactStats).values(user_id=user_id, total=counts[0], completed=counts[1])
+            await conn.execute(stmt.on_conflict_do_update(index_elements=[ContactStats.user_id], set_={
+                "total": stmt.excluded.total, "completed": stmt.excluded.completed,
+            }))
+        await conn.execute(delete(ContactMonthStats).where(ContactMonthStats.user_id == user_id))
+        if months:
+            stmt = _insert(conn)(ContactMonthStats).values([
+                {"user_id": user_id, "month": m, "count": count} for m, count in sorted(months.items())
+            ])
+            await conn.execute(stmt.on_conflict_do_update(
+                index_elements=[ContactMonthStats.user_id, ContactMonthStats.month],
+                set_={"count": stmt.excluded.count}))
+    return corrected
+
+
+async def reconcile(engine: AsyncEngine, batch_size: int = 1000) -> int:
+    """
+    The reconcile function walks over all users in batches of ``batch_size`` and corrects their stats.
+
+    :param engine: AsyncEngine: The database to reconcile
+    :param batch_size: int: Users per transaction
+    :return: The number of corrected users
+    :doc-author: Trelent
+    """
+    started = time.perf_counter()
+    last_id, checked, corrected = 0, 0, 0
+    while True:
+        async with engine.begin() as conn:
+            user_ids = list((await conn.execute(
+                select(User.id).where(User.id > last_id).order_by(User.id).limit(batch_size))).scalars())
+            if not user_ids:
+                break
+            fixed = await reconcile_users(conn, user_ids)
+        if fixed:
+            logger.warning("Corrected contact stats of %d users: %s", len(fixed), fixed[:20])
+        checked += len(user_ids)
+        corrected += len(fixed)
+        last_id = user_ids[-1]
+    logger.info("Reconciled contact stats of %d users, %d corrected, in %.1fs", checked, corrected,
+                time.perf_counter() - started)
+    return corrected
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000, help="users per transaction")
+    parser.add_argument("--db-url", default=config.DB_URL, help="async SQLAlchemy URL, default: config.DB_URL")
+    args = parser.parse_args()
+
+    async def run():
+        engine = create_async_engine(args.db_url)
+        try:
+            await reconcile(engine, args.batch_size)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
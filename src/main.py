@@ -1,49 +1,119 @@
-import redis.asyncio as redis
+import logging
+import time
+
+IMPORT_STARTED = time.perf_counter()
+
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Depends, HTTPException
-from fastapi_limiter import FastAPILimiter
-from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 
-from src.database.db import get_db
-from src.routes import contacts, auth, users
+from src.database.db import sessionmanager
+from src.database.redis_client import redis_manager
+from src.routes import contacts, auth, users, batch
 from src.conf.config import config
+from src.middlewares.metrics import MetricsMiddleware
+from src.middlewares.query_stats import QueryStatsMiddleware
+from src.middlewares.recycle import WorkerRecycleMiddleware
+from src.middlewares.request_context import HandlerTimingMiddleware, RequestContextMiddleware, RequestIdFilter
+from src.services import query_stats
+from src.services.contact_events import contact_events
+from src.services.email_index import email_index
+from src.services.health import health_checker
+from src.services.metrics import instrument_engine, registry
+from src.services.purger import contact_purger
+from src.services.rate_limit import rate_limiter
+from src.services.revocation import revocation_list
+from src.services.warmup import startup_report, warm_up
+
+def configure_logging() -> None:
+    """
+    The configure_logging function sends the logs of the application to stderr with the id of the request they were
+    written for (LOG_FORMAT). A handler configured before, e.g. by a logging config, keeps its format and gets the
+    request_id attribute too.
+
+    :return: None
+    :doc-author: Trelent
+    """
+    root = logging.getLogger()
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(config.LOG_FORMAT))
+        root.addHandler(handler)
+        root.setLevel(config.LOG_LEVEL)
+    # A filter on a handler sees the records of every logger, a filter on a logger only its own records
+    for handler in root.handlers:
+        if not any(isinstance(log_filter, RequestIdFilter) for log_filter in handler.filters):
+            handler.addFilter(RequestIdFilter())
+
+
+configure_logging()
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     The lifespan function is a function that will be called when the application starts up, and it will also be called
     when the application shuts down. It's useful for setting up resources that need to exist for as long as your
-    application is running. In this case, we're using it to create a connection pool to our Redis server.
+    application is running. In this case, we're using it to create the Redis clients, start the background sync
+    tasks, the email index build and the off-peak contact purger, and warm up the database pool, bcrypt and the hot
+    statements before the first request. The health checker runs a first check before the worker reports ready.
+    The duration of every startup phase is published by startup_report.
 
     :param app: FastAPI: Pass the fastapi object to the function
     :return: A coroutine, which is a function that can be paused and resumed
     :doc-author: Trelent
     """
-    redis_client = await redis.Redis(host=config.REDIS_DOMAIN, port=config.REDIS_PORT, db=0,
-                                     password=config.REDIS_PASSWORD, encoding="utf-8", decode_responses=True)
-    await FastAPILimiter.init(redis_client)
-    app.state.redis_client = redis_client
+    started = time.perf_counter()
+    app.state.redis_client = redis_manager.client
+    app.state.user_cache = redis_manager.sync_client
+    revocation_list.start(config.REVOCATION_SYNC_INTERVAL)
+    rate_limiter.start()
+    email_index.start()
+    contact_purger.start()
+    phases = await warm_up(sessionmanager.async_engine, sessionmanager.async_session)
+    await health_checker.check()
+    health_checker.start()
+    app.state.startup = startup_report({"import": IMPORT_SECONDS, **phases, "lifespan": time.perf_counter() - started})
     yield
-    await redis_client.close()
+    await health_checker.stop()
+    await contact_events.stop()
+    await contact_purger.stop()
+    await email_index.stop()
+    await rate_limiter.stop()
+    await revocation_list.stop()
+    await redis_manager.close()
 
 app = FastAPI(lifespan=lifespan)
 
+# Middlewares added last run first: request context -> CORS -> metrics -> query stats -> handler timing -> routes
 origins = ["*"]
+app.add_middleware(HandlerTimingMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "Server-Timing", "X-Total-Count", "X-Total-Count-Exact"],
 )
+app.add_middleware(RequestContextMiddleware, static_headers=config.RESPONSE_HEADERS)
+if config.workers > 1 and config.WEB_MAX_REQUESTS > 0:
+    app.add_middleware(WorkerRecycleMiddleware, max_requests=config.WEB_MAX_REQUESTS,
+                       jitter=config.WEB_MAX_REQUESTS_JITTER)
+instrument_engine(sessionmanager.async_engine)
+query_stats.instrument_engine(sessionmanager.async_engine)
 
 
 app.include_router(auth.router, prefix="/api")
 app.include_router(users.router, prefix="/api")
 app.include_router(contacts.router, prefix="/api")
+app.include_router(batch.router, prefix="/api")
+
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
 
 
 @app.get("/")
@@ -59,31 +129,56 @@ def index():
     return {"message": "Contact Application"}
 
 
-@app.get("/api/healthchecker")
-async def healthchecker(db: AsyncSession = Depends(get_db)):
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
     """
-    The healthchecker function is a simple function that checks the health of the database.
-    It does this by making a request to the database and checking if it returns any results.
-    If it doesn't, then we know something is wrong with our connection.
+    The metrics function exposes the application metrics in the Prometheus text format: per-route latency
+    histograms, in-flight requests, SQL statement counts and durations, cache and rate limiter counters.
 
-    :param db: AsyncSession: Inject the database session into the function
-    :return: A dict with a message
+    :return: The exposition text
     :doc-author: Trelent
     """
-    try:
-        # Make request
-        result = await db.execute(text("SELECT 1"))
-        result = result.fetchone()
-        if result is None:
-            raise HTTPException(status_code=500, detail="Database is not configured correctly")
-        return {"message": "Welcome to FastAPI!"}
-    except Exception as e:
-        print(e)
-        raise HTTPException(status_code=500, detail="Error connecting to the database")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 
+@app.get("/live", include_in_schema=False)
+async def live():
+    """
+    The live function is the liveness probe: it answers as long as the worker's event loop is serving requests
+    and never touches the database or Redis.
 
+    :return: A dict with the status
+    :doc-author: Trelent
+    """
+    return {"status": "alive"}
 
 
+@app.get("/ready", include_in_schema=False)
+async def ready():
+    """
+    The ready function is the readiness probe. It is answered from the results cached by the background
+    HealthChecker, so probes do not take pool connections: 200 when the database and Redis answered the last
+    check, 503 otherwise or when the last check is too old.
+
+    :return: The cached health report
+    :doc-author: Trelent
+    """
+    report = health_checker.report()
+    return JSONResponse(report, status_code=200 if health_checker.ready else 503)
 
 
+@app.get("/api/healthchecker")
+async def healthchecker():
+    """
+    The healthchecker function reports whether the database is reachable, from the results cached by the
+    background HealthChecker.
+
+    :return: A dict with a message
+    :doc-author: Trelent
+    """
+    database = health_checker.results.get("database")
+    if database is None or health_checker.stale:
+        raise HTTPException(status_code=503, detail="Health check has not completed")
+    if not database["ok"]:
+        raise HTTPException(status_code=500, detail="Error connecting to the database")
+    return {"message": "Welcome to FastAPI!"}
@@ -0,0 +1,42 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.services.metrics import HTTP_IN_FLIGHT, HTTP_LATENCY, HTTP_REQUESTS
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware that records per-route latency histograms, request counts and in-flight gauges.
+
+    Requests are labelled with the route template (e.g. ``/api/contacts/{contact_id}``), not the raw path, so the
+    number of series stays bounded.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        start = time.perf_counter()
+        HTTP_IN_FLIGHT.inc(method)
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", "<unmatched>")
+            HTTP_LATENCY.observe(time.perf_counter() - start, method, path)
+            HTTP_REQUESTS.inc(method, path, status_code)
+            HTTP_IN_FLIGHT.dec(method)
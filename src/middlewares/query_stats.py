@@ -0,0 +1,42 @@
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.conf.config import config
+from src.services import query_stats
+
+
+class QueryStatsMiddleware:
+    """
+    Pure ASGI middleware that accounts SQL statements, rows and time per request.
+
+    With config.DB_QUERY_HEADERS enabled (dev mode) the totals are returned in the ``Server-Timing`` and
+    ``X-DB-Queries`` headers. Routes that declare a QueryBudget are checked when the response starts.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats, token = query_stats.begin()
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                route = getattr(scope.get("route"), "path", scope["path"])
+                stats.route = route
+                query_stats.check_budget(stats, route)
+                if config.DB_QUERY_HEADERS:
+                    headers = MutableHeaders(scope=message)
+                    timing = f'db;dur={stats.duration * 1000:.2f};desc="{stats.statements} queries"'
+                    headers.append("Server-Timing", timing)
+                    headers.append("X-DB-Queries", str(stats.statements))
+                    headers.append("X-DB-Rows", str(stats.rows))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            query_stats.end(token)
@@ -0,0 +1,38 @@
+import logging
+import os
+import random
+import signal
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerRecycleMiddleware:
+    """
+    Pure ASGI middleware that retires the worker process after ``max_requests`` requests plus a random jitter.
+
+    The worker sends itself SIGTERM, so uvicorn stops accepting connections, finishes the requests in flight and
+    runs the lifespan shutdown; the uvicorn supervisor then starts a fresh worker. The jitter keeps workers that
+    were started together from recycling at the same time. Only useful with more than one worker, see src.serve.
+    """
+
+    def __init__(self, app: ASGIApp, max_requests: int, jitter: int = 0):
+        self.app = app
+        self.limit = max_requests + random.randint(0, max(jitter, 0))
+        self.requests = 0
+        self.recycling = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        self.requests += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if self.requests >= self.limit and not self.recycling:
+                self.recycling = True
+                logger.info("Worker %d handled %d requests, recycling", os.getpid(), self.requests)
+                os.kill(os.getpid(), signal.SIGTERM)
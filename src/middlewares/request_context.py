@@ -0,0 +1,98 @@
+import logging
+import re
+import time
+import uuid
+from contextvars import ContextVar
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Logging filter that adds the id of the current request to every record as ``record.request_id``.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class RequestContextMiddleware:
+    """
+    Pure ASGI middleware for request-ID propagation, total request timing and static response headers.
+
+    The incoming ``X-Request-ID`` is reused when it is well-formed, otherwise a new id is generated. The id is
+    returned in the response, stored in ``request.state.request_id`` and available to logging through
+    RequestIdFilter. The time until the response starts is reported as ``Server-Timing: total``, next to the
+    ``app`` entry recorded by HandlerTimingMiddleware.
+
+    Unlike BaseHTTPMiddleware this wraps only the ``send`` callable: no extra task, no response body buffering,
+    streaming responses and client disconnects pass straight through.
+    """
+
+    def __init__(self, app: ASGIApp, static_headers: dict[str, str] | None = None,
+                 header_name: str = "X-Request-ID"):
+        self.app = app
+        self.header_name = header_name
+        self.static_headers = list((static_headers or {}).items())
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        request_id = Headers(scope=scope).get(self.header_name)
+        if request_id is None or not _VALID_REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        state = scope.setdefault("state", {})
+        state["request_id"] = request_id
+        token = request_id_var.set(request_id)
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers[self.header_name] = request_id
+                for name, value in self.static_headers:
+                    headers[name] = value
+                timing = f"total;dur={(time.perf_counter() - start) * 1000:.2f}"
+                handler = state.get("handler_duration")
+                if handler is not None:
+                    timing += f", app;dur={handler * 1000:.2f}"
+                headers.append("Server-Timing", timing)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
+
+
+class HandlerTimingMiddleware:
+    """
+    Innermost pure ASGI middleware that measures the time spent in routing, dependencies and the endpoint, up to
+    the start of the response. The value is read by RequestContextMiddleware.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        state = scope.setdefault("state", {})
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                state["handler_duration"] = time.perf_counter() - start
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,132 @@
+from datetime import datetime
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.entity.models import CONTACT_PARTITIONS, Contact, User
+from src.repository import changes as repository_changes
+from src.repository import stats as repository_stats
+from src.schemas.contact import ContactBatchCreate, ContactBatchDelete, ContactBatchUpdate
+from src.services.phones import to_e164
+
+
+def _result(op: str, status: int, contact_id: int | None = None, detail: str | None = None) -> dict:
+    return {"op": op, "status": status, "id": contact_id, "contact": None, "detail": detail}
+
+
+async def run_batch(operations: list[ContactBatchCreate | ContactBatchUpdate | ContactBatchDelete], db: AsyncSession,
+                    user: User) -> tuple[list[dict], list[Contact]]:
+    """
+    The run_batch function applies contact operations in order in one transaction, with a fixed number of
+    statements whatever their number: the operations are checked against the contacts and emails loaded up front,
+    then all deletes are one UPDATE, all updates one executemany UPDATE and all creates one INSERT, followed by a
+    single stats upsert and change log write. An operation that fails its check (404, or 409 for an email taken
+    before the batch or earlier in it) is reported and skipped; the others are applied. An email freed by the
+    batch can only be reused by a later request.
+
+    :param operations: list: The create, update and delete operations
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: The owner of the contacts
+    :return: The result of every operation, in order, and the contacts that are live after the batch
+    :doc-author: Trelent
+    """
+    ids = {operation.id for operation in operations if not isinstance(operation, ContactBatchCreate)}
+    loaded: dict[int, Contact] = {}
+    if ids:
+        stmt = select(Contact).where(Contact.id.in_(ids), Contact.user_id == user.id, Contact.deleted_at.is_(None))
+        loaded = {contact.id: contact for contact in (await db.execute(stmt)).scalars()}
+    # Read before the writes: the bulk UPDATE also updates the loaded contacts
+    before = {contact_id: repository_stats.contribution(contact.completed, contact.birthday)
+              for contact_id, contact in loaded.items()}
+    emails = {operation.body.email for operation in operations if not isinstance(operation, ContactBatchDelete)}
+    # Email owner: the id of the contact, or the index of the create operation as a negative number
+    owners: dict[str, int] = {}
+    if emails:
+        stmt = select(Contact.email, Contact.id).where(Contact.email.in_(emails), Contact.deleted_at.is_(None))
+        if CONTACT_PARTITIONS:
+            stmt = stmt.where(Contact.user_id == user.id)
+        owners = dict((await db.execute(stmt)).all())
+
+    # Final state of the loaded contacts: None untouched, the new values when updated, False when deleted
+    state: dict[int, dict | bool | None] = {contact_id: None for contact_id in loaded}
+    results, created = [], []
+    for index, operation in enumerate(operations):
+        if isinstance(operation, ContactBatchCreate):
+            if operation.body.email in owners:
+                results.append(_result(operation.op, 409, detail="Contact email already exists"))
+                continue
+            owners[operation.body.email] = -1 - index
+            created.append(index)
+            results.append(_result(operation.op, 201))
+        elif operation.id not in loaded or state[operation.id] is False:
+            results.append(_result(operation.op, 404, operation.id, "NOT FOUND"))
+        elif isinstance(operation, ContactBatchUpdate):
+            if owners.setdefault(operation.body.email, operation.id) != operation.id:
+                results.append(_result(operation.op, 409, operation.id, "Contact email already exists"))
+                continue
+            state[operation.id] = operation.body.model_dump()
+            results.append(_result(operation.op, 200, operation.id))
+        else:
+            state[operation.id] = False
+            results.append(_result(operation.op, 204, operation.id))
+
+    now = datetime.now()
+    deleted = sorted(contact_id for contact_id, values in state.items() if values is False)
+    updated = {contact_id: values for contact_id, values in state.items() if values}
+    if deleted:
+        await db.execute(update(Contact).where(Contact.id.in_(deleted), Contact.user_id == user.id)
+                         .values(deleted_at=now).execution_options(synchronize_session=False))
+    if updated:
+        key = {"user_id": user.id} if CONTACT_PARTITIONS else {}
+        await db.execute(update(Contact), [
+            {"id": contact_id, **key, **values, "phone_e164": to_e164(values["phone"]), "updated_at": now}
+            for contact_id, values in sorted(updated.items())
+        ])
+    if created:
+        # The created emails are unique in the batch, so the ids are matched by email: keeping the rows in the order
+        # of the parameters would need a sentinel column, or one INSERT per row
+        created_ids = dict((await db.execute(insert(Contact).returning(Contact.email, Contact.id), [
+            {**operations[index].body.model_dump(), "phone_e164": to_e164(operations[index].body.phone),
+             "user_id": user.id} for index in created
+        ])).all())
+        for index in created:
+            results[index]["id"] = created_ids[operations[index].body.email]
+
+    ops: dict[int, str] = {}
+    total = completed = 0
+    months: dict[int, int] = {}
+    for contact_id, values in state.items():
+        if values is None:
+            continue
+        _, was_completed, old_month = before[contact_id]
+        completed -= was_completed
+        months[old_month] = months.get(old_month, 0) - 1
+        if values is False:
+            total -= 1
+            ops[contact_id] = repository_changes.DELETE
+        else:
+            _, is_completed, new_month = repository_stats.contribution(values["completed"], values["birthday"])
+            completed += is_completed
+            months[new_month] = months.get(new_month, 0) + 1
+            ops[contact_id] = repository_changes.UPSERT
+    for index in created:
+        body = operations[index].body
+        _, is_completed, month = repository_stats.contribution(body.completed, body.birthday)
+        total += 1
+        completed += is_completed
+        months[month] = months.get(month, 0) + 1
+        ops[results[index]["id"]] = repository_changes.UPSERT
+    if not ops:
+        return results, []
+    seq = await repository_stats.apply_delta(db, user.id, total, completed, months, changes=len(ops))
+    await repository_changes.record_changes(db, user.id, seq, ops)
+    await db.commit()
+
+    live = [contact_id for contact_id, op in ops.items() if op == repository_changes.UPSERT]
+    stmt = (select(Contact).where(Contact.id.in_(live), Contact.user_id == user.id)
+            .execution_options(populate_existing=True))
+    contacts = {contact.id: contact for contact in (await db.execute(stmt)).scalars()} if live else {}
+    for result in results:
+        if result["status"] in (200, 201):
+            result["contact"] = contacts.get(result["id"])
+    return results, list(contacts.values())
@@ -0,0 +1,97 @@
+from datetime import datetime
+
+from sqlalchemy import and_, exists, func, insert, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from src.entity.models import Contact, ContactChange, ContactStats, User
+from src.repository.stats import _insert
+
+UPSERT = "upsert"
+DELETE = "delete"
+# Key of the changes recorded in the session and not yet published, see pending
+PENDING = "contact_changes"
+
+
+async def record_changes(db: AsyncSession, user_id: int, seq: int, ops: dict[int, str]) -> None:
+    """
+    The record_changes function writes the changes of contacts to the change log of the user, in the transaction of
+    the session. The log keeps one row per contact with its last change, so it never grows beyond the contacts of
+    the user and their tombstones. The changes are also kept in the session until they are taken by pending.
+
+    :param db: AsyncSession: The session whose transaction also writes the contacts
+    :param user_id: int: The owner of the contacts
+    :param seq: int: The last change number reserved by repository_stats.apply_delta for len(ops) changes
+    :param ops: dict[int, str]: UPSERT or DELETE by contact id
+    :return: None
+    :doc-author: Trelent
+    """
+    now = datetime.now()
+    first = seq - len(ops) + 1
+    changes = [{"seq": first + i, "contact_id": contact_id, "op": op}
+               for i, (contact_id, op) in enumerate(sorted(ops.items()))]
+    stmt = _insert(db)(ContactChange).values([{**change, "user_id": user_id, "changed_at": now} for change in changes])
+    stmt = stmt.on_conflict_do_update(index_elements=[ContactChange.user_id, ContactChange.contact_id], set_={
+        "seq": stmt.excluded.seq, "op": stmt.excluded.op, "changed_at": stmt.excluded.changed_at,
+    })
+    await db.execute(stmt)
+    db.info.setdefault(PENDING, []).extend(changes)
+
+
+def pending(db: AsyncSession) -> list[dict]:
+    """
+    The pending function takes the changes recorded in the session since the last call, to publish them after
+    the commit (src.services.contact_events).
+
+    :param db: AsyncSession: The session that recorded the changes
+    :return: The changes with seq, contact_id and op
+    :doc-author: Trelent
+    """
+    return db.info.pop(PENDING, [])
+
+
+async def get_changes(since: int, limit: int, db: AsyncSession, user: User) -> dict | None:
+    """
+    The get_changes function returns a page of the contacts changed after change number ``since``, in change
+    order, with the current contact or a tombstone for deleted ones. The next page starts after ``next``.
+
+    :param since: int: The last change number the client has applied, 0 for a full sync
+    :param limit: int: Limit the number of changes returned
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: The owner of the contacts
+    :return: The changes, next and more, or None when tombstones after ``since`` expired and a full sync is needed
+    :doc-author: Trelent
+    """
+    if since > 0:
+        floor = await db.scalar(select(ContactStats.changes_floor).where(ContactStats.user_id == user.id))
+        if since < (floor or 0):
+            return None
+    stmt = (select(ContactChange, Contact)
+            .outerjoin(Contact, and_(Contact.user_id == ContactChange.user_id, Contact.id == ContactChange.contact_id,
+                                     Contact.deleted_at.is_(None)))
+            .where(ContactChange.user_id == user.id, ContactChange.seq > since)
+            .order_by(ContactChange.seq).limit(limit + 1))
+    rows = (await db.execute(stmt)).all()
+    changes = [{"seq": change.seq, "contact_id": change.contact_id, "op": change.op if contact else DELETE,
+                "contact": contact} for change, contact in rows[:limit]]
+    return {"changes": changes, "next": changes[-1]["seq"] if changes else since, "more": len(rows) > limit}
+
+
+async def backfill(conn: AsyncConnection) -> None:
+    """
+    The backfill function adds the contacts written around the repository (e.g. by the seeder) to the change log,
+    numbered after the last change of their owner, and moves the change numbers of the stats past them.
+
+    :param conn: AsyncConnection: A connection inside a transaction
+    :return: None
+    :doc-author: Trelent
+    """
+    last = (select(func.coalesce(func.max(ContactChange.seq), 0)).where(ContactChange.user_id == Contact.user_id)
+            .scalar_subquery())
+    logged = exists().where(ContactChange.user_id == Contact.user_id, ContactChange.contact_id == Contact.id)
+    await conn.execute(insert(ContactChange).from_select(["user_id", "contact_id", "seq", "op", "changed_at"], select(
+        Contact.user_id, Contact.id,
+        last + func.row_number().over(partition_by=Contact.user_id, order_by=Contact.id), literal(UPSERT), func.now(),
+    ).where(Contact.user_id.is_not(None), Contact.deleted_at.is_(None), ~logged)))
+    await conn.execute(update(ContactStats).values(change_seq=select(func.max(ContactChange.seq)).where(
+        ContactChange.user_id == ContactStats.user_id).scalar_subquery()).where(
+        exists().where(ContactChange.user_id == ContactStats.user_id)))
@@ -1,13 +1,29 @@
 from datetime import datetime, timedelta
 
-from sqlalchemy import select, or_, and_, extract
+from sqlalchemy import select, update, or_, and_, extract
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.entity.models import Contact, User
+from src.conf.config import config
+from src.entity.models import CONTACT_PARTITIONS, Contact, User
+from src.repository import changes as repository_changes
+from src.repository import stats as repository_stats
 from src.schemas.contact import ContactSchema, ContactUpdateSchema
+from src.services.phones import to_e164
 
 
-async def get_all_contacts(limit: int, offset: int, db: AsyncSession, user: User):
+def _select_contacts(fields: tuple[str, ...] | None):
+    # A sparse fieldset selects only its columns, and the rows are returned as mappings instead of contacts
+    if fields is None:
+        return select(Contact)
+    return select(*(getattr(Contact, name) for name in fields)).select_from(Contact)
+
+
+def _all(result, fields: tuple[str, ...] | None):
+    return result.scalars().all() if fields is None else result.mappings().all()
+
+
+async def get_all_contacts(limit: int, offset: int, db: AsyncSession, user: User,
+                           fields: tuple[str, ...] | None = None):
     """
     The get_all_contacts function returns a list of contacts for the user.
 
@@ -15,32 +31,53 @@ async def get_all_contacts(limit: int, offset: int, db: AsyncSession, user: User
     :param offset: int: Specify the number of records to skip
     :param db: AsyncSession: Pass in the database session
     :param user: User: Filter the contacts by user
+    :param fields: tuple[str, ...] | None: Select only these columns and return row mappings
     :return: A list of contacts for a user
     :doc-author: Trelent
     """
-    stmt = select(Contact).filter_by(user=user).offset(offset).limit(limit)
+    stmt = _select_contacts(fields).filter_by(user=user, deleted_at=None).offset(offset).limit(limit)
     contacts = await db.execute(stmt)
-    return contacts.scalars().all()
+    return _all(contacts, fields)
 
 
-async def get_contact(contact_id: int, db: AsyncSession, user: User):
+async def get_contact(contact_id: int, db: AsyncSession, user: User, fields: tuple[str, ...] | None = None):
     """
     The get_contact function returns a contact from the database.
 
     :param contact_id: int: Specify the id of the contact to be retrieved
     :param db: AsyncSession: Pass the database session to the function
     :param user: User: Ensure that the contact belongs to the user making the request
+    :param fields: tuple[str, ...] | None: Select only these columns and return a row mapping
     :return: A contact object
     :doc-author: Trelent
     """
-    stmt = select(Contact).filter_by(id=contact_id, user=user)
+    stmt = _select_contacts(fields).filter_by(id=contact_id, user=user, deleted_at=None)
     contact = await db.execute(stmt)
-    return contact.scalar_one_or_none()
+    return contact.scalar_one_or_none() if fields is None else contact.mappings().one_or_none()
+
+
+async def contact_email_exists(email: str, db: AsyncSession, user: User) -> bool:
+    """
+    The contact_email_exists function checks whether a contact with the email exists, by the unique email index.
+    Emails are unique among the contacts that are not deleted: per user when the contacts table is partitioned,
+    and globally otherwise.
+
+    :param email: str: The email to check
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: The owner of the new contact
+    :return: True if the email is taken
+    :doc-author: Trelent
+    """
+    stmt = select(Contact.id).where(Contact.email == email, Contact.deleted_at.is_(None))
+    if CONTACT_PARTITIONS:
+        stmt = stmt.where(Contact.user_id == user.id)
+    result = await db.execute(stmt.limit(1))
+    return result.scalar_one_or_none() is not None
 
 
 async def create_contact(body: ContactSchema, db: AsyncSession, user: User):
     """
-    The create_contact function creates a new contact in the database.
+    The create_contact function creates a new contact in the database and records it in the change log.
 
     :param body: ContactSchema: Validate the request body
     :param db: AsyncSession: Pass a database session to the function
@@ -48,8 +85,12 @@ async def create_contact(body: ContactSchema, db: AsyncSession, user: User):
     :return: A contact object
     :doc-author: Trelent
     """
-    contact = Contact(**body.model_dump(exclude_unset=True), user=user)
+    contact = Contact(**body.model_dump(exclude_unset=True), phone_e164=to_e164(body.phone), user=user)
     db.add(contact)
+    await db.flush()
+    total, completed, month = repository_stats.contribution(contact.completed, contact.birthday)
+    seq = await repository_stats.apply_delta(db, user.id, total, completed, {month: 1}, changes=1)
+    await repository_changes.record_changes(db, user.id, seq, {contact.id: repository_changes.UPSERT})
     await db.commit()
     await db.refresh(contact)
     return contact
@@ -64,22 +105,33 @@ async def update_contact(contact_id: int, body: ContactUpdateSchema, db: AsyncSe
     :param db: AsyncSession: Pass in the database session to the function
     :param user: User: Ensure that the user is only updating their own contacts
     :return: A contact object, which is the same as what we get from the create_contact function
+    :doc-author: Trelent
     """
-    stmt = select(Contact).filter_by(id=contact_id, user=user)
+    stmt = select(Contact).filter_by(id=contact_id, user=user, deleted_at=None)
     result = await db.execute(stmt)
-    contact = await result.scalar_one_or_none()
+    contact = result.scalar_one_or_none()
 
     if contact:
+        _, was_completed, old_month = repository_stats.contribution(contact.completed, contact.birthday)
         # Update contact attributes based on body
-        for field, value in body.dict().items():
+        for field, value in body.model_dump().items():
             setattr(contact, field, value)
+        contact.phone_e164 = to_e164(contact.phone)
+        _, is_completed, new_month = repository_stats.contribution(contact.completed, contact.birthday)
+        months = {} if old_month == new_month else {old_month: -1, new_month: 1}
+        seq = await repository_stats.apply_delta(db, user.id, 0, is_completed - was_completed, months, changes=1)
+        await repository_changes.record_changes(db, user.id, seq, {contact.id: repository_changes.UPSERT})
+        await db.commit()
+        await db.refresh(contact)
 
     return contact
 
 
 async def delete_contact(contact_id: int, db: AsyncSession, user: User):
     """
-    The delete_contact function deletes a contact from the database.
+    The delete_contact function deletes a contact softly: a single UPDATE marks it deleted and takes it out of the
+    stats of the user, and a tombstone is recorded in the change log. The row is removed later by
+    src.jobs.purge_contacts, until then it can be restored.
 
     :param contact_id: int: Specify the id of the contact to be deleted
     :param db: AsyncSession: Pass the database session to the function
@@ -87,55 +139,150 @@ async def delete_contact(contact_id: int, db: AsyncSession, user: User):
     :return: The contact that was deleted
     :doc-author: Trelent
     """
-    stmt = select(Contact).filter_by(id=contact_id, user=user)
+    stmt = (update(Contact)
+            .where(Contact.id == contact_id, Contact.user_id == user.id, Contact.deleted_at.is_(None))
+            .values(deleted_at=datetime.now()).returning(Contact))
     contact = await db.execute(stmt)
     contact = contact.scalar_one_or_none()
     if contact:
-        await db.delete(contact)
+        total, completed, month = repository_stats.contribution(contact.completed, contact.birthday)
+        seq = await repository_stats.apply_delta(db, user.id, -total, -completed, {month: -1}, changes=1)
+        await repository_changes.record_changes(db, user.id, seq, {contact.id: repository_changes.DELETE})
         await db.commit()
     return contact
 
 
-async def search_contacts(db: AsyncSession, query: str):
+async def restore_contact(contact_id: int, db: AsyncSession, user: User):
+    """
+    The restore_contact function undoes the deletion of a contact deleted within the last CONTACT_UNDO_WINDOW
+    seconds and counts it in the stats of the user again.
+
+    :param contact_id: int: Specify the id of the contact to be restored
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: Make sure that the user is only restoring their own contacts
+    :return: The restored contact, or None when there is no such deleted contact
+    :doc-author: Trelent
+    """
+    deleted_since = datetime.now() - timedelta(seconds=config.CONTACT_UNDO_WINDOW)
+    stmt = (update(Contact)
+            .where(Contact.id == contact_id, Contact.user_id == user.id, Contact.deleted_at >= deleted_since)
+            .values(deleted_at=None).returning(Contact))
+    contact = await db.execute(stmt)
+    contact = contact.scalar_one_or_none()
+    if contact:
+        total, completed, month = repository_stats.contribution(contact.completed, contact.birthday)
+        seq = await repository_stats.apply_delta(db, user.id, total, completed, {month: 1}, changes=1)
+        await repository_changes.record_changes(db, user.id, seq, {contact.id: repository_changes.UPSERT})
+        await db.commit()
+        await db.refresh(contact)
+    return contact
+
+
+async def lookup_contacts(phone: str, db: AsyncSession, user: User, fields: tuple[str, ...] | None = None):
+    """
+    The lookup_contacts function finds the contacts of the user with the given phone number in any format, by the
+    indexed E.164 column.
+
+    :param phone: str: The phone number, e.g. of an incoming call
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: The owner of the contacts
+    :param fields: tuple[str, ...] | None: Select only these columns and return row mappings
+    :return: A list of contacts, or None when the number cannot be normalized
+    :doc-author: Trelent
+    """
+    phone_e164 = to_e164(phone)
+    if phone_e164 is None:
+        return None
+    stmt = _select_contacts(fields).where(Contact.user_id == user.id, Contact.phone_e164 == phone_e164,
+                                          Contact.deleted_at.is_(None))
+    result = await db.execute(stmt)
+    return _all(result, fields)
+
+
+async def merge_contacts(keep_id: int, merge_ids: list[int], db: AsyncSession, user: User):
+    """
+    The merge_contacts function merges duplicate contacts into the one that is kept: the kept contact is completed
+    if any of them is, and the others are softly deleted in the same transaction.
+
+    :param keep_id: int: The contact to keep
+    :param merge_ids: list[int]: The contacts merged into it
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: Make sure that all the contacts belong to the user
+    :return: The kept contact, or None when any of the contacts does not exist
+    :doc-author: Trelent
+    """
+    merge_ids = sorted(set(merge_ids) - {keep_id})
+    stmt = select(Contact).filter(Contact.id.in_([keep_id, *merge_ids])).filter_by(user=user, deleted_at=None)
+    contacts = {contact.id: contact for contact in (await db.execute(stmt)).scalars()}
+    if len(contacts) != len(merge_ids) + 1:
+        return None
+
+    keep = contacts.pop(keep_id)
+    was_completed = int(bool(keep.completed))
+    keep.completed = bool(keep.completed) or any(contact.completed for contact in contacts.values())
+    months: dict[int, int] = {}
+    completed = int(keep.completed) - was_completed
+    for contact in contacts.values():
+        _, is_completed, month = repository_stats.contribution(contact.completed, contact.birthday)
+        completed -= is_completed
+        months[month] = months.get(month, 0) - 1
+    if merge_ids:
+        await db.execute(update(Contact).where(Contact.id.in_(merge_ids), Contact.user_id == user.id)
+                         .values(deleted_at=datetime.now()))
+    ops = {keep_id: repository_changes.UPSERT, **{contact_id: repository_changes.DELETE for contact_id in merge_ids}}
+    seq = await repository_stats.apply_delta(db, user.id, -len(merge_ids), completed, months, changes=len(ops))
+    await repository_changes.record_changes(db, user.id, seq, ops)
+    await db.commit()
+    await db.refresh(keep)
+    return keep
+
+
+async def search_contacts(db: AsyncSession, query: str, user: User = None, fields: tuple[str, ...] | None = None):
     """
     The search_contacts function searches the database for contacts that match a given query.
 
     :param db: AsyncSession: Pass the database session to the function
     :param query: str: Search for contacts by first name, last name or email
+    :param user: User: Limit the search to the contacts of this user
+    :param fields: tuple[str, ...] | None: Select only these columns and return row mappings
     :return: A list of contact objects
     :doc-author: Trelent
     """
-
-    async with db.begin():
-        return await db.execute(
-            select(Contact).filter(
-                or_(
-                    Contact.first_name.ilike(f"%{query}%"),
-                    Contact.last_name.ilike(f"%{query}%"),
-                    Contact.email.ilike(f"%{query}%")
-                )
-            )
-        ).scalars().all()
-
+    stmt = _select_contacts(fields).filter(
+        or_(
+            Contact.first_name.ilike(f"%{query}%"),
+            Contact.last_name.ilike(f"%{query}%"),
+            Contact.email.ilike(f"%{query}%")
+        ),
+        Contact.deleted_at.is_(None)
+    )
+    if user is not None:
+        stmt = stmt.filter_by(user=user)
+    result = await db.execute(stmt)
+    return _all(result, fields)
 
 
-async def get_upcoming_birthdays(db: AsyncSession):
+async def get_upcoming_birthdays(db: AsyncSession, user: User = None, fields: tuple[str, ...] | None = None):
     """
     The get_upcoming_birthdays function returns a list of contacts whose birthdays are within the next week.
 
     :param db: AsyncSession: Pass in the database session
+    :param user: User: Limit the result to the contacts of this user
+    :param fields: tuple[str, ...] | None: Select only these columns and return row mappings
     :return: A list of contact objects
     :doc-author: Trelent
     """
     today = datetime.today().date()
     next_week = today + timedelta(days=7)
 
-    result = await db.execute(
-        select(Contact).where(
-            and_(
-                Contact.birthday >= today,
-                Contact.birthday <= next_week
-            )
+    stmt = _select_contacts(fields).where(
+        and_(
+            Contact.birthday >= today,
+            Contact.birthday <= next_week,
+            Contact.deleted_at.is_(None)
         )
     )
-    return await result.scalars().all()
\ No newline at end of file
+    if user is not None:
+        stmt = stmt.filter_by(user=user)
+    result = await db.execute(stmt)
+    return _all(result, fields)
\ No newline at end of file
@@ -0,0 +1,32 @@
+from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.entity.models import Contact, ContactDuplicate, User
+
+
+async def get_duplicate_groups(limit: int, offset: int, db: AsyncSession, user: User) -> list[dict]:
+    """
+    The get_duplicate_groups function returns a page of the duplicate groups of the user stored by src.jobs.dedupe.
+    Deleted contacts are left out, and so are the groups left with a single contact after merges or deletes.
+
+    :param limit: int: Limit the number of groups returned
+    :param offset: int: Specify the number of groups to skip
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: The owner of the contacts
+    :return: A list of groups with their group_id and contacts
+    :doc-author: Trelent
+    """
+    # Joined on the whole contact key, so a partitioned contacts table is pruned to the partition of the user
+    live = and_(Contact.user_id == ContactDuplicate.user_id, Contact.id == ContactDuplicate.contact_id,
+                Contact.deleted_at.is_(None))
+    group_ids = (select(ContactDuplicate.group_id).join(Contact, live).where(ContactDuplicate.user_id == user.id)
+                 .group_by(ContactDuplicate.group_id).having(func.count() > 1)
+                 .order_by(ContactDuplicate.group_id).offset(offset).limit(limit)).subquery()
+    stmt = (select(ContactDuplicate.group_id, Contact)
+            .join(Contact, live)
+            .where(ContactDuplicate.user_id == user.id, ContactDuplicate.group_id.in_(select(group_ids.c.group_id)))
+            .order_by(ContactDuplicate.group_id, Contact.id))
+    groups: dict[int, list[Contact]] = {}
+    for group_id, contact in await db.execute(stmt):
+        groups.setdefault(group_id, []).append(contact)
+    return [{"group_id": group_id, "contacts": contacts} for group_id, contacts in groups.items()]
@@ -0,0 +1,137 @@
+import json
+from datetime import date
+
+from sqlalchemy import Select, func, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from src.entity.models import Contact, ContactMonthStats, ContactStats, User
+
+
+def contribution(completed: bool | None, birthday: date | None) -> tuple[int, int, int | None]:
+    """
+    The contribution function returns what one contact adds to the stats of its owner.
+
+    :param completed: bool | None: The completed flag of the contact
+    :param birthday: date | None: The birthday of the contact
+    :return: The total, completed and birth month contributions
+    :doc-author: Trelent
+    """
+    return 1, int(bool(completed)), birthday.month if birthday is not None else None
+
+
+def _dialect(db: AsyncSession | AsyncConnection):
+    return db.dialect if isinstance(db, AsyncConnection) else db.get_bind().dialect
+
+
+def _insert(db: AsyncSession | AsyncConnection):
+    return sqlite_insert if _dialect(db).name == "sqlite" else pg_insert
+
+
+async def apply_delta(db: AsyncSession, user_id: int, total: int = 0, completed: int = 0,
+                      months: dict[int, int] | None = None, changes: int = 0) -> int | None:
+    """
+    The apply_delta function adds the deltas to the stats of a user with atomic upserts, in the transaction of the
+    session. Concurrent writers of the same user serialize on the stats row instead of overwriting each other.
+    The same upsert reserves ``changes`` numbers of the change log of the user (see src.repository.changes):
+    numbers are given out under the row lock, so they become visible in order.
+
+    :param db: AsyncSession: The session whose transaction also writes the contact
+    :param user_id: int: The owner of the changed contacts
+    :param total: int: Change of the number of contacts
+    :param completed: int: Change of the number of completed contacts
+    :param months: dict[int, int] | None: Change of the number of contacts by birth month
+    :param changes: int: Number of changed contacts to reserve change numbers for
+    :return: The last reserved change number, or None when none was reserved
+    :doc-author: Trelent
+    """
+    insert = _insert(db)
+    seq = None
+    if total or completed or changes:
+        stmt = insert(ContactStats).values(user_id=user_id, total=total, completed=completed, change_seq=changes)
+        stmt = stmt.on_conflict_do_update(index_elements=[ContactStats.user_id], set_={
+            "total": ContactStats.total + stmt.excluded.total,
+            "completed": ContactStats.completed + stmt.excluded.completed,
+            "change_seq": ContactStats.change_seq + stmt.excluded.change_seq,
+        })
+        if changes:
+            seq = (await db.execute(stmt.returning(ContactStats.change_seq))).scalar_one()
+        else:
+            await db.execute(stmt)
+    months = {month: count for month, count in (months or {}).items() if month is not None and count}
+    if months:
+        stmt = insert(ContactMonthStats).values([
+            {"user_id": user_id, "month": month, "count": count} for month, count in sorted(months.items())
+        ])
+        stmt = stmt.on_conflict_do_update(index_elements=[ContactMonthStats.user_id, ContactMonthStats.month],
+                                          set_={"count": ContactMonthStats.count + stmt.excluded.count})
+        await db.execute(stmt)
+    return seq
+
+
+async def get_stats(db: AsyncSession, user: User) -> dict:
+    """
+    The get_stats function reads the stats of a user in one query, without counting the contacts.
+
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: The owner of the contacts
+    :return: The total, the completed count and the count by birth month of every month
+    :doc-author: Trelent
+    """
+    stmt = (select(ContactStats.total, ContactStats.completed, ContactMonthStats.month, ContactMonthStats.count)
+            .outerjoin(ContactMonthStats, ContactMonthStats.user_id == ContactStats.user_id)
+            .where(ContactStats.user_id == user.id))
+    rows = (await db.execute(stmt)).all()
+    by_month = {month: 0 for month in range(1, 13)}
+    for row in rows:
+        if row.month is not None:
+            by_month[row.month] = row.count
+    return {"total": rows[0].total if rows else 0, "completed": rows[0].completed if rows else 0,
+            "by_birth_month": by_month}
+
+
+async def estimate_count(db: AsyncSession | AsyncConnection, stmt: Select) -> int | None:
+    """
+    The estimate_count function returns the number of rows the PostgreSQL planner expects ``stmt`` to return,
+    from EXPLAIN without running the query. Other databases have no usable estimate and return None.
+
+    :param db: AsyncSession | AsyncConnection: Pass the database session or connection to the function
+    :param stmt: Select: The query to estimate, without limit and offset
+    :return: The estimated number of rows, or None
+    :doc-author: Trelent
+    """
+    dialect = _dialect(db)
+    if dialect.name != "postgresql":
+        return None
+    sql = stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+    plan = (await db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))).scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def count_contacts(db: AsyncSession, user: User | None, estimate: bool = False) -> tuple[int, bool]:
+    """
+    The count_contacts function returns the number of contacts for a total count header. The contacts of a user are
+    counted by the maintained counter, one primary key lookup. All contacts, or any contacts when an estimate is
+    requested, are counted by the planner estimate on PostgreSQL; the counter is used where no estimate exists.
+
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User | None: The owner of the contacts, None counts all contacts
+    :param estimate: bool: Prefer the planner estimate
+    :return: The count and whether it is exact
+    :doc-author: Trelent
+    """
+    if estimate or user is None:
+        stmt = select(Contact.id).where(Contact.deleted_at.is_(None))
+        if user is not None:
+            stmt = stmt.where(Contact.user_id == user.id)
+        rows = await estimate_count(db, stmt)
+        if rows is not None:
+            return rows, False
+    if user is None:
+        total = await db.scalar(select(func.coalesce(func.sum(ContactStats.total), 0)))
+    else:
+        total = await db.scalar(select(ContactStats.total).where(ContactStats.user_id == user.id))
+    return total or 0, True
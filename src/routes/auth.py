@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends, status, BackgroundTasks, Request, Response
 from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials, HTTPBearer
 from fastapi.responses import FileResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.database.db import get_db
 
@@ -8,16 +9,40 @@ from src.repository import users as repositories_users
 from src.schemas.user import UserSchema, TokenSchema, UserResponse, RequestEmail
 from src.services.auth import auth_service
 from src.services.email import send_email
+from src.services.email_index import email_index
+from src.services.metrics import EMAIL_OUTBOX
+from src.services.refresh_tokens import refresh_token_store
+from src.services.revocation import revocation_list
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 get_refresh_token = HTTPBearer()
 
+
+async def issue_tokens(email: str, family: str | None = None) -> dict:
+    """
+    The issue_tokens function creates an access/refresh token pair and registers the refresh token
+    in the refresh token store. No database write is needed.
+
+    :param email: str: The email of the user the tokens are issued to
+    :param family: str | None: Rotation family to continue, a new session is started if None
+    :return: A dictionary with the access token and refresh token
+    :doc-author: Trelent
+    """
+    lifetime = auth_service.REFRESH_TOKEN_LIFETIME
+    jti, family = await refresh_token_store.issue(email, ttl=int(lifetime.total_seconds()), family=family)
+    access_token = await auth_service.create_access_token(data={"sub": email, "fam": family})
+    refresh_token = await auth_service.create_refresh_token(data={"sub": email, "jti": jti, "fam": family},
+                                                            expires_delta=lifetime)
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
 @router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def signup(body: UserSchema, bt: BackgroundTasks, request: Request, db: AsyncSession = Depends(get_db)):
     """
     The signup function creates a new user in the database.
         It takes a UserSchema object as input, and returns the newly created user.
         If an account with that email already exists, it raises an HTTPException.
+        The lookup of the email is skipped when the email index knows the email is new; the unique constraint
+        still catches an email registered meanwhile by another worker.
 
     :param body: UserSchema: Validate the request body
     :param bt: BackgroundTasks: Add a task to the background tasks queue
@@ -26,12 +51,19 @@ async def signup(body: UserSchema, bt: BackgroundTasks, request: Request, db: As
     :return: The new user object
     :doc-author: Trelent
     """
-    exist_user = await repositories_users.get_user_by_email(body.email, db)
-    if exist_user:
+    if email_index.may_exist("users", body.email):
+        exist_user = await repositories_users.get_user_by_email(body.email, db)
+        if exist_user:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Account already exists")
+    body.password = await auth_service.get_password_hash_async(body.password)
+    try:
+        new_user = await repositories_users.create_user(body, db)
+    except IntegrityError:
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Account already exists")
-    body.password = auth_service.get_password_hash(body.password)
-    new_user = await repositories_users.create_user(body, db)
+    email_index.add("users", new_user.email)
     bt.add_task(send_email, new_user.email, new_user.username, str(request.base_url))
+    EMAIL_OUTBOX.inc()
     return new_user
 
 
@@ -52,40 +84,74 @@ async def login(body: OAuth2PasswordRequestForm = Depends(), db: AsyncSession =
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email")
     if not user.confirmed:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email not confirmed")
-    if not auth_service.verify_password(body.password, user.password):
+    if not await auth_service.verify_password_async(body.password, user.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password")
-    # Generate JWT
-    access_token = await auth_service.create_access_token(data={"sub": user.email, "test": "Joe Smith"})
-    refresh_token = await auth_service.create_refresh_token(data={"sub": user.email})
-    await repositories_users.update_token(user, refresh_token, db)
-    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+    # Generate JWT, every login starts a new session (rotation family)
+    return await issue_tokens(user.email)
 
 
 @router.get("/refresh_token", response_model=TokenSchema)
-async def refresh_token(credentials: HTTPAuthorizationCredentials = Depends(get_refresh_token),
-                        db: AsyncSession = Depends(get_db)):
+async def refresh_token(credentials: HTTPAuthorizationCredentials = Depends(get_refresh_token)):
 
     """
     The refresh_token function is used to refresh the access token.
         The function takes in a refresh token and returns a new access_token,
         refresh_token, and the type of bearer.
+        Each refresh token can be used once: presenting an already used token revokes its whole session,
+        the refresh token and the access tokens issued to it.
 
     :param credentials: HTTPAuthorizationCredentials: Get the credentials from the request header
-    :param db: AsyncSession: Access the database
     :return: A dict with the access token, refresh token and the type of token
     :doc-author: Trelent
     """
-    token = credentials.credentials
-    email = await auth_service.decode_refresh_token(token)
-    user = await repositories_users.get_user_by_email(email, db)
-    if user.refresh_token != token:
-        await repositories_users.update_token(user, None, db)
+    payload = await auth_service.decode_refresh_token(credentials.credentials)
+    if not await refresh_token_store.consume(payload["jti"], payload["fam"]):
+        # A reused token means it was stolen: the access tokens of the session are revoked with its refresh token
+        await revocation_list.revoke_family(payload["fam"])
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    return await issue_tokens(payload["sub"], family=payload["fam"])
 
-    access_token = await auth_service.create_access_token(data={"sub": email})
-    refresh_token = await auth_service.create_refresh_token(data={"sub": email})
-    await repositories_users.update_token(user, refresh_token, db)
-    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+@router.post("/logout")
+async def logout(claims: dict = Depends(auth_service.get_access_claims)):
+    """
+    The logout function ends the session the access token belongs to.
+        The access token is revoked right away, and the refresh token and every other access token
+        of the same session can not be used anymore.
+
+    :param claims: dict: The verified claims of the access token
+    :return: A message to the user
+    :doc-author: Trelent
+    """
+    if claims.get("jti"):
+        await revocation_list.revoke_token(claims["jti"], claims.get("exp"))
+    if claims.get("fam"):
+        await revocation_list.revoke_family(claims["fam"])
+        await refresh_token_store.revoke_family(claims["fam"])
+    return {"message": "Logged out"}
+
+
+@router.post("/logout_all")
+async def logout_all(claims: dict = Depends(auth_service.get_access_claims)):
+    """
+    The logout_all function ends every session of the user ("log out everywhere").
+        All refresh tokens of the user are revoked, and so are the access tokens issued to those sessions.
+        The verified claims of the user's tokens are dropped from the token cache of this worker.
+
+    :param claims: dict: The verified claims of the access token
+    :return: A message to the user
+    :doc-author: Trelent
+    """
+    families = await refresh_token_store.sessions(claims["sub"])
+    if claims.get("fam"):
+        families.add(claims["fam"])
+    for family in families:
+        await revocation_list.revoke_family(family)
+    if claims.get("jti"):
+        await revocation_list.revoke_token(claims["jti"], claims.get("exp"))
+    await refresh_token_store.revoke_user(claims["sub"])
+    auth_service.token_cache.discard_subject(claims["sub"])
+    return {"message": "Logged out from all sessions"}
 
 
 @router.get('/confirmed_email/{token}')
@@ -136,6 +202,7 @@ async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, r
         return {"message": "Your email is already confirmed"}
     if user:
         background_tasks.add_task(send_email, user.email, user.username, str(request.base_url))
+        EMAIL_OUTBOX.inc()
     return {"message": "Check your email for confirmation."}
 
 
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, HTTPException, Depends, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.db import get_db
+from src.entity.models import User
+from src.repository import batch as repositories_batch
+from src.repository import changes as repositories_changes
+from src.schemas.contact import ContactBatchSchema, ContactBatchResponse
+from src.services.auth import auth_service
+from src.services.contact_events import contact_events
+from src.services.email_index import email_index
+from src.services.query_stats import QueryBudget
+from src.services.rate_limit import RateLimit
+
+router = APIRouter(prefix="/batch", tags=["batch"])
+
+
+@router.post("", response_model=ContactBatchResponse,
+             dependencies=[Depends(RateLimit("contacts:batch")), Depends(QueryBudget(10))])
+async def run_batch(body: ContactBatchSchema, db: AsyncSession = Depends(get_db),
+                    user: User = Depends(auth_service.get_current_user)):
+    """
+    The run_batch function applies up to 500 contact operations (create, update, delete) of the current user in
+    order, in one request and one transaction. The result of every operation is reported in order, with the status
+    its own endpoint would answer: operations that fail with 404 or 409 are skipped and the others are applied.
+    The number of SQL statements does not depend on the number of operations.
+
+    :param body: ContactBatchSchema: The operations
+    :param db: AsyncSession: Pass the database session to the repository
+    :param user: User: Get the current user
+    :return: The results of the operations
+    :doc-author: Trelent
+    """
+    try:
+        results, contacts = await repositories_batch.run_batch(body.operations, db, user)
+    except IntegrityError:
+        # Another request took an email between the checks and the writes: nothing of the batch is applied
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Contact email already exists")
+    for contact in contacts:
+        email_index.add("contacts", contact.email)
+    await contact_events.publish(user.id, repositories_changes.pending(db), contacts)
+    return {"results": results}
@@ -1,59 +1,293 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Path, Query
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Depends, status, Path, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.db import get_db
 from src.entity.models import User
+from src.repository import changes as repositories_changes
 from src.repository import contacts as repositories_contacts
-from src.schemas.contact import ContactSchema, ContactUpdateSchema, ContactResponse
+from src.repository import duplicates as repositories_duplicates
+from src.repository import stats as repositories_stats
+from src.schemas.contact import (ContactSchema, ContactUpdateSchema, ContactResponse, ContactStatsResponse,
+                                ContactMergeSchema, DuplicateGroupResponse, ContactChangesResponse,
+                                parse_contact_fields, sparse_contact_response, sparse_contacts_adapter)
 from src.services.auth import auth_service
+from src.services.contact_events import contact_events
+from src.services.email_index import email_index
+from src.services.query_stats import QueryBudget
+from src.services.rate_limit import RateLimit
 
 router = APIRouter(prefix="/contacts", tags=["contacts"])
 
 
-@router.get("/", response_model=list[ContactResponse])
-async def get_contacts(limit: int = Query(10, ge=10, le=500), offset: int = Query(0, ge=0),
+def contact_fields(fields: str | None = Query(None, max_length=200, examples=["id,first_name,last_name"],
+                                              description="Comma-separated fields of the contacts to return")):
+    """
+    The contact_fields function is the dependency that reads the sparse fieldset of a read endpoint. Unknown fields
+    are answered with 422.
+
+    :param fields: str | None: The fields query parameter
+    :return: The field names, or None for all the fields
+    :doc-author: Trelent
+    """
+    try:
+        return parse_contact_fields(fields)
+    except ValueError as err:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
+
+
+def sparse_contacts(rows, fields: tuple[str, ...], response: Response) -> Response:
+    """
+    The sparse_contacts function serializes the rows of a sparse fieldset with the lean model of its fields,
+    bypassing the full ContactResponse of the endpoint. A returned response does not get the headers set by the
+    dependencies and the endpoint, such as X-RateLimit-* and X-Total-Count, so they are copied from ``response``.
+
+    :param rows: The row mappings selected by the repository, a list or a single row
+    :param fields: tuple[str, ...]: The field names
+    :param response: Response: The response injected into the endpoint
+    :return: The JSON response
+    :doc-author: Trelent
+    """
+    if isinstance(rows, list):
+        adapter = sparse_contacts_adapter(fields)
+        content = adapter.dump_json(adapter.validate_python(rows))
+    else:
+        content = sparse_contact_response(fields).model_validate(rows).model_dump_json().encode()
+    sparse = Response(content=content, media_type="application/json")
+    sparse.headers.raw.extend(response.headers.raw)
+    return sparse
+
+
+@router.get("/", response_model=list[ContactResponse],
+            dependencies=[Depends(RateLimit("contacts:read")), Depends(QueryBudget(3))])
+async def get_contacts(response: Response, limit: int = Query(10, ge=10, le=500), offset: int = Query(0, ge=0),
+                       count: Literal["exact", "estimate", "none"] = "exact",
+                       fields: tuple[str, ...] | None = Depends(contact_fields),
                        db: AsyncSession = Depends(get_db), user: User = Depends(auth_service.get_current_user)):
     """
     The get_contacts function returns a list of contacts.
+        The total number of contacts is sent in the X-Total-Count header. It comes from the maintained per-user
+        counter, or from the planner estimate with count=estimate (then X-Total-Count-Exact is false); count=none
+        skips it. The count never scans the contacts. With fields=id,first_name,... only these columns are selected
+        and returned.
 
     :param limit: int: Limit the number of contacts returned
     :param ge: Specify that the limit must be greater than or equal to 10
     :param le: Limit the maximum number of contacts returned
     :param offset: int: Specify the offset of the first contact to return
     :param ge: Specify a minimum value for the limit parameter
+    :param count: str: How to count the total: exact, estimate or none
+    :param fields: tuple[str, ...] | None: The fields of the contacts to return
     :param db: AsyncSession: Pass the database connection to the function
     :param user: User: Get the current user, which is used to filter out contacts that are not
     :return: A list of contacts
     :doc-author: Trelent
     """
-    contacts = await repositories_contacts.get_contacts(limit, offset, db)
+    contacts = await repositories_contacts.get_all_contacts(limit, offset, db, user, fields)
+    if count != "none":
+        total, exact = await repositories_stats.count_contacts(db, user, estimate=count == "estimate")
+        response.headers["X-Total-Count"] = str(total)
+        response.headers["X-Total-Count-Exact"] = str(exact).lower()
+    if fields is not None:
+        return sparse_contacts(contacts, fields, response)
     return contacts
 
 
-@router.get("/{contact_id}", response_model=ContactResponse)
-async def get_contact(contact_id: int = Path(..., ge=1), db: AsyncSession = Depends(get_db),
+@router.get("/search", response_model=list[ContactResponse],
+            dependencies=[Depends(RateLimit("contacts:read")), Depends(QueryBudget(2))])
+async def search_contacts(response: Response, q: str = Query(..., min_length=1, max_length=50),
+                          fields: tuple[str, ...] | None = Depends(contact_fields), db: AsyncSession = Depends(get_db),
+                          user: User = Depends(auth_service.get_current_user)):
+    """
+    The search_contacts function returns the contacts of the current user whose first name, last name or email
+    contains the query.
+
+    :param response: Response: The response whose headers a sparse fieldset keeps
+    :param q: str: The text to search for
+    :param fields: tuple[str, ...] | None: The fields of the contacts to return
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: Get the current user
+    :return: A list of contacts
+    :doc-author: Trelent
+    """
+    contacts = await repositories_contacts.search_contacts(db, q, user, fields)
+    return contacts if fields is None else sparse_contacts(contacts, fields, response)
+
+
+@router.get("/birthdays", response_model=list[ContactResponse],
+            dependencies=[Depends(RateLimit("contacts:read")), Depends(QueryBudget(2))])
+async def get_upcoming_birthdays(response: Response, fields: tuple[str, ...] | None = Depends(contact_fields),
+                                 db: AsyncSession = Depends(get_db),
+                                 user: User = Depends(auth_service.get_current_user)):
+    """
+    The get_upcoming_birthdays function returns the contacts of the current user with a birthday in the next 7 days.
+
+    :param response: Response: The response whose headers a sparse fieldset keeps
+    :param fields: tuple[str, ...] | None: The fields of the contacts to return
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: Get the current user
+    :return: A list of contacts
+    :doc-author: Trelent
+    """
+    contacts = await repositories_contacts.get_upcoming_birthdays(db, user, fields)
+    return contacts if fields is None else sparse_contacts(contacts, fields, response)
+
+
+@router.get("/stats", response_model=ContactStatsResponse,
+            dependencies=[Depends(RateLimit("contacts:read")), Depends(QueryBudget(2))])
+async def get_contact_stats(db: AsyncSession = Depends(get_db), user: User = Depends(auth_service.get_current_user)):
+    """
+    The get_contact_stats function returns the number of contacts of the current user, how many are completed and
+    how many have a birthday in every month. The counters are kept up to date on every write, so the cost of the
+    request does not depend on the number of contacts.
+
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: Get the current user
+    :return: The contact stats
+    :doc-author: Trelent
+    """
+    return await repositories_stats.get_stats(db, user)
+
+
+@router.get("/changes", response_model=ContactChangesResponse,
+            dependencies=[Depends(RateLimit("contacts:read")), Depends(QueryBudget(3))])
+async def get_changes(since: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000),
+                      db: AsyncSession = Depends(get_db), user: User = Depends(auth_service.get_current_user)):
+    """
+    The get_changes function returns the contacts of the current user changed after the change number ``since``,
+    for delta sync: deleted contacts come as tombstones without the contact. A client starts with since=0, applies
+    the changes and asks again with since=next while more is true; later syncs send the last next. The cost
+    depends on the number of changes, not on the number of contacts. When the tombstones after ``since`` have
+    expired the answer is 410 and the client starts again with since=0.
+
+    :param since: int: The last change number the client has applied
+    :param limit: int: Limit the number of changes returned
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: Get the current user
+    :return: The changes, the next change number and whether more changes follow
+    :doc-author: Trelent
+    """
+    changes = await repositories_changes.get_changes(since, limit, db, user)
+    if changes is None:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Changes expired, sync again from since=0")
+    return changes
+
+
+@router.get("/stream", response_class=StreamingResponse, dependencies=[Depends(RateLimit("contacts:read"))])
+async def stream_changes(db: AsyncSession = Depends(get_db), user: User = Depends(auth_service.get_current_user)):
+    """
+    The stream_changes function pushes the changes of the contacts of the current user, made by any client, as
+    server-sent events. Every contact event carries a change of GET /changes, with the change number as the event
+    id and the contact for upserts; a client that reconnects, or receives a resync event, catches up with
+    GET /changes?since=<last id>.
+
+    :param db: AsyncSession: The session used to authenticate, closed before streaming
+    :param user: User: Get the current user
+    :return: The event stream
+    :doc-author: Trelent
+    """
+    # The stream may stay open for hours: it must not keep a connection of the pool
+    await db.close()
+    return StreamingResponse(contact_events.stream(user.id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.get("/lookup", response_model=list[ContactResponse],
+            dependencies=[Depends(RateLimit("contacts:read")), Depends(QueryBudget(2))])
+async def lookup_contacts(response: Response, phone: str = Query(..., min_length=1, max_length=50),
+                          fields: tuple[str, ...] | None = Depends(contact_fields), db: AsyncSession = Depends(get_db),
+                          user: User = Depends(auth_service.get_current_user)):
+    """
+    The lookup_contacts function answers "who is calling": it returns the contacts of the current user with the
+    given phone number, written in any format.
+
+    :param response: Response: The response whose headers a sparse fieldset keeps
+    :param phone: str: The phone number, e.g. +380671234567 or 067 123 45 67
+    :param fields: tuple[str, ...] | None: The fields of the contacts to return
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: Get the current user
+    :return: A list of contacts
+    :doc-author: Trelent
+    """
+    contacts = await repositories_contacts.lookup_contacts(phone, db, user, fields)
+    if contacts is None:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid phone number")
+    return contacts if fields is None else sparse_contacts(contacts, fields, response)
+
+
+@router.get("/duplicates", response_model=list[DuplicateGroupResponse],
+            dependencies=[Depends(RateLimit("contacts:read")), Depends(QueryBudget(2))])
+async def get_duplicates(limit: int = Query(10, ge=1, le=100), offset: int = Query(0, ge=0),
+                         db: AsyncSession = Depends(get_db), user: User = Depends(auth_service.get_current_user)):
+    """
+    The get_duplicates function returns groups of contacts of the current user that look like the same person:
+    the same email or phone number in another format, or a similar name. The groups are computed by the
+    src.jobs.dedupe job, so contacts added since its last run are not included yet.
+
+    :param limit: int: Limit the number of groups returned
+    :param offset: int: Specify the number of groups to skip
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: Get the current user
+    :return: A list of duplicate groups
+    :doc-author: Trelent
+    """
+    return await repositories_duplicates.get_duplicate_groups(limit, offset, db, user)
+
+
+@router.post("/duplicates/merge", response_model=ContactResponse,
+             dependencies=[Depends(RateLimit("contacts:write")), Depends(QueryBudget(7))])
+async def merge_duplicates(body: ContactMergeSchema, db: AsyncSession = Depends(get_db),
+                           user: User = Depends(auth_service.get_current_user)):
+    """
+    The merge_duplicates function merges the contacts in body.merge into the contact body.keep and deletes them.
+
+    :param body: ContactMergeSchema: The contact to keep and the contacts to merge into it
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: Get the current user
+    :return: The kept contact
+    :doc-author: Trelent
+    """
+    contact = await repositories_contacts.merge_contacts(body.keep, body.merge, db, user)
+    if contact is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="NOT FOUND")
+    await contact_events.publish(user.id, repositories_changes.pending(db), [contact])
+    return contact
+
+
+@router.get("/{contact_id}", response_model=ContactResponse,
+            dependencies=[Depends(RateLimit("contacts:read")), Depends(QueryBudget(2))])
+async def get_contact(response: Response, contact_id: int = Path(..., ge=1),
+                      fields: tuple[str, ...] | None = Depends(contact_fields), db: AsyncSession = Depends(get_db),
                       user: User = Depends(auth_service.get_current_user)):
     """
     The get_contact function returns a contact by its id.
 
+    :param response: Response: The response whose headers a sparse fieldset keeps
     :param contact_id: int: Specify the contact id that will be used to retrieve a contact
     :param ge: Validate the input
+    :param fields: tuple[str, ...] | None: The fields of the contact to return
     :param db: AsyncSession: Pass the database session to the function
     :param user: User: Get the current user from the auth_service
     :return: A contact object
     :doc-author: Trelent
     """
-    contact = await repositories_contacts.get_contact(contact_id, db)
+    contact = await repositories_contacts.get_contact(contact_id, db, user, fields)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="NOT FOUND")
-    return contact
+    return contact if fields is None else sparse_contacts(contact, fields, response)
 
 
-@router.post("/", response_model=ContactResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/", response_model=ContactResponse, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(RateLimit("contacts:write")), Depends(QueryBudget(7))])
 async def create_contact(body: ContactSchema, db: AsyncSession = Depends(get_db),
                          user: User = Depends(auth_service.get_current_user)):
     """
     The create_contact function creates a new contact in the database.
+        Contact emails are unique. A taken email is answered with 409: the email is looked up only when the
+        email index reports a possible hit, and an insert that still violates the constraint is rolled back.
 
     :param body: ContactSchema: Validate the request body
     :param db: AsyncSession: Pass the database session to the repository
@@ -61,11 +295,20 @@ async def create_contact(body: ContactSchema, db: AsyncSession = Depends(get_db)
     :return: A contactschema object, which is a pydantic model
     :doc-author: Trelent
     """
-    contact = await repositories_contacts.create_contact(body, db)
+    if email_index.may_exist("contacts", body.email) and \
+            await repositories_contacts.contact_email_exists(body.email, db, user):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Contact email already exists")
+    try:
+        contact = await repositories_contacts.create_contact(body, db, user)
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Contact email already exists")
+    email_index.add("contacts", contact.email)
+    await contact_events.publish(user.id, repositories_changes.pending(db), [contact])
     return contact
 
 
-@router.put("/{contact_id}")
+@router.put("/{contact_id}", dependencies=[Depends(RateLimit("contacts:write")), Depends(QueryBudget(7))])
 async def update_contact(body: ContactUpdateSchema, contact_id: int = Path(ge=1), db: AsyncSession = Depends(get_db),
                       user: User = Depends(auth_service.get_current_user)):
     """
@@ -80,17 +323,25 @@ async def update_contact(body: ContactUpdateSchema, contact_id: int = Path(ge=1)
     :return: The updated contact object
     :doc-author: Trelent
     """
-    contact = await repositories_contacts.update_contact(contact_id, body, db, user)
+    try:
+        contact = await repositories_contacts.update_contact(contact_id, body, db, user)
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Contact email already exists")
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="NOT FOUND")
+    email_index.add("contacts", contact.email)
+    await contact_events.publish(user.id, repositories_changes.pending(db), [contact])
     return contact
 
 
-@router.delete("/{contact_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/{contact_id}", status_code=status.HTTP_204_NO_CONTENT,
+               dependencies=[Depends(RateLimit("contacts:write")), Depends(QueryBudget(5))])
 async def delete_contact(contact_id: int = Path(ge=1), db: AsyncSession = Depends(get_db),
                       user: User = Depends(auth_service.get_current_user)):
     """
     The delete_contact function deletes a contact from the database.
+        The contact is deleted softly and can be restored within CONTACT_UNDO_WINDOW seconds.
 
     :param contact_id: int: Specify the contact id to delete
     :param db: AsyncSession: Get the database session
@@ -99,4 +350,32 @@ async def delete_contact(contact_id: int = Path(ge=1), db: AsyncSession = Depend
     :doc-author: Trelent
     """
     contact = await repositories_contacts.delete_contact(contact_id, db, user)
+    await contact_events.publish(user.id, repositories_changes.pending(db))
+    return contact
+
+
+@router.post("/{contact_id}/restore", response_model=ContactResponse,
+             dependencies=[Depends(RateLimit("contacts:write")), Depends(QueryBudget(6))])
+async def restore_contact(contact_id: int = Path(ge=1), db: AsyncSession = Depends(get_db),
+                          user: User = Depends(auth_service.get_current_user)):
+    """
+    The restore_contact function undoes the deletion of a contact.
+        Only contacts deleted within CONTACT_UNDO_WINDOW seconds can be restored. When another contact took the
+        email in the meantime the restore is answered with 409.
+
+    :param contact_id: int: Specify the contact id to restore
+    :param db: AsyncSession: Get the database session
+    :param user: User: Get the current user
+    :return: The restored contact
+    :doc-author: Trelent
+    """
+    try:
+        contact = await repositories_contacts.restore_contact(contact_id, db, user)
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Contact email already exists")
+    if contact is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="NOT FOUND")
+    email_index.add("contacts", contact.email)
+    await contact_events.publish(user.id, repositories_changes.pending(db), [contact])
     return contact
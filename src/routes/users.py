@@ -1,9 +1,7 @@
 import pickle
+from functools import lru_cache
 
-import cloudinary
-import cloudinary.uploader
 from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File
-from fastapi_limiter.depends import RateLimiter
 
 from fastapi import APIRouter, HTTPException, Depends, status
 from sqlalchemy import select
@@ -15,24 +13,41 @@ from src.database.db import get_db
 from src.entity.models import User
 from src.schemas.user import UserSchema, UserResponse
 from src.services.auth import auth_service
+from src.services.query_stats import QueryBudget
+from src.services.rate_limit import RateLimit
 
 from src.conf.config import config
 from src.repository import users as repositories_users
 
 
 router = APIRouter(prefix="/users", tags=["users"])
-cloudinary.config(
-    cloud_name=config.CLOUDINARY_NAME,
-    api_key=config.CLOUDINARY_API_KEY,
-    api_secret=config.CLOUDINARY_API_SECRET,
-    secure=True,
-)
+
+
+@lru_cache
+def get_cloudinary():
+    """
+    The get_cloudinary function imports and configures cloudinary on the first avatar upload instead of at
+    application startup.
+
+    :return: The configured cloudinary module
+    :doc-author: Trelent
+    """
+    import cloudinary
+    import cloudinary.uploader
+
+    cloudinary.config(
+        cloud_name=config.CLOUDINARY_NAME,
+        api_key=config.CLOUDINARY_API_KEY,
+        api_secret=config.CLOUDINARY_API_SECRET,
+        secure=True,
+    )
+    return cloudinary
 
 
 @router.get(
     "/me",
     response_model=UserResponse,
-    dependencies=[Depends(RateLimiter(times=1, seconds=20))],
+    dependencies=[Depends(RateLimit("users:me")), Depends(QueryBudget(1))],
 )
 async def get_current_user(user: User = Depends(auth_service.get_current_user)):
     """
@@ -74,7 +89,7 @@ async def create_user(user: UserSchema, db: AsyncSession = Depends(get_db)):
 @router.patch(
     "/avatar",
     response_model=UserResponse,
-    dependencies=[Depends(RateLimiter(times=1, seconds=20))],
+    dependencies=[Depends(RateLimit("users:avatar")), Depends(QueryBudget(4))],
 )
 async def get_current_user(
     file: UploadFile = File(),
@@ -94,6 +109,7 @@ async def get_current_user(
     :return: The current user
     :doc-author: Trelent
     """
+    cloudinary = get_cloudinary()
     res = cloudinary.uploader.upload(file.file, public_id=f"GoIT/{user.email}", owerite=True)
     print(res)
     res_url = cloudinary.CloudinaryImage(public_id = f"GoIT/{user.email}").build_url(
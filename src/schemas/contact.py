@@ -1,7 +1,8 @@
 from datetime import date
-from typing import Optional
+from functools import lru_cache
+from typing import Annotated, Literal, Optional, Union
 
-from pydantic import ConfigDict, BaseModel, EmailStr, Field
+from pydantic import ConfigDict, BaseModel, EmailStr, Field, TypeAdapter, create_model
 
 
 class ContactSchema(BaseModel):
@@ -24,6 +25,7 @@ class ContactResponse(BaseModel):
     last_name: str
     email: EmailStr
     phone: str
+    phone_e164: Optional[str] = None
     birthday: date
     additional_data: str = None
     completed: bool
@@ -31,3 +33,106 @@ class ContactResponse(BaseModel):
     model_config = ConfigDict(from_attributes = True)  # noqa
 
 
+def parse_contact_fields(fields: str | None) -> tuple[str, ...] | None:
+    """
+    The parse_contact_fields function reads a sparse fieldset, e.g. ``id,first_name,last_name``, into the fields of
+    ContactResponse in the order given.
+
+    :param fields: str | None: Comma-separated field names, None or empty for all the fields
+    :return: The field names, or None for all the fields
+    :doc-author: Trelent
+    """
+    names = tuple(dict.fromkeys(name.strip() for name in (fields or "").split(",") if name.strip()))
+    unknown = [name for name in names if name not in ContactResponse.model_fields]
+    if unknown:
+        raise ValueError(f"Unknown contact fields: {', '.join(unknown)}")
+    return names or None
+
+
+@lru_cache
+def sparse_contact_response(fields: tuple[str, ...]) -> type[BaseModel]:
+    """
+    The sparse_contact_response function builds the response model of a contact restricted to the fields: the
+    fields of ContactResponse, types and validation included, and nothing else.
+
+    :param fields: tuple[str, ...]: The field names, see parse_contact_fields
+    :return: The model of the restricted contact
+    :doc-author: Trelent
+    """
+    return create_model("SparseContactResponse", __config__=ContactResponse.model_config, **{
+        name: (ContactResponse.model_fields[name].annotation, ContactResponse.model_fields[name]) for name in fields
+    })
+
+
+@lru_cache
+def sparse_contacts_adapter(fields: tuple[str, ...]) -> TypeAdapter:
+    """
+    The sparse_contacts_adapter function builds the serializer of a list of contacts restricted to the fields.
+
+    :param fields: tuple[str, ...]: The field names, see parse_contact_fields
+    :return: The adapter of a list of sparse_contact_response
+    :doc-author: Trelent
+    """
+    return TypeAdapter(list[sparse_contact_response(fields)])
+
+
+class ContactStatsResponse(BaseModel):
+    total: int = 0
+    completed: int = 0
+    by_birth_month: dict[int, int]
+
+
+class DuplicateGroupResponse(BaseModel):
+    group_id: int
+    contacts: list[ContactResponse]
+
+
+class ContactMergeSchema(BaseModel):
+    keep: int = Field(ge=1)
+    merge: list[int] = Field(min_length=1, max_length=100)
+
+
+class ContactChangeResponse(BaseModel):
+    seq: int
+    contact_id: int
+    op: Literal["upsert", "delete"]
+    contact: Optional[ContactResponse] = None
+
+
+class ContactChangesResponse(BaseModel):
+    changes: list[ContactChangeResponse]
+    next: int
+    more: bool
+
+
+class ContactBatchCreate(BaseModel):
+    op: Literal["create"]
+    body: ContactSchema
+
+
+class ContactBatchUpdate(BaseModel):
+    op: Literal["update"]
+    id: int = Field(ge=1)
+    body: ContactUpdateSchema
+
+
+class ContactBatchDelete(BaseModel):
+    op: Literal["delete"]
+    id: int = Field(ge=1)
+
+
+class ContactBatchSchema(BaseModel):
+    operations: list[Annotated[Union[ContactBatchCreate, ContactBatchUpdate, ContactBatchDelete],
+                               Field(discriminator="op")]] = Field(min_length=1, max_length=500)
+
+
+class ContactBatchResult(BaseModel):
+    op: Literal["create", "update", "delete"]
+    status: int
+    id: Optional[int] = None
+    contact: Optional[ContactResponse] = None
+    detail: Optional[str] = None
+
+
+class ContactBatchResponse(BaseModel):
+    results: list[ContactBatchResult]
@@ -0,0 +1,52 @@
+"""
+Production entry point: runs the application in several uvicorn worker processes.
+
+    python -m src.serve --workers 4
+
+Every worker sizes its database pool, Redis pool and hashing threads as its share of the global limits in Settings
+(DB_MAX_CONNECTIONS, REDIS_MAX_CONNECTIONS, HASH_MAX_THREADS), see Settings.per_worker. On SIGTERM or SIGINT the
+workers stop accepting connections and finish the requests in flight for up to WEB_GRACEFUL_TIMEOUT seconds.
+With more than one worker, a worker retires after WEB_MAX_REQUESTS requests (plus up to WEB_MAX_REQUESTS_JITTER)
+and the supervisor starts a fresh one in its place, which bounds memory growth; see WorkerRecycleMiddleware.
+"""
+import argparse
+import os
+
+import uvicorn
+
+from src.conf.config import config
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=config.WEB_HOST)
+    parser.add_argument("--port", type=int, default=config.WEB_PORT)
+    parser.add_argument("--workers", type=int, default=config.WEB_WORKERS, help="0 starts one worker per CPU")
+    parser.add_argument("--max-requests", type=int, default=config.WEB_MAX_REQUESTS,
+                        help="recycle a worker after this many requests, 0 disables recycling")
+    parser.add_argument("--max-requests-jitter", type=int, default=config.WEB_MAX_REQUESTS_JITTER)
+    parser.add_argument("--graceful-timeout", type=int, default=config.WEB_GRACEFUL_TIMEOUT,
+                        help="seconds to finish in-flight requests on shutdown")
+    parser.add_argument("--forwarded-allow-ips", default=config.WEB_FORWARDED_ALLOW_IPS,
+                        help="comma-separated proxy addresses trusted to set X-Forwarded-For/Proto")
+    args = parser.parse_args()
+
+    workers = args.workers or os.cpu_count() or 1
+    # Workers import the settings again: they size their pools and recycling from the resolved values
+    os.environ["WEB_WORKERS"] = str(workers)
+    os.environ["WEB_MAX_REQUESTS"] = str(args.max_requests)
+    os.environ["WEB_MAX_REQUESTS_JITTER"] = str(args.max_requests_jitter)
+
+    uvicorn.run(
+        "src.main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        proxy_headers=True,
+        forwarded_allow_ips=args.forwarded_allow_ips,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,73 @@
+import asyncio
 import pickle
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import cached_property
 from jose import JWTError, jwt
-import redis
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.conf.config import config
 from src.database.db import get_db
+from src.database.redis_client import redis_manager
 from src.repository import users as repository_users
+from src.services.metrics import USER_CACHE
+from src.services.revocation import revocation_list
+from src.services.token_cache import token_cache
 
 class Auth:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
     SECRET_KEY = config.SECRET_KEY_JWT
     ALGORITHM = config.ALGORITHM
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
-    cache = redis.Redis(
-        host=config.REDIS_DOMAIN,
-        port=config.REDIS_PORT,
-        db=0,
-        password=config.REDIS_PASSWORD,
-    )
+    token_cache = token_cache
+    revocation_list = revocation_list
+    ACCESS_TOKEN_LIFETIME = timedelta(minutes=config.ACCESS_TOKEN_EXPIRE_MINUTES)
+    REFRESH_TOKEN_LIFETIME = timedelta(days=7)
+    _cache = None
+
+    @cached_property
+    def pwd_context(self):
+        """
+        The pwd_context property creates the passlib context on first use, which keeps passlib out of the import
+        of the application. The bcrypt backend itself is loaded by the first hash, see services.warmup.
+
+        :param self: Represent the instance of the class
+        :return: A passlib CryptContext
+        :doc-author: Trelent
+        """
+        from passlib.context import CryptContext
+
+        return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+    @cached_property
+    def hash_executor(self) -> ThreadPoolExecutor:
+        """
+        The hash_executor property returns the thread pool bcrypt runs in. bcrypt releases the GIL, so hashing in
+        these threads keeps the event loop serving other requests; the pool is sized per worker from
+        config.HASH_MAX_THREADS.
+
+        :param self: Represent the instance of the class
+        :return: A ThreadPoolExecutor
+        :doc-author: Trelent
+        """
+        return ThreadPoolExecutor(max_workers=config.per_worker(config.HASH_MAX_THREADS), thread_name_prefix="bcrypt")
+
+    @property
+    def cache(self):
+        """
+        The cache property returns the Redis client of the user cache: the one assigned to it, or the shared
+        client of redis_manager, which is created on first use (normally in the application lifespan).
+
+        :param self: Represent the instance of the class
+        :return: A synchronous Redis client
+        :doc-author: Trelent
+        """
+        return self._cache if self._cache is not None else redis_manager.sync_client
+
+    @cache.setter
+    def cache(self, client):
+        self._cache = client
 
     def verify_password(self, plain_password, hashed_password):
         """
@@ -48,6 +95,31 @@ class Auth:
         """
         return self.pwd_context.hash(password)
 
+    async def verify_password_async(self, plain_password, hashed_password) -> bool:
+        """
+        The verify_password_async function is verify_password run in the hashing thread pool.
+
+        :param self: Represent the instance of the class
+        :param plain_password: The password entered by the user
+        :param hashed_password: The hashed password stored in the database
+        :return: A boolean value
+        :doc-author: Trelent
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.hash_executor, self.verify_password, plain_password, hashed_password)
+
+    async def get_password_hash_async(self, password: str) -> str:
+        """
+        The get_password_hash_async function is get_password_hash run in the hashing thread pool.
+
+        :param self: Represent the instance of the class
+        :param password: str: The password to hash
+        :return: The hashed password
+        :doc-author: Trelent
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.hash_executor, self.get_password_hash, password)
+
     async def create_access_token(self, data: dict, expires_delta: timedelta = None):
         """
         The create_access_token function creates a JWT token that contains the data passed to it.
@@ -63,8 +135,8 @@ class Auth:
         if expires_delta:
             expire = datetime.utcnow() + expires_delta
         else:
-            expire = datetime.utcnow() + timedelta(minutes=15)
-        to_encode.update({"exp": expire})
+            expire = datetime.utcnow() + self.ACCESS_TOKEN_LIFETIME
+        to_encode.update({"exp": expire, "iat": datetime.utcnow(), "jti": uuid.uuid4().hex})
         encoded_jwt = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
         return encoded_jwt
 
@@ -85,7 +157,7 @@ class Auth:
         if expires_delta:
             expire = datetime.utcnow() + expires_delta
         else:
-            expire = datetime.utcnow() + timedelta(days=7)
+            expire = datetime.utcnow() + self.REFRESH_TOKEN_LIFETIME
         to_encode.update({"exp": expire, "scope": "refresh_token"})
         encoded_jwt = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
         return encoded_jwt
@@ -93,24 +165,65 @@ class Auth:
     async def decode_refresh_token(self, refresh_token: str):
         """
         The decode_refresh_token function is used to decode the refresh token.
-        It takes a refresh_token as an argument and returns the email of the user if it's valid.
+        It takes a refresh_token as an argument and returns its claims if it's valid.
         If not, it raises an HTTPException with status code 401 (UNAUTHORIZED) and detail 'Could not validate credentials'.
 
 
         :param self: Represent the instance of the class
         :param refresh_token: str: Pass the refresh token to the function
-        :return: The email address of the user who is trying to refresh their access token
+        :return: The claims of the token: sub (email), jti and fam (rotation family)
         :doc-author: Trelent
         """
         try:
             payload = jwt.decode(refresh_token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
-            if payload['scope'] == 'refresh_token':
-                email = payload['sub']
-                return email
+            if payload.get('scope') == 'refresh_token' and payload.get('jti') and payload.get('fam'):
+                return payload
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid scope for token')
         except JWTError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate credentials')
 
+    def decode_access_token(self, token: str) -> dict:
+        """
+        The decode_access_token function verifies a token and returns its claims.
+        Verified claims are kept in the token cache until the token expires, so a token that is replayed on every
+        request only pays for the signature check once.
+
+        :param self: Represent the instance of the class
+        :param token: str: Pass the token that was sent in the request
+        :return: The claims of the token
+        :doc-author: Trelent
+        """
+        payload = self.token_cache.get(token)
+        if payload is None:
+            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            self.token_cache.set(token, payload)
+        return payload
+
+    async def get_access_claims(self, token: str = Depends(oauth2_scheme)) -> dict:
+        """
+        The get_access_claims function is a dependency that returns the verified claims of an access token.
+        Revoked tokens are rejected even if their claims are still in the token cache, and so are refresh tokens:
+        they outlive the revocation of their session, which only lasts for the access token lifetime.
+
+        :param self: Represent the instance of the class
+        :param token: str: Pass the token that was sent in the request
+        :return: The claims of the token
+        :doc-author: Trelent
+        """
+        credentials_exception = HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+        try:
+            payload = self.decode_access_token(token)
+        except JWTError:
+            raise credentials_exception
+        if payload.get("sub") is None or payload.get("scope") == "refresh_token" or \
+                await self.revocation_list.is_revoked(payload):
+            raise credentials_exception
+        return payload
+
     async def get_current_user(self, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
         """
         The get_current_user function is a dependency that will be used in the
@@ -128,26 +241,21 @@ class Auth:
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-        try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
-            email: str = payload.get("sub")
-            if email is None:
-                raise credentials_exception
-        except JWTError:
-            raise credentials_exception
+        payload = await self.get_access_claims(token)
+        email: str = payload["sub"]
 
         user_hash = str(email)
         user = self.cache.get(user_hash)
 
         if user is None:
-            print("User from database")
+            USER_CACHE.inc("miss")
             user = await repository_users.get_user_by_email(email, db)
             if user is None:
                 raise credentials_exception
             self.cache.set(user_hash, pickle.dumps(user))
             self.cache.expire(user_hash, time=300)
         else:
-            print("User from cache")
+            USER_CACHE.inc("hit")
             user = pickle.loads(user)
         return user
 
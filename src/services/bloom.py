@@ -0,0 +1,55 @@
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    In-process Bloom filter over strings.
+
+    A negative answer is definite, a positive answer means "possibly present" with a false positive rate close to
+    ``error_rate`` while no more than ``capacity`` items were added. Items can not be removed, rebuild the filter
+    instead.
+    """
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.001):
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> None:
+        """
+        The add function inserts an item into the filter.
+
+        :param self: Represent the instance of the class
+        :param item: str: The item to insert
+        :return: None
+        :doc-author: Trelent
+        """
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def update(self, items) -> None:
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def saturated(self) -> bool:
+        return self.count >= self.capacity
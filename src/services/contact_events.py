@@ -0,0 +1,197 @@
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Iterable
+
+from redis.asyncio import Redis
+from redis.asyncio.client import PubSub
+from redis.exceptions import RedisError
+
+from src.conf.config import config
+from src.database.redis_client import redis_manager
+from src.entity.models import Contact
+from src.schemas.contact import ContactResponse
+from src.services.metrics import CONTACT_STREAMS
+
+logger = logging.getLogger(__name__)
+
+# Sent to a connection that fell behind: its queue is dropped and the client catches up with /changes
+RESYNC = "event: resync\ndata: {}\n\n"
+# Put in the queues of the open streams on shutdown: the streams end instead of waiting for frames that never come
+CLOSED = None
+
+
+class ContactEventHub:
+    """
+    Contact changes pushed to the connected clients of their owner through Redis pub/sub.
+
+    Writers publish every change to the channel ``contacts:<user_id>``. Each worker holds a single pub/sub
+    connection, subscribed to the channels of the users that have a stream open on this worker, and one reader task
+    that fans every message out to the queues of the local streams of the user. A message is formatted once for all
+    of them, and an idle stream costs a queue, so a worker can hold tens of thousands of streams. A stream whose
+    queue of ``queue_size`` messages is full is sent a resync event and closed instead of buffering without bound.
+    """
+
+    prefix = "contacts"
+
+    def __init__(self, queue_size: int = 100, keepalive: float = 15.0, redis_client: Redis | None = None):
+        self.queue_size = queue_size
+        self.keepalive = keepalive
+        self._redis = redis_client
+        self._pubsub: PubSub | None = None
+        self._listeners: dict[int, set[asyncio.Queue]] = {}
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def redis(self) -> Redis:
+        return self._redis if self._redis is not None else redis_manager.client
+
+    def channel(self, user_id: int) -> str:
+        return f"{self.prefix}:{user_id}"
+
+    async def publish(self, user_id: int, changes: list[dict], contacts: Iterable[Contact] = ()) -> None:
+        """
+        The publish function sends committed changes to the streams of the user on every worker. Upserts carry the
+        contact. A failure is logged and does not fail the write: clients catch up with GET /api/contacts/changes.
+
+        :param self: Represent the instance of the class
+        :param user_id: int: The owner of the contacts
+        :param changes: list[dict]: The changes with seq, contact_id and op, see src.repository.changes.pending
+        :param contacts: Iterable[Contact]: The changed contacts to send with their upserts
+        :return: None
+        :doc-author: Trelent
+        """
+        if not changes:
+            return
+        by_id = {contact.id: contact for contact in contacts}
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for change in changes:
+                    contact = by_id.get(change["contact_id"]) if change["op"] == "upsert" else None
+                    pipe.publish(self.channel(user_id), json.dumps({
+                        **change,
+                        "contact": ContactResponse.model_validate(contact).model_dump(mode="json") if contact else None,
+                    }))
+                await pipe.execute()
+        except RedisError as err:
+            logger.warning("Publishing contact changes of user %s failed: %r", user_id, err)
+
+    def _dispatch(self, channel: str, data: str) -> None:
+        user_id = int(channel.rsplit(":", 1)[1])
+        queues = self._listeners.get(user_id)
+        if not queues:
+            return
+        frame = f"id: {json.loads(data)['seq']}\nevent: contact\ndata: {data}\n\n"
+        for queue in list(queues):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                queues.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=None)
+                if message is not None and message["type"] == "message":
+                    self._dispatch(message["channel"], message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                # The pub/sub connection subscribes its channels again when it reconnects
+                logger.warning("Contact event reader failed: %r", err)
+                await asyncio.sleep(1.0)
+
+    @asynccontextmanager
+    async def listen(self, user_id: int) -> AsyncIterator[asyncio.Queue]:
+        """
+        The listen function registers a local stream of the user and yields the queue of its SSE frames. The channel
+        of the user is subscribed by the first stream and unsubscribed by the last one.
+
+        :param self: Represent the instance of the class
+        :param user_id: int: The owner of the contacts
+        :return: The queue of the stream
+        :doc-author: Trelent
+        """
+        queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        async with self._lock:
+            if self._pubsub is None:
+                self._pubsub = self.redis.pubsub()
+            if user_id not in self._listeners:
+                await self._pubsub.subscribe(self.channel(user_id))
+                self._listeners[user_id] = set()
+            self._listeners[user_id].add(queue)
+            if self._task is None:
+                self._task = asyncio.create_task(self._run())
+        CONTACT_STREAMS.inc()
+        try:
+            yield queue
+        finally:
+            CONTACT_STREAMS.dec()
+            async with self._lock:
+                queues = self._listeners.get(user_id)
+                if queues is not None:
+                    queues.discard(queue)
+                    if not queues:
+                        del self._listeners[user_id]
+                        try:
+                            await self._pubsub.unsubscribe(self.channel(user_id))
+                        except RedisError as err:
+                            logger.warning("Unsubscribing contact events of user %s failed: %r", user_id, err)
+
+    async def stream(self, user_id: int) -> AsyncIterator[str]:
+        """
+        The stream function yields the server-sent events of a stream: a contact event per change, with the change
+        number as its id, and a comment every ``keepalive`` seconds so proxies keep the idle connection open.
+
+        :param self: Represent the instance of the class
+        :param user_id: int: The owner of the contacts
+        :return: The SSE frames
+        :doc-author: Trelent
+        """
+        async with self.listen(user_id) as queue:
+            yield f"retry: {int(self.keepalive * 1000)}\n\n"
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if frame is CLOSED:
+                    return
+                yield frame
+                if frame is RESYNC:
+                    return
+
+    async def stop(self) -> None:
+        """
+        The stop function stops the reader task, closes the pub/sub connection and ends the open streams of this
+        worker.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        for queues in self._listeners.values():
+            for queue in queues:
+                while queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(CLOSED)
+        self._listeners.clear()
+
+
+contact_events = ContactEventHub(queue_size=config.CONTACT_STREAM_QUEUE, keepalive=config.CONTACT_STREAM_KEEPALIVE)
@@ -0,0 +1,173 @@
+import logging
+import re
+import unicodedata
+from collections import defaultdict
+from datetime import date
+from difflib import SequenceMatcher
+from typing import NamedTuple
+
+from src.services.phones import to_e164
+
+logger = logging.getLogger(__name__)
+
+# Name blocks larger than this are too common to tell people apart ("John Smith"): they are split by birthday, and
+# the parts still larger are skipped and logged, which keeps the comparisons of an account linear in its size.
+# Email and phone blocks are matches by themselves.
+MAX_NAME_BLOCK = 100
+NAME_SIMILARITY = 0.8
+
+_SOUNDEX = {letter: str(code) for code, letters in enumerate(("bfpv", "cgjkqsxz", "dt", "l", "mn", "r"), 1)
+            for letter in letters}
+_GMAIL = {"gmail.com", "googlemail.com"}
+
+
+class Candidate(NamedTuple):
+    id: int
+    first_name: str
+    last_name: str
+    email: str | None
+    phone: str | None
+    birthday: date | None
+
+
+def normalize_email(email: str | None) -> str | None:
+    """
+    The normalize_email function lowercases an address and drops the "+tag" of the local part, and the dots of
+    Gmail addresses, which deliver to the same mailbox.
+
+    :param email: str | None: The address as entered
+    :return: The normalized address, or None when it is not an address
+    :doc-author: Trelent
+    """
+    if not email or "@" not in email:
+        return None
+    local, _, domain = email.strip().lower().rpartition("@")
+    local = local.split("+", 1)[0]
+    if domain in _GMAIL:
+        local, domain = local.replace(".", ""), "gmail.com"
+    return f"{local}@{domain}" if local else None
+
+
+def phone_key(phone: str | None) -> str | None:
+    """
+    The phone_key function returns the E.164 form of a phone number, so "+380 67 123 4567" and "067-123-45-67" get
+    the same key. Numbers that cannot be normalized fall back to their last 9 digits.
+
+    :param phone: str | None: The number as entered
+    :return: The key, or None when the number is too short to compare
+    :doc-author: Trelent
+    """
+    phone_e164 = to_e164(phone)
+    if phone_e164 is not None:
+        return phone_e164
+    digits = re.sub(r"\D", "", phone or "")
+    return digits[-9:] if len(digits) >= 7 else None
+
+
+def soundex(name: str) -> str:
+    """
+    The soundex function returns the American Soundex code of a name, e.g. "Robert" and "Rupert" are both R163.
+    Accents are dropped first; a name without Latin letters is its own key.
+
+    :param name: str: The name
+    :return: The phonetic key
+    :doc-author: Trelent
+    """
+    ascii_name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode().lower()
+    letters = [char for char in ascii_name if char.isalpha()]
+    if not letters:
+        return name.strip().lower()
+    code, previous = letters[0].upper(), _SOUNDEX.get(letters[0], "")
+    for char in letters[1:]:
+        digit = _SOUNDEX.get(char, "")
+        if digit and digit != previous:
+            code += digit
+        if char not in "hw":
+            previous = digit
+    return (code + "000")[:4]
+
+
+def blocking_keys(contact: Candidate) -> list[tuple[str, str]]:
+    keys = []
+    email = normalize_email(contact.email)
+    if email:
+        keys.append(("email", email))
+    phone = phone_key(contact.phone)
+    if phone:
+        keys.append(("phone", phone))
+    if contact.first_name and contact.last_name:
+        keys.append(("name", f"{soundex(contact.first_name)}-{soundex(contact.last_name)}"))
+    return keys
+
+
+def _similar_names(a: Candidate, b: Candidate) -> bool:
+    if a.birthday is not None and b.birthday is not None and a.birthday != b.birthday:
+        return False
+    left = f"{a.first_name} {a.last_name}".lower()
+    right = f"{b.first_name} {b.last_name}".lower()
+    return SequenceMatcher(None, left, right).ratio() >= NAME_SIMILARITY
+
+
+def find_duplicates(contacts: list[Candidate]) -> list[list[int]]:
+    """
+    The find_duplicates function groups the contacts that look like the same person. Contacts are put in blocks by
+    their normalized email, phone and phonetic name; all contacts of an email or phone block are duplicates, the
+    contacts of a name block are compared with each other by name similarity and birthday, those of a block larger
+    than MAX_NAME_BLOCK only with the contacts of the same birthday. Matches are merged transitively with a
+    union-find, so the work is linear in the number of contacts plus the bounded name blocks.
+
+    :param contacts: list[Candidate]: The contacts of one user
+    :return: The groups of contact ids with more than one member, each sorted, ordered by their first id
+    :doc-author: Trelent
+    """
+    parent = {contact.id: contact.id for contact in contacts}
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(a: int, b: int) -> None:
+        a, b = find(a), find(b)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+
+    def compare(members: list[Candidate]) -> None:
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                if find(a.id) != find(b.id) and _similar_names(a, b):
+                    union(a.id, b.id)
+
+    blocks: dict[tuple[str, str], list[Candidate]] = defaultdict(list)
+    skipped: list[int] = []
+    for contact in contacts:
+        for key in blocking_keys(contact):
+            blocks[key].append(contact)
+
+    for (kind, _), members in blocks.items():
+        if len(members) < 2:
+            continue
+        if kind != "name":
+            for member in members[1:]:
+                union(members[0].id, member.id)
+        elif len(members) <= MAX_NAME_BLOCK:
+            compare(members)
+        else:
+            # Different birthdays never match, so only the contacts of the same birthday, or of none, are compared
+            by_birthday: dict[date | None, list[Candidate]] = defaultdict(list)
+            for member in members:
+                by_birthday[member.birthday].append(member)
+            for part in by_birthday.values():
+                if len(part) <= MAX_NAME_BLOCK:
+                    compare(part)
+                else:
+                    skipped.append(len(part))
+    if skipped:
+        logger.warning("Skipped %d name blocks of %d contacts larger than %d", len(skipped), sum(skipped),
+                       MAX_NAME_BLOCK)
+
+    groups: dict[int, list[int]] = defaultdict(list)
+    for contact_id in parent:
+        groups[find(contact_id)].append(contact_id)
+    return sorted(sorted(group) for group in groups.values() if len(group) > 1)
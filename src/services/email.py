@@ -1,24 +1,36 @@
+from functools import lru_cache
 from pathlib import Path
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
 from pydantic import EmailStr
 
 from src.services.auth import auth_service
 from src.conf.config import config
+from src.services.metrics import EMAIL_OUTBOX
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=config.MAIL_USERNAME,
-    MAIL_PASSWORD=config.MAIL_PASSWORD,
-    MAIL_FROM=config.MAIL_USERNAME,
-    MAIL_PORT=config.MAIL_PORT,
-    MAIL_SERVER=config.MAIL_SERVER,
-    MAIL_FROM_NAME="IBM Systems",
-    MAIL_STARTTLS=False,
-    MAIL_SSL_TLS=True,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-    TEMPLATE_FOLDER=Path(__file__).parent / 'templates',
-)
+
+@lru_cache
+def get_mail_config():
+    """
+    The get_mail_config function builds the mail connection config on first use. fastapi_mail (and jinja2,
+    aiosmtplib) are imported here rather than at module level, which keeps them out of the application startup.
+
+    :return: The fastapi_mail ConnectionConfig
+    :doc-author: Trelent
+    """
+    from fastapi_mail import ConnectionConfig
+
+    return ConnectionConfig(
+        MAIL_USERNAME=config.MAIL_USERNAME,
+        MAIL_PASSWORD=config.MAIL_PASSWORD,
+        MAIL_FROM=config.MAIL_USERNAME,
+        MAIL_PORT=config.MAIL_PORT,
+        MAIL_SERVER=config.MAIL_SERVER,
+        MAIL_FROM_NAME="IBM Systems",
+        MAIL_STARTTLS=False,
+        MAIL_SSL_TLS=True,
+        USE_CREDENTIALS=True,
+        VALIDATE_CERTS=True,
+        TEMPLATE_FOLDER=Path(__file__).parent / 'templates',
+    )
 
 
 async def send_email(email: EmailStr, username: str, host: str):
@@ -28,6 +40,7 @@ async def send_email(email: EmailStr, username: str, host: str):
             -email: the user's email address, which is used as a recipient for the message and also as part of
                 the token verification payload. This parameter must be of type EmailStr (a custom class from pydantic)
                 so that it can be validated before being passed into this function. If validation fails, then an error will be raised by pydantic.
+        Callers increment EMAIL_OUTBOX when they queue the email, it is decremented here once the email is sent.
 
     :param email: EmailStr: Validate the email address
     :param username: str: Pass the username to the template
@@ -35,6 +48,9 @@ async def send_email(email: EmailStr, username: str, host: str):
     :return: A coroutine object
     :doc-author: Trelent
     """
+    from fastapi_mail import FastMail, MessageSchema, MessageType
+    from fastapi_mail.errors import ConnectionErrors
+
     try:
         token_verification = auth_service.create_email_token({"sub": email})
         message = MessageSchema(
@@ -44,7 +60,9 @@ async def send_email(email: EmailStr, username: str, host: str):
             subtype=MessageType.html
         )
 
-        fm = FastMail(conf)
+        fm = FastMail(get_mail_config())
         await fm.send_message(message, template_name="verify_email.html")
     except ConnectionErrors as err:
-        print(err)
\ No newline at end of file
+        print(err)
+    finally:
+        EMAIL_OUTBOX.dec()
\ No newline at end of file
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import random
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.conf.config import config
+from src.database.db import sessionmanager
+from src.entity.models import Contact, User
+from src.repository.stats import estimate_count
+from src.services.bloom import BloomFilter
+from src.services.metrics import EMAIL_INDEX
+
+logger = logging.getLogger(__name__)
+
+# How often the rebuild task checks for saturated filters, and retries a failed build
+CHECK_INTERVAL = 60.0
+
+
+class EmailIndex:
+    """
+    In-process Bloom filters over the emails of users and contacts, used to skip uniqueness pre-checks.
+
+    A miss is definite for the emails this worker has seen: the filters are built from the database at startup and
+    receive the emails written by this worker. A full build scans both tables, so it is repeated rarely: at a random
+    point between half and all of ``rebuild_interval`` seconds, which spreads the workers apart, or as soon as the
+    written emails saturate a filter. Deleted emails stay in the filter until then and only cost a database check.
+    An email written by another worker since the last build can be missed, so callers keep the unique constraints
+    and treat an IntegrityError as the conflict. Until the first build finishes every email is a possible hit and
+    the database is asked.
+    """
+
+    def __init__(self, capacity: int, error_rate: float, rebuild_interval: float, engine: AsyncEngine | None = None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rebuild_interval = rebuild_interval
+        self._engine = engine
+        self._filters: dict[str, BloomFilter] | None = None
+        self._pending: dict[str, list[str]] | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def engine(self) -> AsyncEngine:
+        return self._engine if self._engine is not None else sessionmanager.async_engine
+
+    @property
+    def loaded(self) -> bool:
+        return self._filters is not None
+
+    @property
+    def saturated(self) -> bool:
+        return self._filters is not None and any(bloom.saturated for bloom in self._filters.values())
+
+    async def _load(self, column, *criteria, batch_size: int = 10_000) -> BloomFilter:
+        stmt = select(column).where(column.is_not(None), *criteria)
+        async with self.engine.connect() as conn:
+            # Sized by the planner estimate rather than a COUNT(*) scan, with room for the emails written until the
+            # next build; where there is no estimate the configured capacity is used
+            rows = await estimate_count(conn, stmt)
+            bloom = BloomFilter(max(self.capacity, (rows or 0) * 5 // 4), self.error_rate)
+            result = await conn.stream(stmt.execution_options(yield_per=batch_size))
+            async for partition in result.scalars().partitions():
+                bloom.update(partition)
+        return bloom
+
+    async def rebuild(self) -> None:
+        """
+        The rebuild function reads the emails of all users and live contacts into new filters and swaps them in.
+        Emails added while the rebuild runs are added to the new filters too.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        started = time.perf_counter()
+        self._pending = {"users": [], "contacts": []}
+        try:
+            filters = {"users": await self._load(User.email),
+                       "contacts": await self._load(Contact.email, Contact.deleted_at.is_(None))}
+            for table, emails in self._pending.items():
+                filters[table].update(emails)
+        finally:
+            self._pending = None
+        self._filters = filters
+        logger.info("Email index rebuilt: %d users, %d contacts in %.2fs", len(filters["users"]),
+                    len(filters["contacts"]), time.perf_counter() - started)
+
+    def add(self, table: str, email: str) -> None:
+        """
+        The add function records an email written by this worker.
+
+        :param self: Represent the instance of the class
+        :param table: str: users or contacts
+        :param email: str: The email that was written
+        :return: None
+        :doc-author: Trelent
+        """
+        if self._pending is not None:
+            self._pending[table].append(email)
+        if self._filters is not None:
+            self._filters[table].add(email)
+
+    def may_exist(self, table: str, email: str) -> bool:
+        """
+        The may_exist function tells whether the email may already be taken in the table. False is definite for
+        every email known to the filter, True means the database has to be asked.
+
+        :param self: Represent the instance of the class
+        :param table: str: users or contacts
+        :param email: str: The email to check
+        :return: False when the email is certainly new
+        :doc-author: Trelent
+        """
+        if self._filters is None:
+            EMAIL_INDEX.inc(table, "not_loaded")
+            return True
+        hit = email in self._filters[table]
+        EMAIL_INDEX.inc(table, "maybe" if hit else "miss")
+        return hit
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.rebuild()
+            except Exception as err:
+                logger.warning("Email index rebuild failed: %r", err)
+                await asyncio.sleep(CHECK_INTERVAL)
+                continue
+            rebuild_at = time.monotonic() + self.rebuild_interval * random.uniform(0.5, 1.0)
+            while time.monotonic() < rebuild_at and not self.saturated:
+                await asyncio.sleep(min(CHECK_INTERVAL, self.rebuild_interval))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+email_index = EmailIndex(capacity=config.EMAIL_BLOOM_CAPACITY, error_rate=config.EMAIL_BLOOM_ERROR_RATE,
+                         rebuild_interval=config.EMAIL_BLOOM_REBUILD_INTERVAL)
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import time
+
+from redis.asyncio import Redis
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.conf.config import config
+from src.database.db import sessionmanager
+from src.database.redis_client import redis_manager
+
+logger = logging.getLogger(__name__)
+
+
+class HealthChecker:
+    """
+    Background checker of the database and Redis.
+
+    Every ``interval`` seconds both dependencies are probed once, each bounded by ``timeout``, and the result is
+    kept in memory. Liveness and readiness probes read that result: however often the orchestrator probes, the
+    worker opens at most one database connection per interval for health checks.
+    """
+
+    def __init__(self, interval: float, timeout: float, engine: AsyncEngine | None = None,
+                 redis_client: Redis | None = None):
+        self.interval = interval
+        self.timeout = timeout
+        self._engine = engine
+        self._redis = redis_client
+        self.results: dict[str, dict] = {}
+        self.checked_at: float | None = None
+        self.draining = False
+        self._task: asyncio.Task | None = None
+
+    @property
+    def engine(self) -> AsyncEngine:
+        return self._engine if self._engine is not None else sessionmanager.async_engine
+
+    @property
+    def redis(self) -> Redis:
+        return self._redis if self._redis is not None else redis_manager.client
+
+    async def _probe_database(self) -> None:
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def _probe_redis(self) -> None:
+        await self.redis.ping()
+
+    async def _probe(self, probe) -> dict:
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(probe(), self.timeout)
+            error = None
+        except Exception as err:
+            error = repr(err) if not isinstance(err, asyncio.TimeoutError) else f"timeout after {self.timeout}s"
+        return {"ok": error is None, "latency_ms": round((time.perf_counter() - start) * 1000, 2), "error": error}
+
+    async def check(self) -> dict[str, dict]:
+        """
+        The check function probes the database and Redis concurrently and stores the results.
+
+        :param self: Represent the instance of the class
+        :return: The result of every dependency: ok, latency_ms and error
+        :doc-author: Trelent
+        """
+        database, redis = await asyncio.gather(self._probe(self._probe_database), self._probe(self._probe_redis))
+        for name, result in (("database", database), ("redis", redis)):
+            previous = self.results.get(name)
+            if previous is not None and previous["ok"] != result["ok"]:
+                logger.warning("Health of %s changed: %s", name, "ok" if result["ok"] else result["error"])
+        self.results = {"database": database, "redis": redis}
+        self.checked_at = time.monotonic()
+        return self.results
+
+    @property
+    def stale(self) -> bool:
+        return self.checked_at is None or time.monotonic() - self.checked_at > 3 * self.interval + self.timeout
+
+    @property
+    def ready(self) -> bool:
+        """
+        The ready property tells whether the worker should receive traffic: the last check is recent, every
+        dependency answered, and the worker is not shutting down.
+
+        :param self: Represent the instance of the class
+        :return: True when ready
+        :doc-author: Trelent
+        """
+        return not self.draining and not self.stale and all(result["ok"] for result in self.results.values())
+
+    def report(self) -> dict:
+        age = None if self.checked_at is None else round(time.monotonic() - self.checked_at, 2)
+        return {"status": "ready" if self.ready else "unavailable", "draining": self.draining,
+                "checked_seconds_ago": age, "checks": self.results}
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self.draining = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+health_checker = HealthChecker(interval=config.HEALTH_CHECK_INTERVAL, timeout=config.HEALTH_CHECK_TIMEOUT)
@@ -0,0 +1,34 @@
+import re
+
+from src.conf.config import config
+
+
+def to_e164(phone: str | None, country_code: str | None = None) -> str | None:
+    """
+    The to_e164 function normalizes a phone number as entered into the E.164 format, e.g. "+380 67 123 4567",
+    "(067) 123-45-67" and "00380671234567" all become "+380671234567". A national number, with or without the
+    trunk zero, gets ``country_code``.
+
+    :param phone: str | None: The number as entered
+    :param country_code: str | None: Country calling code of national numbers, default PHONE_COUNTRY_CODE
+    :return: The number in E.164, or None when it cannot be a phone number
+    :doc-author: Trelent
+    """
+    if not phone:
+        return None
+    country_code = country_code or config.PHONE_COUNTRY_CODE
+    national = config.PHONE_NATIONAL_DIGITS
+    digits = re.sub(r"\D", "", phone)
+    if phone.lstrip().startswith("+"):
+        pass
+    elif digits.startswith("00"):
+        digits = digits[2:]
+    elif digits.startswith(country_code) and len(digits) == len(country_code) + national:
+        pass
+    elif len(digits) == national + 1 and digits.startswith("0"):
+        digits = country_code + digits[1:]
+    elif len(digits) == national:
+        digits = country_code + digits
+    else:
+        return None
+    return f"+{digits}" if 8 <= len(digits) <= 15 and not digits.startswith("0") else None
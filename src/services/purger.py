@@ -0,0 +1,63 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.conf.config import config
+from src.database.db import sessionmanager
+from src.jobs.purge_contacts import purge
+
+logger = logging.getLogger(__name__)
+
+
+class ContactPurger:
+    """
+    Background purge of the softly deleted contacts during the off-peak hours.
+
+    Every ``interval`` seconds the purger checks the local hour; within ``hours`` it runs src.jobs.purge_contacts,
+    which stops when the off-peak hours end, so deletes never compete with the daytime load. An empty ``hours``
+    disables the purger, e.g. when the job is run by cron instead.
+    """
+
+    def __init__(self, hours: list[int], interval: float, batch_size: int, pause: float,
+                 engine: AsyncEngine | None = None):
+        self.hours = set(hours)
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self._engine = engine
+        self._task: asyncio.Task | None = None
+
+    @property
+    def engine(self) -> AsyncEngine:
+        return self._engine if self._engine is not None else sessionmanager.async_engine
+
+    def off_peak(self) -> bool:
+        return datetime.now().hour in self.hours
+
+    async def _run(self) -> None:
+        while True:
+            if self.off_peak():
+                try:
+                    await purge(self.engine, self.batch_size, self.pause, until=self.off_peak)
+                except Exception as err:
+                    logger.warning("Contact purge failed: %r", err)
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None and self.hours:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+contact_purger = ContactPurger(hours=config.CONTACT_PURGE_HOURS, interval=config.CONTACT_PURGE_INTERVAL,
+                               batch_size=config.CONTACT_PURGE_BATCH, pause=config.CONTACT_PURGE_PAUSE)
@@ -0,0 +1,127 @@
+import logging
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.conf.config import config
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryStats:
+    """
+    SQL statements, rows and time spent in the database by one request.
+    """
+
+    __slots__ = ("statements", "rows", "duration", "budget", "route")
+
+    def __init__(self):
+        self.statements = 0
+        self.rows = 0
+        self.duration = 0.0
+        self.budget: int | None = None
+        self.route: str | None = None
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.statements > self.budget
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def begin() -> tuple[QueryStats, object]:
+    """
+    The begin function starts query accounting for the current request.
+
+    :return: The stats object and the token needed to reset the context
+    :doc-author: Trelent
+    """
+    stats = QueryStats()
+    return stats, _current.set(stats)
+
+
+def end(token) -> None:
+    _current.reset(token)
+
+
+def current() -> QueryStats | None:
+    return _current.get()
+
+
+class QueryBudget:
+    """
+    Route dependency that declares the maximum number of SQL statements a request may issue.
+
+    Exceeding the budget is logged, and raises QueryBudgetExceeded when config.DB_QUERY_BUDGET_STRICT is set (tests).
+    Usage: ``dependencies=[Depends(QueryBudget(3))]``
+    """
+
+    def __init__(self, statements: int):
+        self.statements = statements
+
+    async def __call__(self):
+        stats = current()
+        if stats is not None:
+            stats.budget = self.statements
+
+
+def check_budget(stats: QueryStats, route: str) -> None:
+    """
+    The check_budget function reports a request that issued more statements than its route declared.
+
+    :param stats: QueryStats: The stats of the finished request
+    :param route: str: The route template, used in the report
+    :return: None
+    :doc-author: Trelent
+    """
+    if not stats.over_budget:
+        return
+    message = f"{route} issued {stats.statements} SQL statements, budget is {stats.budget}"
+    if config.DB_QUERY_BUDGET_STRICT:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_stats_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_stats_start"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.duration += elapsed
+        if cursor.rowcount is not None and cursor.rowcount > 0:
+            stats.rows += cursor.rowcount
+    if elapsed * 1000 >= config.DB_SLOW_QUERY_MS:
+        logger.warning("Slow query %.1f ms (%s): %s", elapsed * 1000,
+                       stats.route if stats is not None else "-", " ".join(statement.split())[:500])
+
+
+def _handle_error(context):
+    if context.connection is not None and context.connection.info.get("query_stats_start"):
+        context.connection.info["query_stats_start"].pop()
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    The instrument_engine function attributes every statement the engine executes to the current request
+    and logs statements slower than config.DB_SLOW_QUERY_MS.
+
+    :param engine: AsyncEngine: The engine to instrument, e.g. sessionmanager.async_engine
+    :return: None
+    :doc-author: Trelent
+    """
+    sync_engine = engine.sync_engine
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(sync_engine, "handle_error", _handle_error)
@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import math
+import time
+
+from fastapi import Depends, HTTPException, Response, status
+from redis.asyncio import Redis
+
+from src.conf.config import config
+from src.database.redis_client import redis_manager
+from src.entity.models import User
+from src.services.auth import auth_service
+from src.services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+class Quota:
+    def __init__(self, times: int, seconds: int):
+        self.times = times
+        self.seconds = seconds
+
+    @classmethod
+    def parse(cls, value: str) -> "Quota":
+        """
+        The parse function builds a quota from its "<times>/<seconds>" notation, e.g. "100/60".
+
+        :param value: str: The quota notation
+        :return: A Quota object
+        :doc-author: Trelent
+        """
+        times, seconds = value.split("/")
+        return cls(int(times), int(seconds))
+
+
+class Decision:
+    def __init__(self, allowed: bool, limit: int, remaining: int, reset: float):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset
+
+    @property
+    def headers(self) -> dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.reset)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.reset)))
+        return headers
+
+
+class _Bucket:
+    """
+    Local token bucket of one (route, user) pair, plus the bookkeeping needed to synchronise it with Redis.
+    """
+
+    __slots__ = ("quota", "tokens", "updated", "pending")
+
+    def __init__(self, quota: Quota, now: float):
+        self.quota = quota
+        self.tokens = float(quota.times)
+        self.updated = now
+        self.pending = 0
+
+    def refill(self, now: float) -> None:
+        rate = self.quota.times / self.quota.seconds
+        self.tokens = min(float(self.quota.times), self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+    def reset_after(self) -> float:
+        missing = max(0.0, 1.0 - self.tokens)
+        return missing * self.quota.seconds / self.quota.times
+
+
+class RateLimiter:
+    """
+    Rate limiter with local token buckets per worker, synchronised with a Redis sliding window in batches.
+
+    Every decision is taken from the in-process bucket, so limiting costs no network round trip. A background task
+    pushes the hits counted since the last sync to a Redis sliding window counter (current and previous fixed
+    window) and caps the local bucket to what is left of the cluster wide quota. Between two syncs a worker may
+    admit at most the tokens its bucket still holds.
+
+    Keys:
+        ``ratelimit:<route>:<user>:<window>`` -> hits of all workers in the window, TTL = two windows
+    """
+
+    prefix = "ratelimit"
+
+    def __init__(self, quotas: dict[str, str], user_quotas: dict[str, dict[str, str]], default: str,
+                 sync_interval: float = 0.5, sync_batch: int = 50, redis_client: Redis | None = None):
+        self.quotas = {route: Quota.parse(value) for route, value in quotas.items()}
+        self.user_quotas = {user: {route: Quota.parse(value) for route, value in routes.items()}
+                            for user, routes in user_quotas.items()}
+        self.default = Quota.parse(default)
+        self.sync_interval = sync_interval
+        self.sync_batch = sync_batch
+        self.stats: dict[tuple[str, str], int] = {}
+        self._redis = redis_client
+        self._buckets: dict[tuple[str, str], _Bucket] = {}
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def redis(self) -> Redis:
+        return self._redis if self._redis is not None else redis_manager.client
+
+    @redis.setter
+    def redis(self, client: Redis | None):
+        self._redis = client
+
+    def quota_for(self, route: str, user: str) -> Quota:
+        """
+        The quota_for function returns the quota of a user on a route: a per-user override if configured,
+        otherwise the quota of the route, otherwise the default quota.
+
+        :param self: Represent the instance of the class
+        :param route: str: The rate limited route name, e.g. "contacts:read"
+        :param user: str: The user key (email)
+        :return: A Quota object
+        :doc-author: Trelent
+        """
+        user_quotas = self.user_quotas.get(user)
+        if user_quotas and route in user_quotas:
+            return user_quotas[route]
+        return self.quotas.get(route, self.default)
+
+    def hit(self, route: str, user: str) -> Decision:
+        """
+        The hit function takes one token from the local bucket of the user on the route.
+
+        :param self: Represent the instance of the class
+        :param route: str: The rate limited route name
+        :param user: str: The user key (email)
+        :return: The decision, with the values of the X-RateLimit-* headers
+        :doc-author: Trelent
+        """
+        now = time.monotonic()
+        key = (route, user)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(self.quota_for(route, user), now)
+        else:
+            bucket.refill(now)
+        allowed = bucket.tokens >= 1.0
+        if allowed:
+            bucket.tokens -= 1.0
+            bucket.pending += 1
+            if bucket.pending >= self.sync_batch:
+                self._wakeup.set()
+        stat = (route, "allowed" if allowed else "denied")
+        self.stats[stat] = self.stats.get(stat, 0) + 1
+        return Decision(allowed, bucket.quota.times, int(bucket.tokens), bucket.reset_after())
+
+    async def sync(self) -> None:
+        """
+        The sync function pushes pending hits to Redis and caps every local bucket to the remaining cluster quota.
+        Idle buckets that are full again are dropped to keep memory bounded. Hits stay pending until Redis has
+        counted them, so a failed sync is retried with them instead of losing them.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        now = time.time()
+        items = [(key, bucket) for key, bucket in self._buckets.items() if bucket.pending]
+        if items:
+            pushed = [bucket.pending for _, bucket in items]
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for (route, user), bucket in items:
+                    window = int(now // bucket.quota.seconds)
+                    current = f"{self.prefix}:{route}:{user}:{window}"
+                    pipe.incrby(current, bucket.pending)
+                    pipe.expire(current, bucket.quota.seconds * 2)
+                    pipe.get(f"{self.prefix}:{route}:{user}:{window - 1}")
+                results = await pipe.execute()
+            monotonic = time.monotonic()
+            for i, ((route, user), bucket) in enumerate(items):
+                # Hits taken while the pipeline ran stay pending for the next sync
+                bucket.pending -= pushed[i]
+                current_hits, previous_hits = int(results[i * 3]), int(results[i * 3 + 2] or 0)
+                elapsed = (now % bucket.quota.seconds) / bucket.quota.seconds
+                used = previous_hits * (1.0 - elapsed) + current_hits
+                bucket.refill(monotonic)
+                bucket.tokens = max(0.0, min(bucket.tokens, bucket.quota.times - used))
+        idle = [key for key, bucket in self._buckets.items()
+                if not bucket.pending and time.monotonic() - bucket.updated > bucket.quota.seconds]
+        for key in idle:
+            del self._buckets[key]
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.sync_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.sync()
+            except Exception as err:
+                logger.warning("Rate limiter sync failed: %s", err)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+rate_limiter = RateLimiter(config.RATE_LIMITS, config.RATE_LIMIT_USERS, config.RATE_LIMIT_DEFAULT,
+                           sync_interval=config.RATE_LIMIT_SYNC_INTERVAL, sync_batch=config.RATE_LIMIT_SYNC_BATCH)
+registry.callback("rate_limit_decisions_total", "Rate limiter decisions.", ("route", "decision"),
+                  lambda: rate_limiter.stats, type="counter")
+
+
+class RateLimit:
+    """
+    Route dependency that applies the rate limiter to the current user and sets the X-RateLimit-* headers.
+
+    Usage: ``dependencies=[Depends(RateLimit("contacts:read"))]``
+    """
+
+    def __init__(self, route: str):
+        self.route = route
+
+    async def __call__(self, response: Response, user: User = Depends(auth_service.get_current_user)):
+        decision = rate_limiter.hit(self.route, user.email)
+        if not decision.allowed:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many requests",
+                                headers=decision.headers)
+        response.headers.update(decision.headers)
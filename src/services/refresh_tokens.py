@@ -0,0 +1,132 @@
+import uuid
+
+from redis.asyncio import Redis
+
+from src.database.redis_client import redis_manager
+
+
+class RefreshTokenStore:
+    """
+    Redis store of live refresh tokens.
+
+    Every login starts a rotation family (one per device/session). Each refresh token carries a ``jti`` and the
+    id of its family (``fam``); refreshing consumes the ``jti`` and issues a new one in the same family. Presenting
+    a ``jti`` that was already consumed means the token leaked, so the whole family is revoked.
+
+    Keys:
+        ``refresh:token:<jti>``     -> family id, TTL = token lifetime
+        ``refresh:family:<fam>``    -> hash {sub, jti}, TTL = token lifetime
+        ``refresh:user:<sub>``      -> set of live family ids
+    """
+
+    prefix = "refresh"
+
+    def __init__(self, redis_client: Redis | None = None):
+        self._redis = redis_client
+
+    @property
+    def redis(self) -> Redis:
+        return self._redis if self._redis is not None else redis_manager.client
+
+    @redis.setter
+    def redis(self, client: Redis | None):
+        self._redis = client
+
+    def _token_key(self, jti: str) -> str:
+        return f"{self.prefix}:token:{jti}"
+
+    def _family_key(self, family: str) -> str:
+        return f"{self.prefix}:family:{family}"
+
+    def _user_key(self, subject: str) -> str:
+        return f"{self.prefix}:user:{subject}"
+
+    async def issue(self, subject: str, ttl: int, family: str | None = None) -> tuple[str, str]:
+        """
+        The issue function registers a new refresh token.
+        Without a family a new session is started, otherwise the token continues the given rotation family.
+
+        :param self: Represent the instance of the class
+        :param subject: str: The sub claim (user email)
+        :param ttl: int: Lifetime of the refresh token in seconds
+        :param family: str | None: Rotation family to continue
+        :return: A (jti, family) tuple to be embedded into the token
+        :doc-author: Trelent
+        """
+        jti = uuid.uuid4().hex
+        family = family or uuid.uuid4().hex
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(self._token_key(jti), family, ex=ttl)
+            pipe.hset(self._family_key(family), mapping={"sub": subject, "jti": jti})
+            pipe.expire(self._family_key(family), ttl)
+            pipe.sadd(self._user_key(subject), family)
+            pipe.expire(self._user_key(subject), ttl)
+            await pipe.execute()
+        return jti, family
+
+    async def consume(self, jti: str, family: str) -> bool:
+        """
+        The consume function atomically marks a refresh token as used.
+        If the token was already used (or never issued) the whole rotation family is revoked.
+
+        :param self: Represent the instance of the class
+        :param jti: str: The jti claim of the presented token
+        :param family: str: The fam claim of the presented token
+        :return: True if the token was live and may be rotated
+        :doc-author: Trelent
+        """
+        stored_family = await self.redis.getdel(self._token_key(jti))
+        if stored_family is not None and stored_family == family:
+            return True
+        await self.revoke_family(family)
+        return False
+
+    async def revoke_family(self, family: str) -> None:
+        """
+        The revoke_family function ends one session: its live refresh token can no longer be used.
+
+        :param self: Represent the instance of the class
+        :param family: str: The rotation family to revoke
+        :return: None
+        :doc-author: Trelent
+        """
+        session = await self.redis.hgetall(self._family_key(family))
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self._family_key(family))
+            if session.get("jti"):
+                pipe.delete(self._token_key(session["jti"]))
+            if session.get("sub"):
+                pipe.srem(self._user_key(session["sub"]), family)
+            await pipe.execute()
+
+    async def revoke_user(self, subject: str) -> None:
+        """
+        The revoke_user function ends every session of a user.
+
+        :param self: Represent the instance of the class
+        :param subject: str: The sub claim (user email)
+        :return: None
+        :doc-author: Trelent
+        """
+        for family in await self.redis.smembers(self._user_key(subject)):
+            await self.revoke_family(family)
+        await self.redis.delete(self._user_key(subject))
+
+    async def sessions(self, subject: str) -> set[str]:
+        """
+        The sessions function returns the live rotation families (logged in devices) of a user.
+
+        :param self: Represent the instance of the class
+        :param subject: str: The sub claim (user email)
+        :return: A set of family ids
+        :doc-author: Trelent
+        """
+        families = await self.redis.smembers(self._user_key(subject))
+        live = set()
+        for family in families:
+            if await self.redis.exists(self._family_key(family)):
+                live.add(family)
+        return live
+
+
+refresh_token_store = RefreshTokenStore()
@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import time
+
+from redis.asyncio import Redis
+
+from src.conf.config import config
+from src.database.redis_client import redis_manager
+from src.services.bloom import BloomFilter
+
+logger = logging.getLogger(__name__)
+
+
+class RevocationList:
+    """
+    Revoked access tokens, shared through Redis and mirrored into an in-process Bloom filter.
+
+    Members are ``jti:<jti>`` for a single token and ``fam:<family>`` for every access token of a session.
+
+    Keys:
+        ``revoked:<member>``  -> revocation time, TTL = access token lifetime (authoritative)
+        ``revoked:stream``    -> stream of revoked members, trimmed to the access token lifetime
+
+    Each worker reads the stream incrementally into its Bloom filter, so checking a token that was never revoked
+    is answered from memory. Only a Bloom hit is confirmed against Redis.
+    """
+
+    prefix = "revoked"
+
+    def __init__(self, ttl: int, capacity: int = 100_000, error_rate: float = 0.001,
+                 redis_client: Redis | None = None):
+        self.ttl = ttl
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._redis = redis_client
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._last_id = "0-0"
+        self._rebuilt_at = 0.0
+        self._task: asyncio.Task | None = None
+
+    @property
+    def redis(self) -> Redis:
+        return self._redis if self._redis is not None else redis_manager.client
+
+    @redis.setter
+    def redis(self, client: Redis | None):
+        self._redis = client
+
+    @property
+    def stream_key(self) -> str:
+        return f"{self.prefix}:stream"
+
+    def _key(self, member: str) -> str:
+        return f"{self.prefix}:{member}"
+
+    async def _revoke(self, member: str, ttl: int) -> None:
+        now = time.time()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(self._key(member), now, ex=max(int(ttl), 1))
+            pipe.xadd(self.stream_key, {"member": member})
+            pipe.xtrim(self.stream_key, minid=f"{int((now - self.ttl) * 1000)}-0", approximate=True)
+            await pipe.execute()
+        self._bloom.add(member)
+
+    async def revoke_token(self, jti: str, expires_at: float | None = None) -> None:
+        """
+        The revoke_token function revokes a single access token until it expires.
+
+        :param self: Represent the instance of the class
+        :param jti: str: The jti claim of the token
+        :param expires_at: float | None: The exp claim of the token, defaults to the full token lifetime
+        :return: None
+        :doc-author: Trelent
+        """
+        ttl = self.ttl if expires_at is None else min(self.ttl, expires_at - time.time())
+        if ttl > 0:
+            await self._revoke(f"jti:{jti}", ttl)
+
+    async def revoke_family(self, family: str) -> None:
+        """
+        The revoke_family function revokes every access token issued to a session (rotation family).
+
+        :param self: Represent the instance of the class
+        :param family: str: The fam claim shared by the tokens of a session
+        :return: None
+        :doc-author: Trelent
+        """
+        await self._revoke(f"fam:{family}", self.ttl)
+
+    async def is_revoked(self, payload: dict) -> bool:
+        """
+        The is_revoked function checks the claims of an access token against the revocation list.
+        Redis is only asked when the Bloom filter reports a possible hit.
+
+        :param self: Represent the instance of the class
+        :param payload: dict: The verified claims of the token
+        :return: True if the token or its session was revoked
+        :doc-author: Trelent
+        """
+        candidates = [member for member in (f"jti:{payload.get('jti')}", f"fam:{payload.get('fam')}")
+                      if not member.endswith(":None") and member in self._bloom]
+        if not candidates:
+            return False
+        values = await self.redis.mget([self._key(member) for member in candidates])
+        return any(value is not None for value in values)
+
+    async def sync(self) -> None:
+        """
+        The sync function pulls revocations made by other workers into the local Bloom filter.
+        Stream entries are read incrementally; once per token lifetime the filter is rebuilt from the stream so
+        expired revocations stop producing hits.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        now = time.time()
+        if now - self._rebuilt_at >= self.ttl or self._bloom.saturated:
+            entries = await self.redis.xrange(self.stream_key, min=f"{int((now - self.ttl) * 1000)}-0")
+            bloom = BloomFilter(max(self.capacity, len(entries) * 2), self.error_rate)
+            self._rebuilt_at = now
+        else:
+            entries = await self.redis.xrange(self.stream_key, min=f"({self._last_id}")
+            bloom = self._bloom
+        for entry_id, fields in entries:
+            bloom.add(fields["member"])
+            self._last_id = entry_id
+        self._bloom = bloom
+
+    async def _run(self, interval: float) -> None:
+        while True:
+            try:
+                await self.sync()
+            except Exception as err:
+                logger.warning("Revocation list sync failed: %s", err)
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(interval))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+revocation_list = RevocationList(ttl=config.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+                                 capacity=config.REVOCATION_BLOOM_CAPACITY,
+                                 error_rate=config.REVOCATION_BLOOM_ERROR_RATE)
@@ -0,0 +1,127 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+from src.conf.config import config
+from src.services.metrics import registry
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of verified JWT claims.
+
+    Entries are keyed by a digest of the raw token, so the tokens themselves are never kept in memory, and every
+    entry expires no later than the ``exp`` claim of the token it was built from.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: int = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[bytes, tuple[dict, float]] = OrderedDict()
+        self._by_subject: dict[str, set[bytes]] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        """
+        The digest function returns the cache key for a raw token.
+
+        :param token: str: The encoded jwt
+        :return: A 16 byte blake2b digest of the token
+        :doc-author: Trelent
+        """
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    def get(self, token: str) -> dict | None:
+        """
+        The get function returns the verified claims of a token if they are cached and not yet expired.
+
+        :param self: Represent the instance of the class
+        :param token: str: The encoded jwt
+        :return: The claims dict or None on a miss
+        :doc-author: Trelent
+        """
+        key = self.digest(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        claims, expires_at = entry
+        if expires_at <= time.time():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return claims
+
+    def set(self, token: str, claims: dict) -> None:
+        """
+        The set function stores the verified claims of a token.
+        Tokens without an ``exp`` claim are never cached, so a cached entry can not outlive its token.
+
+        :param self: Represent the instance of the class
+        :param token: str: The encoded jwt
+        :param claims: dict: The claims returned by jwt.decode
+        :return: None
+        :doc-author: Trelent
+        """
+        if self.maxsize <= 0 or claims.get("exp") is None:
+            return
+        expires_at = min(float(claims["exp"]), time.time() + self.ttl)
+        key = self.digest(token)
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (claims, expires_at)
+        subject = claims.get("sub")
+        if subject is not None:
+            self._by_subject.setdefault(subject, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            self._remove(next(iter(self._entries)))
+
+    def discard(self, token: str) -> None:
+        """
+        The discard function drops a single token from the cache, e.g. when it is revoked.
+
+        :param self: Represent the instance of the class
+        :param token: str: The encoded jwt
+        :return: None
+        :doc-author: Trelent
+        """
+        self._remove(self.digest(token))
+
+    def discard_subject(self, subject: str) -> None:
+        """
+        The discard_subject function drops every cached token issued to a subject, e.g. on "log out everywhere".
+
+        :param self: Represent the instance of the class
+        :param subject: str: The sub claim (user email)
+        :return: None
+        :doc-author: Trelent
+        """
+        for key in list(self._by_subject.get(subject, ())):
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_subject.clear()
+
+    def _remove(self, key: bytes) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        subject = entry[0].get("sub")
+        keys = self._by_subject.get(subject)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_subject[subject]
+
+
+token_cache = TokenCache(maxsize=config.TOKEN_CACHE_MAXSIZE, ttl=config.TOKEN_CACHE_TTL)
+registry.callback("token_cache_requests_total", "Verified-token cache lookups.", ("result",),
+                  lambda: {("hit",): token_cache.hits, ("miss",): token_cache.misses}, type="counter")
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import time
+
+from jose import jwt
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+from sqlalchemy.orm import configure_mappers
+
+from src.conf.config import config
+from src.database.redis_client import redis_manager
+from src.entity.models import User
+from src.repository import contacts as repository_contacts
+from src.repository import users as repository_users
+from src.services.auth import auth_service
+from src.services.metrics import STARTUP
+
+logger = logging.getLogger(__name__)
+
+
+async def open_connections(engine: AsyncEngine, connections: int) -> None:
+    """
+    The open_connections function opens ``connections`` pool connections at once and returns them to the pool,
+    so the first requests do not pay for the connection handshake.
+
+    :param engine: AsyncEngine: The engine whose pool is filled
+    :param connections: int: Number of connections to open
+    :return: None
+    :doc-author: Trelent
+    """
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(ping() for _ in range(connections)))
+
+
+async def compile_statements(session_maker: async_sessionmaker) -> None:
+    """
+    The compile_statements function configures the mappers and runs the hot repository queries once with values
+    that match nothing, which puts their compiled SQL into the engine's statement cache.
+
+    :param session_maker: async_sessionmaker: Session factory of the application engine
+    :return: None
+    :doc-author: Trelent
+    """
+    configure_mappers()
+    user = User(id=0, email="warmup@localhost")
+    async with session_maker() as db:
+        await repository_users.get_user_by_email(user.email, db)
+        await repository_contacts.get_all_contacts(1, 0, db, user)
+        await repository_contacts.get_contact(0, db, user)
+        await repository_contacts.search_contacts(db, "warmup", user)
+        await repository_contacts.get_upcoming_birthdays(db, user)
+
+
+async def ping_redis() -> None:
+    await redis_manager.client.ping()
+    await asyncio.to_thread(redis_manager.sync_client.ping)
+
+
+async def prime_bcrypt() -> None:
+    """
+    The prime_bcrypt function loads the bcrypt backend and runs one hash in the hashing thread pool; the first
+    hash in a process otherwise costs the backend detection on top of the hash itself.
+
+    :return: None
+    :doc-author: Trelent
+    """
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(auth_service.hash_executor, auth_service.pwd_context.dummy_verify)
+
+
+async def prime_jwt() -> None:
+    token = jwt.encode({"sub": "warmup"}, auth_service.SECRET_KEY, algorithm=auth_service.ALGORITHM)
+    jwt.decode(token, auth_service.SECRET_KEY, algorithms=[auth_service.ALGORITHM])
+
+
+async def warm_up(engine: AsyncEngine, session_maker: async_sessionmaker) -> dict[str, float]:
+    """
+    The warm_up function runs the warm-up steps one after the other and times them. A failing or slow step
+    (e.g. the database is not up yet) is logged and skipped: warm-up never prevents the application from starting.
+
+    :param engine: AsyncEngine: The application engine
+    :param session_maker: async_sessionmaker: Session factory bound to the engine
+    :return: Seconds spent in each step
+    :doc-author: Trelent
+    """
+    steps = {
+        "db_pool": lambda: open_connections(engine, min(config.WARMUP_DB_CONNECTIONS,
+                                                        config.per_worker(config.DB_MAX_CONNECTIONS))),
+        "db_statements": lambda: compile_statements(session_maker),
+        "redis": ping_redis,
+        "bcrypt": prime_bcrypt,
+        "jwt": prime_jwt,
+    }
+    phases = {}
+    for name, step in steps.items():
+        if name == "db_pool" and config.WARMUP_DB_CONNECTIONS <= 0:
+            continue
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(step(), config.WARMUP_TIMEOUT)
+        except Exception as err:
+            logger.warning("Warm-up step %s failed: %r", name, err)
+        phases[name] = time.perf_counter() - start
+    return phases
+
+
+def startup_report(phases: dict[str, float]) -> dict[str, float]:
+    """
+    The startup_report function publishes the startup phases as the ``app_startup_seconds`` gauge and logs them
+    in one line, so a slower startup shows up on the /metrics endpoint and in the logs.
+
+    :param phases: dict[str, float]: Seconds by phase, e.g. import, warm-up steps and total
+    :return: The phases rounded to milliseconds
+    :doc-author: Trelent
+    """
+    report = {name: round(seconds, 3) for name, seconds in phases.items()}
+    for name, seconds in report.items():
+        STARTUP.set(seconds, name)
+    logger.info("Startup: %s", ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in report.items()))
+    return report
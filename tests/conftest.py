@@ -7,15 +7,19 @@ from sqlalchemy.pool import StaticPool
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 
 from src.main import app
+from src.conf.config import config
 from src.entity.models import Base, User
 from src.database.db import get_db
 from src.services.auth import auth_service
+from src.services import query_stats
 
 SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
+config.DB_QUERY_BUDGET_STRICT = True
 
 engine = create_async_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}, poolclass=StaticPool
 )
+query_stats.instrument_engine(engine)
 
 TestingSessionLocal = async_sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
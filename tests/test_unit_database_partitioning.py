@@ -0,0 +1,48 @@
+import unittest
+
+from sqlalchemy import Column, Integer, MetaData, Table, create_mock_engine
+
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.database.partitioning import partition_statements, partition_table
+from src.jobs.partition_contacts import partition
+
+
+class TestPartitioning(unittest.TestCase):
+
+    def test_partition_statements(self):
+        self.assertEqual(partition_statements("contacts", 2), [
+            "CREATE TABLE contacts_p0 PARTITION OF contacts FOR VALUES WITH (MODULUS 2, REMAINDER 0)",
+            "CREATE TABLE contacts_p1 PARTITION OF contacts FOR VALUES WITH (MODULUS 2, REMAINDER 1)",
+        ])
+        self.assertTrue(partition_statements("shadow", 1, parent="contacts")[0].startswith(
+            "CREATE TABLE contacts_p0 PARTITION OF shadow"))
+
+    def test_partition_table_ddl(self):
+        metadata = MetaData()
+        table = Table("items", metadata, Column("user_id", Integer, primary_key=True),
+                      Column("id", Integer, primary_key=True))
+        partition_table(table, "user_id", 3)
+        statements = []
+        engine = create_mock_engine("postgresql://", lambda sql, *args, **kwargs: statements.append(
+            str(sql.compile(dialect=engine.dialect))))
+        metadata.create_all(engine, checkfirst=False)
+        self.assertIn("PARTITION BY HASH (user_id)", statements[0])
+        self.assertEqual(len([s for s in statements if "PARTITION OF items" in s]), 3)
+
+
+class TestPartitionContacts(unittest.IsolatedAsyncioTestCase):
+
+    async def test_refuses_instead_of_skipping(self):
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        try:
+            with self.assertRaises(ValueError):
+                await partition(engine, 0)
+            with self.assertRaisesRegex(RuntimeError, "needs PostgreSQL"):
+                await partition(engine, 4)
+        finally:
+            await engine.dispose()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import signal
+import unittest
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.middlewares.recycle import WorkerRecycleMiddleware
+
+
+class TestWorkerRecycleMiddleware(unittest.TestCase):
+
+    def setUp(self) -> None:
+        app = FastAPI()
+
+        @app.get("/")
+        async def index():
+            return {}
+
+        app.add_middleware(WorkerRecycleMiddleware, max_requests=3, jitter=0)
+        self.client = TestClient(app)
+
+    def test_recycles_once_after_limit(self):
+        with patch("src.middlewares.recycle.os.kill") as kill:
+            for _ in range(2):
+                self.assertEqual(self.client.get("/").status_code, 200)
+            kill.assert_not_called()
+            for _ in range(3):
+                self.assertEqual(self.client.get("/").status_code, 200)
+        kill.assert_called_once()
+        self.assertEqual(kill.call_args.args[1], signal.SIGTERM)
+
+    def test_jitter_bounds(self):
+        limits = {WorkerRecycleMiddleware(None, max_requests=100, jitter=10).limit for _ in range(200)}
+        self.assertTrue(limits <= set(range(100, 111)))
+        self.assertGreater(len(limits), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import logging
+import unittest
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from src.middlewares.request_context import HandlerTimingMiddleware, RequestContextMiddleware, RequestIdFilter
+
+app = FastAPI()
+app.add_middleware(HandlerTimingMiddleware)
+app.add_middleware(RequestContextMiddleware, static_headers={"Custom": "Example"})
+logger = logging.getLogger("test_request_context")
+logger.addFilter(RequestIdFilter())
+
+
+@app.get("/")
+async def index(request: Request):
+    logger.warning("handled")
+    return {"request_id": request.state.request_id}
+
+
+class TestRequestContextMiddleware(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.client = TestClient(app)
+
+    def test_propagates_request_id(self):
+        with self.assertLogs("test_request_context") as logs:
+            response = self.client.get("/", headers={"X-Request-ID": "abc-123"})
+        self.assertEqual(response.headers["X-Request-ID"], "abc-123")
+        self.assertEqual(response.json()["request_id"], "abc-123")
+        self.assertEqual(logs.records[0].request_id, "abc-123")
+
+    def test_generates_request_id(self):
+        response = self.client.get("/", headers={"X-Request-ID": "not a valid id"})
+        self.assertEqual(len(response.headers["X-Request-ID"]), 32)
+        self.assertEqual(response.json()["request_id"], response.headers["X-Request-ID"])
+
+    def test_static_headers_and_timing(self):
+        response = self.client.get("/")
+        self.assertEqual(response.headers["Custom"], "Example")
+        self.assertRegex(response.headers["Server-Timing"], r"^total;dur=[\d.]+, app;dur=[\d.]+$")
+
+    def test_logging_setup_installs_filter(self):
+        from src.main import configure_logging
+
+        handler = logging.StreamHandler()
+        logging.getLogger().addHandler(handler)
+        try:
+            configure_logging()
+            configure_logging()
+            self.assertEqual([type(log_filter) for log_filter in handler.filters], [RequestIdFilter])
+        finally:
+            logging.getLogger().removeHandler(handler)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from datetime import date
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from src.entity.models import Base, User
+from src.jobs.reconcile_stats import reconcile
+from src.repository.batch import run_batch
+from src.repository.changes import get_changes
+from src.repository.contacts import create_contact
+from src.repository.stats import get_stats
+from src.schemas.contact import ContactBatchSchema, ContactSchema
+
+
+def contact_body(n: int, **fields) -> dict:
+    return {"first_name": f"first{n}", "last_name": f"last{n}", "email": f"contact{n}@test.com",
+            "phone": f"{n:010d}", "birthday": date(1990, n % 12 + 1, 1), "additional_data": "data", **fields}
+
+
+class TestContactBatch(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        self.engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.session_maker = async_sessionmaker(self.engine, autoflush=False, expire_on_commit=False)
+        async with self.session_maker() as db:
+            db.add(User(id=1, username="test-user", email="test@user.com", password="password", confirmed=True))
+            await db.commit()
+        self.db = self.session_maker()
+        self.user = await self.db.get(User, 1)
+        self.contacts = [await create_contact(ContactSchema(**contact_body(n)), self.db, self.user) for n in range(3)]
+
+    async def asyncTearDown(self) -> None:
+        await self.db.close()
+        await self.engine.dispose()
+
+    async def batch(self, *operations: dict):
+        return await run_batch(ContactBatchSchema(operations=list(operations)).operations, self.db, self.user)
+
+    async def test_operations_in_order(self):
+        first, second, _ = self.contacts
+        results, contacts = await self.batch(
+            {"op": "create", "body": contact_body(10, completed=True)},
+            {"op": "update", "id": first.id, "body": contact_body(20, completed=True)},
+            {"op": "update", "id": second.id, "body": contact_body(1, completed=True)},
+            {"op": "delete", "id": second.id},
+            {"op": "delete", "id": second.id},
+            {"op": "update", "id": 99, "body": contact_body(21, completed=False)},
+        )
+        self.assertEqual([(r["op"], r["status"]) for r in results], [
+            ("create", 201), ("update", 200), ("update", 200), ("delete", 204), ("delete", 404), ("update", 404),
+        ])
+        self.assertEqual(results[0]["contact"].email, "contact10@test.com")
+        self.assertTrue(results[1]["contact"].completed)
+        self.assertEqual({contact.id for contact in contacts}, {results[0]["id"], first.id})
+
+        changes = await get_changes(3, 10, self.db, self.user)
+        self.assertEqual({(c["contact_id"], c["op"]) for c in changes["changes"]},
+                         {(results[0]["id"], "upsert"), (first.id, "upsert"), (second.id, "delete")})
+        stats = await get_stats(self.db, self.user)
+        self.assertEqual((stats["total"], stats["completed"]), (3, 2))
+        self.assertEqual(await reconcile(self.engine), 0)
+
+    async def test_taken_emails_are_conflicts(self):
+        first, second, _ = self.contacts
+        results, _ = await self.batch(
+            {"op": "create", "body": contact_body(10)},
+            {"op": "create", "body": contact_body(10)},
+            {"op": "create", "body": contact_body(1)},
+            {"op": "update", "id": second.id, "body": contact_body(10, completed=False)},
+            {"op": "update", "id": first.id, "body": contact_body(0, completed=True)},
+        )
+        self.assertEqual([r["status"] for r in results], [201, 409, 409, 409, 200])
+        self.assertEqual((await get_stats(self.db, self.user))["total"], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from src.entity.models import Base, Contact, ContactChange, User
+from src.jobs.purge_contacts import expire_tombstones
+from src.jobs.reconcile_stats import reconcile
+from src.repository.changes import backfill, get_changes
+from src.repository.contacts import create_contact, delete_contact, merge_contacts, restore_contact, update_contact
+from src.schemas.contact import ContactSchema, ContactUpdateSchema
+
+
+def contact_body(n: int) -> dict:
+    return {"first_name": f"first{n}", "last_name": f"last{n}", "email": f"contact{n}@test.com",
+            "phone": f"{n:010d}", "birthday": date(1990, 1, n + 1), "additional_data": "data"}
+
+
+class TestContactChanges(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        self.engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.session_maker = async_sessionmaker(self.engine, autoflush=False, expire_on_commit=False)
+        async with self.session_maker() as db:
+            db.add(User(id=1, username="test-user", email="test@user.com", password="password", confirmed=True))
+            await db.commit()
+        self.db = self.session_maker()
+        self.user = await self.db.get(User, 1)
+
+    async def asyncTearDown(self) -> None:
+        await self.db.close()
+        await self.engine.dispose()
+
+    async def create(self, n: int) -> Contact:
+        return await create_contact(ContactSchema(**contact_body(n)), self.db, self.user)
+
+    async def test_changes_in_order_with_tombstones(self):
+        first, second, third = [await self.create(n) for n in range(3)]
+        await update_contact(first.id, ContactUpdateSchema(**contact_body(0), completed=True), self.db, self.user)
+        await delete_contact(second.id, self.db, self.user)
+
+        changes = await get_changes(0, 10, self.db, self.user)
+        self.assertEqual([(c["contact_id"], c["op"]) for c in changes["changes"]],
+                         [(third.id, "upsert"), (first.id, "upsert"), (second.id, "delete")])
+        self.assertEqual([c["seq"] for c in changes["changes"]], [3, 4, 5])
+        self.assertTrue(changes["changes"][1]["contact"].completed)
+        self.assertIsNone(changes["changes"][2]["contact"])
+        self.assertEqual((changes["next"], changes["more"]), (5, False))
+
+        await restore_contact(second.id, self.db, self.user)
+        changes = await get_changes(5, 10, self.db, self.user)
+        self.assertEqual([(c["seq"], c["contact_id"], c["op"]) for c in changes["changes"]],
+                         [(6, second.id, "upsert")])
+        self.assertEqual(await get_changes(6, 10, self.db, self.user), {"changes": [], "next": 6, "more": False})
+
+    async def test_pages_and_merge(self):
+        contacts = [await self.create(n) for n in range(4)]
+        page = await get_changes(0, 3, self.db, self.user)
+        self.assertEqual((len(page["changes"]), page["next"], page["more"]), (3, 3, True))
+        page = await get_changes(page["next"], 3, self.db, self.user)
+        self.assertEqual((len(page["changes"]), page["next"], page["more"]), (1, 4, False))
+
+        await merge_contacts(contacts[0].id, [contacts[1].id, contacts[2].id], self.db, self.user)
+        changes = await get_changes(4, 10, self.db, self.user)
+        self.assertEqual([(c["seq"], c["contact_id"], c["op"]) for c in changes["changes"]],
+                         [(5, contacts[0].id, "upsert"), (6, contacts[1].id, "delete"), (7, contacts[2].id, "delete")])
+
+    async def test_backfill_continues_numbering(self):
+        await self.create(0)
+        async with self.engine.begin() as conn:
+            await conn.execute(insert(Contact), [{**contact_body(n), "user_id": 1} for n in (1, 2)])
+        await reconcile(self.engine)
+        async with self.engine.begin() as conn:
+            await backfill(conn)
+            await backfill(conn)
+        changes = await get_changes(0, 10, self.db, self.user)
+        self.assertEqual([c["seq"] for c in changes["changes"]], [1, 2, 3])
+        await self.create(3)
+        self.assertEqual((await get_changes(3, 10, self.db, self.user))["next"], 4)
+
+    async def test_expired_tombstones_require_full_sync(self):
+        contacts = [await self.create(n) for n in range(3)]
+        await delete_contact(contacts[0].id, self.db, self.user)
+        async with self.engine.begin() as conn:
+            await conn.execute(update(ContactChange).where(ContactChange.op == "delete")
+                               .values(changed_at=datetime.now() - timedelta(days=365)))
+
+        self.assertEqual(await expire_tombstones(self.engine, datetime.now() - timedelta(days=90), 100), 1)
+        self.assertIsNone(await get_changes(2, 10, self.db, self.user))
+        self.assertIsNotNone(await get_changes(4, 10, self.db, self.user))
+        full = await get_changes(0, 10, self.db, self.user)
+        self.assertEqual([c["contact_id"] for c in full["changes"]], [contacts[1].id, contacts[2].id])
+
+
+if __name__ == '__main__':
+    unittest.main()
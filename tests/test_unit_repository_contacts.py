@@ -5,7 +5,7 @@ from datetime import datetime, timedelta
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.schemas.contact import ContactSchema, ContactUpdateSchema
+from src.schemas.contact import ContactSchema, ContactUpdateSchema, parse_contact_fields, sparse_contacts_adapter
 from src.entity.models import Contact, User
 from src.repository.contacts import (
     create_contact,
@@ -41,6 +41,20 @@ class TestAsyncContact(unittest.IsolatedAsyncioTestCase):
         result = await get_all_contacts(limit, offset, self.session, self.user)
         self.assertEqual(result, contacts)
 
+    async def test_get_all_contacts_with_fields(self):
+        fields = parse_contact_fields("id, first_name,last_name,id")
+        self.assertEqual(fields, ("id", "first_name", "last_name"))
+        rows = [{"id": 1, "first_name": "test_first_name", "last_name": "test_last_name"}]
+        mocked_contacts = MagicMock()
+        mocked_contacts.mappings.return_value.all.return_value = rows
+        self.session.execute.return_value = mocked_contacts
+        result = await get_all_contacts(10, 0, self.session, self.user, fields)
+        stmt = self.session.execute.call_args.args[0]
+        self.assertEqual([column.name for column in stmt.selected_columns], list(fields))
+        self.assertEqual(sparse_contacts_adapter(fields).dump_python(result), rows)
+        with self.assertRaises(ValueError):
+            parse_contact_fields("id,password")
+
     async def test_get_contact(self):
         contact_id = 1
         contact = Contact(id=contact_id, first_name='test_first_name', last_name='test_last_name', user=self.user)
@@ -75,6 +89,10 @@ class TestAsyncContact(unittest.IsolatedAsyncioTestCase):
         self.session.commit = AsyncMock()
         self.session.refresh = AsyncMock()
         self.session.refresh.return_value = contact
+        # Номер зміни, зарезервований у contact_stats
+        mocked_seq = MagicMock()
+        mocked_seq.scalar_one.return_value = 1
+        self.session.execute.return_value = mocked_seq
         result = await create_contact(ContactSchema(**body), self.session, self.user)
 
         # Використання методу equals для порівняння об'єктів
@@ -92,7 +110,9 @@ class TestAsyncContact(unittest.IsolatedAsyncioTestCase):
             'completed': True
         }
         contact = Contact(id=contact_id, first_name='test_first_name', last_name='test_last_name', user=self.user)
-        self.session.execute.return_value.scalar_one_or_none.return_value = contact
+        mocked_contact = MagicMock()
+        mocked_contact.scalar_one_or_none.return_value = contact
+        self.session.execute.return_value = mocked_contact
         self.session.commit = AsyncMock()
         self.session.refresh = AsyncMock()
 
@@ -136,7 +156,7 @@ class TestAsyncContact(unittest.IsolatedAsyncioTestCase):
 
         self.session.execute.return_value = mocked_contact
         result = await delete_contact(1, self.session, self.user)
-        self.session.delete.assert_called_once()
+        self.session.delete.assert_not_called()
         self.session.commit.assert_called_once()
         self.assertIsInstance(result, Contact)
 
@@ -145,6 +165,11 @@ class TestAsyncContact(unittest.IsolatedAsyncioTestCase):
         mocked_result = [
             Contact(id=1, first_name='John', last_name='Doe', email='john.doe@example.com')
         ]
+        mocked_contacts = MagicMock()
+        mocked_contacts.scalars.return_value.all.return_value = mocked_result
+        self.session.execute.return_value = mocked_contacts
+        result = await search_contacts(self.session, query, self.user)
+        self.assertEqual(result, mocked_result)
 
     async def test_get_upcoming_birthdays(self):
         today = datetime.today().date()
@@ -155,8 +180,7 @@ class TestAsyncContact(unittest.IsolatedAsyncioTestCase):
                     user=self.user)
         ]
 
-        # Вказуємо, що scalars повертає асинхронний результат
-        mocked_scalars = AsyncMock()
+        mocked_scalars = MagicMock()
         mocked_scalars.all.return_value = contacts
 
         mocked_result = MagicMock()
@@ -0,0 +1,147 @@
+import unittest
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncConnection, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from src.entity.models import Base, Contact, ContactStats, User
+from src.jobs.purge_contacts import purge
+from src.jobs.reconcile_stats import reconcile, reconcile_users
+from src.repository.contacts import create_contact, delete_contact, get_contact, restore_contact, update_contact
+from src.repository.stats import count_contacts, get_stats
+from src.schemas.contact import ContactSchema, ContactUpdateSchema
+
+
+def contact_body(n: int, birthday: date, completed: bool = False) -> dict:
+    return {"first_name": f"first{n}", "last_name": f"last{n}", "email": f"contact{n}@test.com",
+            "phone": f"{n:010d}", "birthday": birthday, "additional_data": "data", "completed": completed}
+
+
+class TestContactStats(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        self.engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.session_maker = async_sessionmaker(self.engine, autoflush=False, expire_on_commit=False)
+        async with self.session_maker() as db:
+            db.add(User(id=1, username="test-user", email="test@user.com", password="password", confirmed=True))
+            await db.commit()
+        self.db = self.session_maker()
+        self.user = await self.db.get(User, 1)
+
+    async def asyncTearDown(self) -> None:
+        await self.db.close()
+        await self.engine.dispose()
+
+    async def test_empty_stats(self):
+        stats = await get_stats(self.db, self.user)
+        self.assertEqual(stats["total"], 0)
+        self.assertEqual(stats["completed"], 0)
+        self.assertEqual(set(stats["by_birth_month"]), set(range(1, 13)))
+        self.assertFalse(any(stats["by_birth_month"].values()))
+
+    async def test_writes_maintain_stats(self):
+        first = await create_contact(ContactSchema(**contact_body(1, date(1990, 3, 1))), self.db, self.user)
+        await create_contact(ContactSchema(**contact_body(2, date(1991, 3, 2), completed=True)), self.db, self.user)
+        await create_contact(ContactSchema(**contact_body(3, date(1992, 7, 3))), self.db, self.user)
+        stats = await get_stats(self.db, self.user)
+        self.assertEqual((stats["total"], stats["completed"]), (3, 1))
+        self.assertEqual((stats["by_birth_month"][3], stats["by_birth_month"][7]), (2, 1))
+
+        body = ContactUpdateSchema(**contact_body(1, date(1990, 12, 1), completed=True))
+        await update_contact(first.id, body, self.db, self.user)
+        stats = await get_stats(self.db, self.user)
+        self.assertEqual((stats["total"], stats["completed"]), (3, 2))
+        self.assertEqual((stats["by_birth_month"][3], stats["by_birth_month"][12]), (1, 1))
+
+        await delete_contact(first.id, self.db, self.user)
+        stats = await get_stats(self.db, self.user)
+        self.assertEqual((stats["total"], stats["completed"]), (2, 1))
+        self.assertEqual(stats["by_birth_month"][12], 0)
+
+    async def test_reconcile_corrects_drift(self):
+        for n in range(3):
+            await create_contact(ContactSchema(**contact_body(n, date(1990, 5, n + 1))), self.db, self.user)
+        async with self.engine.begin() as conn:
+            await conn.execute(delete(Contact).where(Contact.first_name == "first0"))
+
+        self.assertEqual(await reconcile(self.engine, batch_size=1), 1)
+        stats = await get_stats(self.db, self.user)
+        self.assertEqual(stats["total"], 2)
+        self.assertEqual(stats["by_birth_month"][5], 2)
+        self.assertEqual(await reconcile(self.engine), 0)
+
+    async def test_reconcile_upserts_stats_created_concurrently(self):
+        async with self.engine.begin() as conn:
+            await conn.execute(insert(Contact).values(user_id=1, **contact_body(1, date(1990, 5, 1))))
+        async with self.engine.begin() as conn:
+            execute, raced = conn.execute, []
+
+            async def racing(stmt, *args, **kwargs):
+                # A writer creates the missing stats row right after reconcile read them
+                result = await execute(stmt, *args, **kwargs)
+                if not raced:
+                    raced.append(True)
+                    await execute(insert(ContactStats).values(user_id=1, total=5, completed=5))
+                return result
+
+            with patch.object(AsyncConnection, "execute", lambda _, *args, **kwargs: racing(*args, **kwargs)):
+                self.assertEqual(await reconcile_users(conn, [1]), [1])
+        stats = await get_stats(self.db, self.user)
+        self.assertEqual((stats["total"], stats["completed"]), (1, 0))
+        self.assertEqual(stats["by_birth_month"][5], 1)
+
+    async def test_count_contacts(self):
+        for n in range(2):
+            await create_contact(ContactSchema(**contact_body(n, date(1990, 1, 1))), self.db, self.user)
+        self.assertEqual(await count_contacts(self.db, self.user), (2, True))
+        # SQLite has no planner estimate: the counter is used
+        self.assertEqual(await count_contacts(self.db, self.user, estimate=True), (2, True))
+        self.assertEqual(await count_contacts(self.db, None), (2, True))
+
+    async def test_soft_delete_and_restore(self):
+        first = await create_contact(ContactSchema(**contact_body(1, date(1990, 4, 1))), self.db, self.user)
+        await create_contact(ContactSchema(**contact_body(2, date(1990, 4, 2))), self.db, self.user)
+        await delete_contact(first.id, self.db, self.user)
+        self.assertIsNone(await get_contact(first.id, self.db, self.user))
+        self.assertEqual((await get_stats(self.db, self.user))["by_birth_month"][4], 1)
+        self.assertEqual(await reconcile(self.engine), 0)
+        # The email of a deleted contact can be used again, and then the contact can not be restored
+        await create_contact(ContactSchema(**contact_body(1, date(1990, 4, 3))), self.db, self.user)
+        with self.assertRaises(IntegrityError):
+            await restore_contact(first.id, self.db, self.user)
+        await self.db.rollback()
+
+    async def test_restore_within_undo_window(self):
+        contact = await create_contact(ContactSchema(**contact_body(1, date(1990, 6, 1), True)), self.db, self.user)
+        await delete_contact(contact.id, self.db, self.user)
+        restored = await restore_contact(contact.id, self.db, self.user)
+        self.assertEqual(restored.id, contact.id)
+        self.assertIsNone(restored.deleted_at)
+        stats = await get_stats(self.db, self.user)
+        self.assertEqual((stats["total"], stats["completed"], stats["by_birth_month"][6]), (1, 1, 1))
+
+        await delete_contact(contact.id, self.db, self.user)
+        async with self.engine.begin() as conn:
+            await conn.execute(update(Contact).values(deleted_at=datetime.now() - timedelta(days=30)))
+        self.assertIsNone(await restore_contact(contact.id, self.db, self.user))
+
+    async def test_purge_removes_expired_contacts_in_batches(self):
+        for n in range(5):
+            contact = await create_contact(ContactSchema(**contact_body(n, date(1990, 1, 1))), self.db, self.user)
+            await delete_contact(contact.id, self.db, self.user)
+        await create_contact(ContactSchema(**contact_body(9, date(1990, 1, 1))), self.db, self.user)
+
+        self.assertEqual(await purge(self.engine, batch_size=2, undo_window=3600), 0)
+        self.assertEqual(await purge(self.engine, batch_size=2, undo_window=0), 5)
+        async with self.engine.connect() as conn:
+            self.assertEqual((await conn.execute(select(func.count()).select_from(Contact))).scalar_one(), 1)
+        self.assertEqual((await get_stats(self.db, self.user))["total"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
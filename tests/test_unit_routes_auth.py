@@ -0,0 +1,80 @@
+import unittest
+
+import fakeredis
+from fakeredis import aioredis
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from src.database.db import get_db
+from src.entity.models import Base, User
+from src.routes import auth
+from src.services.auth import auth_service
+from src.services.refresh_tokens import refresh_token_store
+from src.services.revocation import revocation_list
+
+engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+session_maker = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+app = FastAPI()
+app.include_router(auth.router, prefix="/api")
+
+
+async def override_get_db():
+    async with session_maker() as db:
+        yield db
+
+
+app.dependency_overrides[get_db] = override_get_db
+
+
+async def create_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with session_maker() as db:
+        db.add(User(username="test-user", email="auth@user.com", password=auth_service.get_password_hash("secret1"),
+                    confirmed=True))
+        await db.commit()
+
+
+class TestRefreshTokenReuse(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        # The tables are created on the event loop of the client, which the connection of the engine is bound to
+        cls.client = TestClient(app).__enter__()
+        cls.client.portal.call(create_tables)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.client.portal.call(engine.dispose)
+        cls.client.__exit__(None, None, None)
+
+    def setUp(self) -> None:
+        redis = aioredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+        self.redis = (revocation_list.redis, refresh_token_store.redis)
+        revocation_list.redis = refresh_token_store.redis = redis
+
+    def tearDown(self) -> None:
+        revocation_list.redis, refresh_token_store.redis = self.redis
+
+    def refresh(self, token: str):
+        return self.client.get("/api/auth/refresh_token", headers={"Authorization": f"Bearer {token}"})
+
+    def logout(self, token: str):
+        return self.client.post("/api/auth/logout", headers={"Authorization": f"Bearer {token}"})
+
+    def test_reused_refresh_token_revokes_the_access_tokens_of_the_session(self):
+        login = self.client.post("/api/auth/login", data={"username": "auth@user.com", "password": "secret1"})
+        self.assertEqual(login.status_code, 200)
+        rotated = self.refresh(login.json()["refresh_token"])
+        self.assertEqual(rotated.status_code, 200)
+
+        self.assertEqual(self.refresh(login.json()["refresh_token"]).status_code, 401)
+        self.assertEqual(self.logout(rotated.json()["access_token"]).status_code, 401)
+        self.assertEqual(self.refresh(rotated.json()["refresh_token"]).status_code, 401)
+
+
+if __name__ == '__main__':
+    unittest.main()
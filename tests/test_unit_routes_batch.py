@@ -0,0 +1,143 @@
+import unittest
+from datetime import date
+from unittest.mock import AsyncMock, patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from src.conf.config import config
+from src.database.db import get_db
+from src.entity.models import Base, Contact, User
+from src.middlewares.query_stats import QueryStatsMiddleware
+from src.routes import batch
+from src.services import query_stats
+from src.services.auth import auth_service
+from src.services.contact_events import contact_events
+from src.services.email_index import email_index
+from src.services.rate_limit import rate_limiter
+
+engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+query_stats.instrument_engine(engine)
+session_maker = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+user = User(id=1, username="batch-user", email="batch@user.com", password="password", confirmed=True)
+
+app = FastAPI()
+app.add_middleware(QueryStatsMiddleware)
+app.include_router(batch.router, prefix="/api")
+
+
+async def override_get_db():
+    async with session_maker() as db:
+        yield db
+
+
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[auth_service.get_current_user] = lambda: user
+
+
+def contact_body(n: int, **fields) -> dict:
+    return {"first_name": f"first{n}", "last_name": f"last{n}", "email": f"contact{n}@test.com",
+            "phone": f"{n:010d}", "birthday": str(date(1990, n % 12 + 1, 1)), "additional_data": "data",
+            "completed": False, **fields}
+
+
+async def create_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with session_maker() as db:
+        db.add(User(id=1, username="batch-user", email="batch@user.com", password="password", confirmed=True))
+        db.add_all(Contact(id=n, user_id=1, **{**contact_body(n), "birthday": date(1990, n % 12 + 1, 1)})
+                   for n in range(1, 201))
+        await db.commit()
+
+
+async def first_name(contact_id: int) -> str:
+    async with session_maker() as db:
+        return await db.scalar(select(Contact.first_name).where(Contact.id == contact_id))
+
+
+class TestBatchRoute(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        # The tables are created on the event loop of the client, which the connection of the engine is bound to
+        cls.client = TestClient(app).__enter__()
+        cls.client.portal.call(create_tables)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.client.portal.call(engine.dispose)
+        cls.client.__exit__(None, None, None)
+
+    def setUp(self) -> None:
+        self.config = (config.DB_QUERY_HEADERS, config.DB_QUERY_BUDGET_STRICT)
+        config.DB_QUERY_HEADERS = config.DB_QUERY_BUDGET_STRICT = True
+        rate_limiter._buckets.pop(("contacts:batch", user.email), None)
+
+    def tearDown(self) -> None:
+        config.DB_QUERY_HEADERS, config.DB_QUERY_BUDGET_STRICT = self.config
+
+    def post(self, *operations: dict):
+        return self.client.post("/api/batch", json={"operations": list(operations)})
+
+    def test_mixed_batch_within_the_query_budget(self):
+        operations = [{"op": "create", "body": contact_body(n)} for n in range(1000, 1200)]
+        operations += [{"op": "update", "id": n, "body": contact_body(n, first_name="renamed")}
+                       for n in range(1, 101)]
+        operations += [{"op": "delete", "id": n} for n in range(101, 201)]
+        operations += [{"op": "delete", "id": 999}, {"op": "create", "body": contact_body(1)},
+                       {"op": "update", "id": 998, "body": contact_body(997)}]
+        with patch.object(email_index, "add") as add, \
+                patch.object(contact_events, "publish", new_callable=AsyncMock) as publish:
+            response = self.post(*operations)
+        self.assertEqual(response.status_code, 200)
+        # Statements do not grow with the batch: loads, three writes, stats, change log, commit reload
+        self.assertEqual(response.headers["X-DB-Queries"], "9")
+        statuses = [result["status"] for result in response.json()["results"]]
+        self.assertEqual(statuses, [201] * 200 + [200] * 100 + [204] * 100 + [404, 409, 404])
+
+        self.assertEqual(add.call_count, 300)
+        add.assert_any_call("contacts", "contact1000@test.com")
+        add.assert_any_call("contacts", "contact1@test.com")
+        publish.assert_awaited_once()
+        user_id, changes, contacts = publish.await_args.args
+        self.assertEqual((user_id, len(changes), len(contacts)), (1, 400, 300))
+        self.assertEqual({change["op"] for change in changes}, {"upsert", "delete"})
+
+    def test_integrity_error_rolls_back_the_batch(self):
+        async def racing(operations, db, current_user):
+            await db.execute(update(Contact).where(Contact.id == 1).values(first_name="written"))
+            raise IntegrityError("INSERT INTO contacts", {}, Exception("UNIQUE constraint failed"))
+
+        with patch.object(batch.repositories_batch, "run_batch", racing), \
+                patch.object(email_index, "add") as add, \
+                patch.object(contact_events, "publish", new_callable=AsyncMock) as publish:
+            response = self.post({"op": "create", "body": contact_body(2000)})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["detail"], "Contact email already exists")
+        self.assertNotEqual(self.client.portal.call(first_name, 1), "written")
+        add.assert_not_called()
+        publish.assert_not_awaited()
+
+    def test_operations_are_validated(self):
+        self.assertEqual(self.post().status_code, 422)
+        too_many = [{"op": "delete", "id": n} for n in range(1, 502)]
+        self.assertEqual(self.post(*too_many).status_code, 422)
+        self.assertEqual(self.post({"op": "merge", "id": 1}).status_code, 422)
+
+    def test_rate_limit(self):
+        limit = int(self.post({"op": "delete", "id": 999}).headers["X-RateLimit-Limit"])
+        self.assertEqual(f"{limit}/60", config.RATE_LIMITS["contacts:batch"])
+        for _ in range(limit - 1):
+            self.assertEqual(self.post({"op": "delete", "id": 999}).status_code, 200)
+        response = self.post({"op": "delete", "id": 999})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from datetime import date
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from src.database.db import get_db
+from src.entity.models import Base, Contact, User
+from src.routes import contacts
+from src.services.auth import auth_service
+
+engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+session_maker = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+user = User(id=1, username="test-user", email="routes@user.com", password="password", confirmed=True)
+
+app = FastAPI()
+app.include_router(contacts.router, prefix="/api")
+
+
+async def override_get_db():
+    async with session_maker() as db:
+        yield db
+
+
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[auth_service.get_current_user] = lambda: user
+
+
+async def create_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with session_maker() as db:
+        db.add(User(id=1, username="test-user", email="routes@user.com", password="password", confirmed=True))
+        db.add(Contact(id=1, first_name="first", last_name="last", email="contact@test.com", phone="0501234567",
+                       birthday=date(1990, 1, 1), additional_data="data", completed=False, user_id=1))
+        await db.commit()
+
+
+class TestSparseFieldsets(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        # The tables are created on the event loop of the client, which the connection of the engine is bound to
+        cls.client = TestClient(app).__enter__()
+        cls.client.portal.call(create_tables)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.client.portal.call(engine.dispose)
+        cls.client.__exit__(None, None, None)
+
+    def test_sparse_list_keeps_the_headers(self):
+        full = self.client.get("/api/contacts/")
+        sparse = self.client.get("/api/contacts/", params={"fields": "id,first_name"})
+        self.assertEqual(sparse.status_code, 200)
+        self.assertEqual(sparse.json(), [{"id": 1, "first_name": "first"}])
+        for name in ("X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-Reset", "X-Total-Count"):
+            self.assertIn(name, sparse.headers)
+        self.assertEqual(sparse.headers["X-RateLimit-Limit"], full.headers["X-RateLimit-Limit"])
+        self.assertEqual(int(sparse.headers["X-RateLimit-Remaining"]), int(full.headers["X-RateLimit-Remaining"]) - 1)
+
+    def test_sparse_contact_keeps_the_headers(self):
+        response = self.client.get("/api/contacts/1", params={"fields": "email"})
+        self.assertEqual(response.json(), {"email": "contact@test.com"})
+        self.assertIn("X-RateLimit-Remaining", response.headers)
+        self.assertEqual(response.headers["content-length"], str(len(response.content)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import unittest
+from datetime import date
+
+import fakeredis
+from fakeredis import aioredis
+
+from src.entity.models import Contact
+from src.services.contact_events import RESYNC, ContactEventHub
+
+
+def contact(contact_id: int) -> Contact:
+    return Contact(id=contact_id, first_name="first", last_name="last", email=f"contact{contact_id}@test.com",
+                   phone="0501234567", birthday=date(1990, 1, 1), additional_data="data", completed=False)
+
+
+class TestContactEventHub(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        server = fakeredis.FakeServer()
+        self.writer = ContactEventHub(redis_client=aioredis.FakeRedis(server=server, decode_responses=True))
+        self.worker = ContactEventHub(queue_size=2, keepalive=0.05,
+                                      redis_client=aioredis.FakeRedis(server=server, decode_responses=True))
+
+    async def asyncTearDown(self) -> None:
+        await self.worker.stop()
+
+    async def test_fan_out_to_the_streams_of_the_user(self):
+        async with self.worker.listen(1) as first, self.worker.listen(1) as second, self.worker.listen(2) as other:
+            self.assertEqual(len(self.worker._listeners), 2)
+            await self.writer.publish(1, [{"seq": 7, "contact_id": 3, "op": "upsert"}], [contact(3)])
+            frame = await asyncio.wait_for(first.get(), 1)
+            self.assertEqual(await asyncio.wait_for(second.get(), 1), frame)
+            self.assertTrue(other.empty())
+
+        header, event, data = frame.strip().split("\n")
+        self.assertEqual((header, event), ("id: 7", "event: contact"))
+        self.assertEqual(json.loads(data[len("data: "):])["contact"]["email"], "contact3@test.com")
+        self.assertEqual(self.worker._listeners, {})
+
+    async def test_slow_stream_is_told_to_resync(self):
+        async with self.worker.listen(1) as queue:
+            await self.writer.publish(1, [{"seq": seq, "contact_id": seq, "op": "delete"} for seq in range(1, 4)])
+            await asyncio.sleep(0.1)
+            self.assertEqual(queue.get_nowait(), RESYNC)
+            self.assertNotIn(queue, self.worker._listeners[1])
+
+    async def test_stream_sends_keepalives_and_events(self):
+        frames = self.worker.stream(1)
+        self.assertTrue((await anext(frames)).startswith("retry: "))
+        self.assertEqual(await anext(frames), ": keepalive\n\n")
+        await self.writer.publish(1, [{"seq": 1, "contact_id": 1, "op": "delete"}])
+        frame = await anext(frames)
+        while frame == ": keepalive\n\n":
+            frame = await anext(frames)
+        self.assertIn('"contact": null', frame)
+        await frames.aclose()
+        self.assertEqual(self.worker._listeners, {})
+
+    async def test_stop_ends_the_open_streams(self):
+        frames = self.worker.stream(1)
+        await anext(frames)
+        pending = asyncio.ensure_future(anext(frames))
+        await asyncio.sleep(0)
+        await self.worker.stop()
+        for _ in range(5):
+            try:
+                self.assertEqual(await asyncio.wait_for(pending, 1), ": keepalive\n\n")
+            except StopAsyncIteration:
+                break
+            pending = asyncio.ensure_future(anext(frames))
+        else:
+            self.fail("The stream was not ended")
+        self.assertEqual(self.worker._listeners, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+from datetime import date, timedelta
+
+from src.services.dedupe import Candidate, find_duplicates, normalize_email, phone_key, soundex
+
+
+class TestDedupe(unittest.TestCase):
+
+    def test_normalize_email(self):
+        self.assertEqual(normalize_email(" John.Doe+work@GoogleMail.com"), "johndoe@gmail.com")
+        self.assertEqual(normalize_email("a.b+x@example.com"), "a.b@example.com")
+        self.assertIsNone(normalize_email("not an address"))
+
+    def test_phone_key(self):
+        self.assertEqual(phone_key("+380 67 123 4567"), phone_key("(067) 123-45-67"))
+        self.assertIsNone(phone_key("12-34"))
+
+    def test_soundex(self):
+        self.assertEqual(soundex("Robert"), "R163")
+        self.assertEqual(soundex("Rupert"), "R163")
+        self.assertEqual(soundex("Ashcraft"), "A261")
+        self.assertEqual(soundex("Tymczak"), "T522")
+        self.assertEqual(soundex("Олег"), "олег")
+
+    def test_find_duplicates(self):
+        contacts = [
+            Candidate(1, "John", "Smith", "john.smith@gmail.com", "+380671234567", date(1990, 1, 1)),
+            Candidate(2, "Jon", "Smith", "johnsmith+old@gmail.com", "111-222-333-0", date(1990, 1, 1)),
+            Candidate(3, "Jane", "Doe", "jane@example.com", "0501112233", date(1985, 5, 5)),
+            Candidate(4, "J.", "Doe", "doe@example.com", "+38 (050) 111 22 33", None),
+            Candidate(5, "Jhon", "Smyth", "other@example.com", "0990000000", date(1990, 1, 1)),
+            Candidate(6, "Jhon", "Smyth", "third@example.com", "0660000000", date(1970, 1, 1)),
+            Candidate(7, "Mary", "Major", "mary@example.com", "0670000000", None),
+        ]
+        self.assertEqual(find_duplicates(contacts), [[1, 2, 5], [3, 4]])
+
+    def test_common_names_are_not_compared(self):
+        contacts = [Candidate(i, "John", "Smith", f"js{i}@example.com", None, None) for i in range(1, 500)]
+        with self.assertLogs("src.services.dedupe", "WARNING") as logs:
+            self.assertEqual(find_duplicates(contacts), [])
+        self.assertIn("Skipped 1 name blocks of 499 contacts", logs.output[0])
+
+    def test_common_names_are_split_by_birthday(self):
+        contacts = [Candidate(i, "John", "Smith", f"js{i}@example.com", None, date(1950, 1, 1) + timedelta(days=i))
+                    for i in range(1, 300)]
+        contacts.append(Candidate(300, "Jon", "Smith", "other@example.com", None, date(1950, 1, 1) + timedelta(7)))
+        self.assertEqual(find_duplicates(contacts), [[7, 300]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from datetime import date
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from src.entity.models import Base, Contact, User
+from src.services.email_index import EmailIndex
+
+
+class TestEmailIndex(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        self.engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with async_sessionmaker(self.engine)() as db:
+            db.add(User(id=1, username="user", email="user@example.com", password="password"))
+            db.add(Contact(first_name="a", last_name="b", email="contact@example.com", phone="1",
+                           birthday=date(1990, 1, 1), additional_data="d", user_id=1))
+            await db.commit()
+        self.index = EmailIndex(capacity=1000, error_rate=0.001, rebuild_interval=60, engine=self.engine)
+
+    async def asyncTearDown(self) -> None:
+        await self.index.stop()
+        await self.engine.dispose()
+
+    async def test_every_email_may_exist_before_the_build(self):
+        self.assertFalse(self.index.loaded)
+        self.assertTrue(self.index.may_exist("users", "new@example.com"))
+
+    async def test_rebuild_reads_existing_emails(self):
+        await self.index.rebuild()
+        self.assertTrue(self.index.may_exist("users", "user@example.com"))
+        self.assertTrue(self.index.may_exist("contacts", "contact@example.com"))
+        self.assertFalse(self.index.may_exist("users", "contact@example.com"))
+        self.assertFalse(self.index.may_exist("contacts", "new@example.com"))
+
+    async def test_add(self):
+        await self.index.rebuild()
+        self.index.add("contacts", "new@example.com")
+        self.assertTrue(self.index.may_exist("contacts", "new@example.com"))
+
+    async def test_written_emails_saturate_the_filters(self):
+        await self.index.rebuild()
+        self.assertFalse(self.index.saturated)
+        for n in range(self.index.capacity):
+            self.index.add("contacts", f"new{n}@example.com")
+        self.assertTrue(self.index.saturated)
+        await self.index.rebuild()
+        self.assertFalse(self.index.saturated)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+import fakeredis
+from fakeredis import aioredis
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.services.health import HealthChecker
+
+
+class TestHealthChecker(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        self.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        self.server = fakeredis.FakeServer()
+        self.checker = HealthChecker(interval=60, timeout=1, engine=self.engine,
+                                     redis_client=aioredis.FakeRedis(server=self.server))
+
+    async def asyncTearDown(self) -> None:
+        await self.checker.stop()
+        await self.engine.dispose()
+
+    async def test_not_ready_before_first_check(self):
+        self.assertFalse(self.checker.ready)
+        self.assertEqual(self.checker.report()["status"], "unavailable")
+
+    async def test_ready_when_dependencies_answer(self):
+        results = await self.checker.check()
+        self.assertTrue(results["database"]["ok"])
+        self.assertTrue(results["redis"]["ok"])
+        self.assertTrue(self.checker.ready)
+
+    async def test_not_ready_when_redis_is_down(self):
+        self.server.connected = False
+        results = await self.checker.check()
+        self.assertFalse(results["redis"]["ok"])
+        self.assertIsNotNone(results["redis"]["error"])
+        self.assertFalse(self.checker.ready)
+
+    async def test_stale_result_is_not_ready(self):
+        await self.checker.check()
+        self.checker.checked_at -= 1000
+        self.assertTrue(self.checker.stale)
+        self.assertFalse(self.checker.ready)
+
+    async def test_draining_after_stop(self):
+        await self.checker.check()
+        self.checker.start()
+        await self.checker.stop()
+        self.assertFalse(self.checker.ready)
+        self.assertTrue(self.checker.report()["draining"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+from src.services.metrics import Registry
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.registry = Registry()
+
+    def test_counter(self):
+        counter = self.registry.counter("requests_total", "Requests.", ("route",))
+        counter.inc("/a")
+        counter.inc("/a", amount=2)
+        self.assertEqual(counter.value("/a"), 3)
+        self.assertIn('requests_total{route="/a"} 3.0', self.registry.render())
+
+    def test_gauge(self):
+        gauge = self.registry.gauge("in_flight", "In flight.")
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        self.assertIn("in_flight 1.0", self.registry.render())
+
+    def test_histogram(self):
+        histogram = self.registry.histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+        histogram.observe(0.05, "/a")
+        histogram.observe(0.5, "/a")
+        histogram.observe(5, "/a")
+        text = self.registry.render()
+        self.assertIn('latency_seconds_bucket{route="/a",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{route="/a",le="1.0"} 2', text)
+        self.assertIn('latency_seconds_bucket{route="/a",le="+Inf"} 3', text)
+        self.assertIn('latency_seconds_count{route="/a"} 3', text)
+        self.assertIn("# TYPE latency_seconds histogram", text)
+
+    def test_callback(self):
+        stats = {("users:me", "allowed"): 2}
+        self.registry.callback("decisions_total", "Decisions.", ("route", "decision"), lambda: stats, type="counter")
+        self.assertIn('decisions_total{route="users:me",decision="allowed"} 2', self.registry.render())
+
+    def test_label_escaping(self):
+        counter = self.registry.counter("errors_total", "Errors.", ("detail",))
+        counter.inc('say "hi"')
+        self.assertIn('errors_total{detail="say \\"hi\\""} 1.0', self.registry.render())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+import unittest
+
+from src.services.phones import to_e164
+
+
+class TestToE164(unittest.TestCase):
+
+    def test_formats_of_one_number(self):
+        for phone in ("+380 67 123 4567", "(067) 123-45-67", "0671234567", "671234567", "380671234567",
+                      "00380671234567", "+38 (067) 123-45-67"):
+            with self.subTest(phone=phone):
+                self.assertEqual(to_e164(phone), "+380671234567")
+
+    def test_foreign_numbers(self):
+        self.assertEqual(to_e164("+1 (415) 555-2671"), "+14155552671")
+        self.assertEqual(to_e164("0014155552671"), "+14155552671")
+        self.assertEqual(to_e164("0501112233", country_code="48"), "+48501112233")
+
+    def test_invalid(self):
+        for phone in (None, "", "12-34", "not a phone", "+0123456789", "12345678901234567"):
+            with self.subTest(phone=phone):
+                self.assertIsNone(to_e164(phone))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from src.conf.config import config
+from src.middlewares.query_stats import QueryStatsMiddleware
+from src.services import query_stats
+from src.services.query_stats import QueryBudget, QueryBudgetExceeded
+
+engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+query_stats.instrument_engine(engine)
+
+app = FastAPI()
+app.add_middleware(QueryStatsMiddleware)
+
+
+async def run_queries(n: int):
+    async with engine.connect() as conn:
+        for _ in range(n):
+            await conn.execute(text("SELECT 1"))
+
+
+@app.get("/two", dependencies=[Depends(QueryBudget(2))])
+async def two():
+    await run_queries(2)
+    return {}
+
+
+@app.get("/three", dependencies=[Depends(QueryBudget(2))])
+async def three():
+    await run_queries(3)
+    return {}
+
+
+class TestQueryStats(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.config = (config.DB_QUERY_HEADERS, config.DB_QUERY_BUDGET_STRICT)
+        config.DB_QUERY_HEADERS = True
+        config.DB_QUERY_BUDGET_STRICT = True
+
+    def tearDown(self) -> None:
+        config.DB_QUERY_HEADERS, config.DB_QUERY_BUDGET_STRICT = self.config
+
+    def test_headers(self):
+        with TestClient(app) as client:
+            response = client.get("/two")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["X-DB-Queries"], "2")
+        self.assertIn('desc="2 queries"', response.headers["Server-Timing"])
+
+    def test_budget_exceeded_raises_in_strict_mode(self):
+        with TestClient(app) as client:
+            with self.assertRaises(QueryBudgetExceeded):
+                client.get("/three")
+
+    def test_budget_exceeded_is_logged(self):
+        config.DB_QUERY_BUDGET_STRICT = False
+        with TestClient(app) as client:
+            with self.assertLogs("src.services.query_stats", level="WARNING") as logs:
+                response = client.get("/three")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("/three issued 3 SQL statements, budget is 2", logs.output[0])
+
+    def test_slow_query_is_logged(self):
+        slow_query_ms, config.DB_SLOW_QUERY_MS = config.DB_SLOW_QUERY_MS, 0
+        try:
+            with TestClient(app) as client:
+                with self.assertLogs("src.services.query_stats", level="WARNING") as logs:
+                    client.get("/two")
+        finally:
+            config.DB_SLOW_QUERY_MS = slow_query_ms
+        self.assertIn("Slow query", logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
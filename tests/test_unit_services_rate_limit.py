@@ -0,0 +1,65 @@
+import unittest
+from unittest.mock import patch
+
+import fakeredis
+from fakeredis import aioredis
+from redis.exceptions import RedisError
+
+from src.services.rate_limit import RateLimiter, Quota
+
+
+class TestRateLimiter(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        server = fakeredis.FakeServer()
+        quotas = {"contacts:read": "5/60"}
+        user_quotas = {"whale@user.com": {"contacts:read": "10/60"}}
+        self.worker_1 = RateLimiter(quotas, user_quotas, "1/60",
+                                    redis_client=aioredis.FakeRedis(server=server, decode_responses=True))
+        self.worker_2 = RateLimiter(quotas, user_quotas, "1/60",
+                                    redis_client=aioredis.FakeRedis(server=server, decode_responses=True))
+
+    def test_parse_quota(self):
+        quota = Quota.parse("100/60")
+        self.assertEqual((quota.times, quota.seconds), (100, 60))
+
+    def test_quota_resolution(self):
+        self.assertEqual(self.worker_1.quota_for("contacts:read", "test@user.com").times, 5)
+        self.assertEqual(self.worker_1.quota_for("contacts:read", "whale@user.com").times, 10)
+        self.assertEqual(self.worker_1.quota_for("contacts:write", "test@user.com").times, 1)
+
+    def test_local_bucket(self):
+        decisions = [self.worker_1.hit("contacts:read", "test@user.com") for _ in range(6)]
+        self.assertTrue(all(decision.allowed for decision in decisions[:5]))
+        self.assertFalse(decisions[5].allowed)
+        self.assertEqual(decisions[4].remaining, 0)
+        self.assertEqual(decisions[5].headers["X-RateLimit-Limit"], "5")
+        self.assertIn("Retry-After", decisions[5].headers)
+        self.assertEqual(self.worker_1.stats[("contacts:read", "denied")], 1)
+
+    def test_users_are_independent(self):
+        self.worker_1.hit("contacts:write", "test@user.com")
+        self.assertTrue(self.worker_1.hit("contacts:write", "other@user.com").allowed)
+
+    async def test_sync_shares_quota_between_workers(self):
+        for _ in range(4):
+            self.worker_1.hit("contacts:read", "test@user.com")
+        self.worker_2.hit("contacts:read", "test@user.com")
+        await self.worker_1.sync()
+        await self.worker_2.sync()
+        self.assertFalse(self.worker_2.hit("contacts:read", "test@user.com").allowed)
+
+    async def test_failed_sync_keeps_pending_hits(self):
+        for _ in range(3):
+            self.worker_1.hit("contacts:read", "test@user.com")
+        with patch("redis.asyncio.client.Pipeline.execute", side_effect=RedisError("down")):
+            with self.assertRaises(RedisError):
+                await self.worker_1.sync()
+        await self.worker_1.sync()
+        self.worker_2.hit("contacts:read", "test@user.com")
+        await self.worker_2.sync()
+        self.assertEqual(self.worker_2.hit("contacts:read", "test@user.com").remaining, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+from fakeredis import aioredis
+
+from src.services.refresh_tokens import RefreshTokenStore
+
+
+class TestRefreshTokenStore(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        self.redis = aioredis.FakeRedis(decode_responses=True)
+        self.store = RefreshTokenStore(self.redis)
+        self.email = "test@user.com"
+
+    async def asyncTearDown(self) -> None:
+        await self.redis.aclose()
+
+    async def test_issue_sets_ttl(self):
+        jti, family = await self.store.issue(self.email, ttl=60)
+        self.assertEqual(await self.redis.get(f"refresh:token:{jti}"), family)
+        self.assertLessEqual(await self.redis.ttl(f"refresh:token:{jti}"), 60)
+        self.assertEqual(await self.store.sessions(self.email), {family})
+
+    async def test_rotation(self):
+        jti, family = await self.store.issue(self.email, ttl=60)
+        self.assertTrue(await self.store.consume(jti, family))
+        new_jti, new_family = await self.store.issue(self.email, ttl=60, family=family)
+        self.assertEqual(new_family, family)
+        self.assertTrue(await self.store.consume(new_jti, family))
+
+    async def test_reuse_revokes_family(self):
+        jti, family = await self.store.issue(self.email, ttl=60)
+        await self.store.consume(jti, family)
+        new_jti, _ = await self.store.issue(self.email, ttl=60, family=family)
+
+        self.assertFalse(await self.store.consume(jti, family))
+        self.assertFalse(await self.store.consume(new_jti, family))
+        self.assertEqual(await self.store.sessions(self.email), set())
+
+    async def test_multiple_sessions(self):
+        _, phone = await self.store.issue(self.email, ttl=60)
+        laptop_jti, laptop = await self.store.issue(self.email, ttl=60)
+        await self.store.revoke_family(phone)
+        self.assertEqual(await self.store.sessions(self.email), {laptop})
+        self.assertTrue(await self.store.consume(laptop_jti, laptop))
+
+    async def test_revoke_user(self):
+        jti_1, family_1 = await self.store.issue(self.email, ttl=60)
+        jti_2, family_2 = await self.store.issue(self.email, ttl=60)
+        await self.store.revoke_user(self.email)
+        self.assertFalse(await self.store.consume(jti_1, family_1))
+        self.assertFalse(await self.store.consume(jti_2, family_2))
+
+
+if __name__ == '__main__':
+    unittest.main()
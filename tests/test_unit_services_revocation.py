@@ -0,0 +1,78 @@
+import unittest
+from unittest.mock import AsyncMock
+
+import fakeredis
+from fakeredis import aioredis
+
+from fastapi import HTTPException
+
+from src.services.auth import auth_service
+from src.services.bloom import BloomFilter
+from src.services.revocation import RevocationList
+
+
+class TestBloomFilter(unittest.TestCase):
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        items = [f"item-{i}" for i in range(1000)]
+        bloom.update(items)
+        self.assertTrue(all(item in bloom for item in items))
+        self.assertTrue(bloom.saturated)
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        bloom.update(f"item-{i}" for i in range(1000))
+        false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+class TestRevocationList(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        server = fakeredis.FakeServer()
+        self.redis = aioredis.FakeRedis(server=server, decode_responses=True)
+        self.worker_1 = RevocationList(ttl=900, redis_client=self.redis)
+        self.worker_2 = RevocationList(ttl=900, redis_client=aioredis.FakeRedis(server=server, decode_responses=True))
+
+    async def test_not_revoked_skips_redis(self):
+        self.worker_1.redis = AsyncMock()
+        self.assertFalse(await self.worker_1.is_revoked({"jti": "a", "fam": "b"}))
+        self.worker_1.redis.mget.assert_not_called()
+
+    async def test_revoke_token(self):
+        await self.worker_1.revoke_token("a")
+        self.assertTrue(await self.worker_1.is_revoked({"jti": "a", "fam": "b"}))
+        self.assertFalse(await self.worker_1.is_revoked({"jti": "c", "fam": "b"}))
+
+    async def test_revoke_family(self):
+        await self.worker_1.revoke_family("b")
+        self.assertTrue(await self.worker_1.is_revoked({"jti": "c", "fam": "b"}))
+
+    async def test_sync_between_workers(self):
+        await self.worker_2.sync()
+        await self.worker_1.revoke_token("a")
+        self.assertFalse(await self.worker_2.is_revoked({"jti": "a"}))
+        await self.worker_2.sync()
+        self.assertTrue(await self.worker_2.is_revoked({"jti": "a"}))
+
+    async def test_expired_revocation(self):
+        await self.worker_1.revoke_token("a")
+        await self.redis.delete("revoked:jti:a")
+        self.assertFalse(await self.worker_1.is_revoked({"jti": "a"}))
+
+
+class TestAccessClaims(unittest.IsolatedAsyncioTestCase):
+
+    async def test_refresh_token_is_not_an_access_token(self):
+        claims = {"sub": "test@user.com", "fam": "b"}
+        access_token = await auth_service.create_access_token(claims)
+        self.assertEqual((await auth_service.get_access_claims(access_token))["sub"], "test@user.com")
+        refresh_token = await auth_service.create_refresh_token({**claims, "jti": "a"})
+        with self.assertRaises(HTTPException) as err:
+            await auth_service.get_access_claims(refresh_token)
+        self.assertEqual(err.exception.status_code, 401)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import time
+import unittest
+from unittest.mock import patch
+
+from src.services.token_cache import TokenCache
+
+
+class TestTokenCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.cache = TokenCache(maxsize=2, ttl=300)
+        self.claims = {"sub": "test@user.com", "exp": time.time() + 60}
+
+    def test_get_after_set(self):
+        self.cache.set("token", self.claims)
+        self.assertEqual(self.cache.get("token"), self.claims)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_miss(self):
+        self.assertIsNone(self.cache.get("token"))
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_entry_expires_with_token(self):
+        self.cache.set("token", self.claims)
+        with patch("src.services.token_cache.time.time", return_value=self.claims["exp"]):
+            self.assertIsNone(self.cache.get("token"))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_token_without_exp_is_not_cached(self):
+        self.cache.set("token", {"sub": "test@user.com"})
+        self.assertIsNone(self.cache.get("token"))
+
+    def test_lru_eviction(self):
+        self.cache.set("token_1", self.claims)
+        self.cache.set("token_2", self.claims)
+        self.cache.get("token_1")
+        self.cache.set("token_3", self.claims)
+        self.assertIsNotNone(self.cache.get("token_1"))
+        self.assertIsNone(self.cache.get("token_2"))
+        self.assertIsNotNone(self.cache.get("token_3"))
+
+    def test_discard(self):
+        self.cache.set("token", self.claims)
+        self.cache.discard("token")
+        self.assertIsNone(self.cache.get("token"))
+
+    def test_discard_subject(self):
+        self.cache.set("token_1", self.claims)
+        self.cache.set("token_2", {"sub": "other@user.com", "exp": self.claims["exp"]})
+        self.cache.discard_subject("test@user.com")
+        self.assertIsNone(self.cache.get("token_1"))
+        self.assertIsNotNone(self.cache.get("token_2"))
+
+
+if __name__ == '__main__':
+    unittest.main()
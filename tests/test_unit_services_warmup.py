@@ -0,0 +1,60 @@
+import unittest
+from unittest.mock import patch
+
+import fakeredis
+from fakeredis import aioredis
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.database.redis_client import redis_manager
+from src.entity.models import Base
+from src.services import warmup
+from src.services.metrics import STARTUP
+
+
+class TestWarmUp(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        self.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.session_maker = async_sessionmaker(self.engine, expire_on_commit=False)
+        server = fakeredis.FakeServer()
+        self.patches = [
+            patch.object(redis_manager, "_client", aioredis.FakeRedis(server=server, decode_responses=True)),
+            patch.object(redis_manager, "_sync_client", fakeredis.FakeRedis(server=server)),
+            patch.object(warmup, "prime_bcrypt", self.noop),
+        ]
+        for p in self.patches:
+            p.start()
+
+    async def asyncTearDown(self) -> None:
+        for p in self.patches:
+            p.stop()
+        await self.engine.dispose()
+
+    @staticmethod
+    async def noop():
+        pass
+
+    async def test_runs_all_steps(self):
+        with self.assertNoLogs(warmup.logger, level="WARNING"):
+            phases = await warmup.warm_up(self.engine, self.session_maker)
+        self.assertEqual(list(phases), ["db_pool", "db_statements", "redis", "bcrypt", "jwt"])
+
+    async def test_failing_step_does_not_raise(self):
+        await self.engine.dispose()
+        broken = create_async_engine("sqlite+aiosqlite:////nonexistent/dir/db.sqlite")
+        with self.assertLogs(warmup.logger, level="WARNING") as logs:
+            phases = await warmup.warm_up(broken, async_sessionmaker(broken))
+        self.assertIn("db_pool", phases)
+        self.assertIn("redis", phases)
+        self.assertTrue(any("db_pool" in line for line in logs.output))
+
+    def test_startup_report(self):
+        report = warmup.startup_report({"import": 0.12345, "lifespan": 0.5})
+        self.assertEqual(report, {"import": 0.123, "lifespan": 0.5})
+        self.assertEqual(STARTUP.value("import"), 0.123)
+
+
+if __name__ == '__main__':
+    unittest.main()